@@ -0,0 +1,139 @@
+"""
+Benchmark throughput encoder SBERT: PyTorch vs ONNX Runtime (fp32 / int8).
+
+Usage:
+    python benchmark_encoder.py
+    python benchmark_encoder.py --backends torch onnx onnx-int8 --texts 1024 --batch-size 32
+    python benchmark_encoder.py --input data/corpus_txt/skripsi.txt
+"""
+
+import argparse
+import sys
+import os
+import time
+import numpy as np
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.onnx_backend import OnnxSentenceEncoder, ONNX_TOLERANCE, compare_embeddings
+
+_SAMPLE = (
+    "Penelitian ini bertujuan untuk mendeteksi plagiarisme semantik pada dokumen skripsi mahasiswa "
+    "dengan memanfaatkan model Sentence-BERT yang menghasilkan representasi vektor dari setiap "
+    "segmen teks. Similarity dihitung menggunakan cosine similarity antara segmen dokumen uji dan "
+    "segmen dari sumber pembanding, baik dari corpus lokal maupun hasil pencarian Google. "
+    "Hasil pengujian menunjukkan bahwa pendekatan semantik mampu mengenali parafrase yang tidak "
+    "terdeteksi oleh metode berbasis kesamaan kata."
+)
+
+
+def load_texts(path: str, count: int, segment_size: int) -> list:
+    """Segmen ``segment_size`` kata dari file input (atau teks contoh), diulang hingga ``count``."""
+    text = _SAMPLE
+    if path:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+    words = text.split()
+    segments = [" ".join(words[i:i + segment_size]) for i in range(0, max(len(words) - segment_size, 1), 5)]
+    # Variasi kecil agar tidak ada dua teks identik
+    return [f"{segments[i % len(segments)]} ({i})" for i in range(count)]
+
+
+def load_encoder(backend: str, model_name: str, cache_dir: str, threads: int):
+    if backend == 'torch':
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name, device='cpu')
+    return OnnxSentenceEncoder.from_pretrained(
+        model_name, cache_dir=cache_dir, quantize=backend == 'onnx-int8', num_threads=threads or None
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark encoder SBERT: PyTorch vs ONNX Runtime')
+    parser.add_argument(
+        '--model',
+        type=str,
+        default='paraphrase-multilingual-mpnet-base-v2',
+        help='Nama / path model Sentence-BERT (default: paraphrase-multilingual-mpnet-base-v2)'
+    )
+    parser.add_argument(
+        '--backends',
+        nargs='+',
+        default=['torch', 'onnx', 'onnx-int8'],
+        choices=['torch', 'onnx', 'onnx-int8'],
+        help='Backend yang dibandingkan (torch menjadi referensi akurasi)'
+    )
+    parser.add_argument('--texts', type=int, default=512, help='Jumlah teks yang di-encode (default: 512)')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batch size encode (default: 32)')
+    parser.add_argument('--segment-size', type=int, default=25, help='Jumlah kata per teks (default: 25)')
+    parser.add_argument('--input', type=str, default=None, help='File teks sumber segmen (default: teks contoh)')
+    parser.add_argument('--threads', type=int, default=0, help='Jumlah thread CPU (0 = default library)')
+    parser.add_argument('--repeat', type=int, default=3, help='Jumlah pengulangan, diambil yang tercepat (default: 3)')
+    parser.add_argument(
+        '--onnx-cache-dir',
+        type=str,
+        default=os.getenv('ONNX_CACHE_DIR', 'data/onnx'),
+        help='Folder cache artefak ONNX (default: data/onnx)'
+    )
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("⚡ SBERT ENCODER BENCHMARK")
+    print("="*60 + "\n")
+
+    texts = load_texts(args.input, args.texts, args.segment_size)
+    print(f"🧠 Model: {args.model}")
+    print(f"📝 Texts: {len(texts)} x ~{args.segment_size} kata, batch size {args.batch_size}\n")
+
+    results = {}
+    reference = None
+    for backend in args.backends:
+        print(f"⏳ [{backend}] loading...")
+        start = time.time()
+        try:
+            encoder = load_encoder(backend, args.model, args.onnx_cache_dir, args.threads)
+        except Exception as e:
+            print(f"   ❌ Gagal memuat backend {backend}: {e}")
+            continue
+        load_time = time.time() - start
+        encoder.encode(texts[:args.batch_size], batch_size=args.batch_size)  # warm-up
+        best = float('inf')
+        embeddings = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            embeddings = np.asarray(encoder.encode(texts, batch_size=args.batch_size, convert_to_numpy=True), dtype=np.float32)
+            best = min(best, time.perf_counter() - start)
+        results[backend] = {'load_s': load_time, 'seconds': best, 'throughput': len(texts) / best}
+        if backend == 'torch':
+            reference = embeddings
+        results[backend]['embeddings'] = embeddings
+        print(f"   ✅ load {load_time:.1f}s, {len(texts) / best:.1f} texts/s")
+
+    print("\n" + "="*60)
+    print("📊 HASIL")
+    print("="*60)
+    base = results.get('torch', {}).get('throughput')
+    for backend, result in results.items():
+        line = f"   {backend:<10} {result['throughput']:8.1f} texts/s"
+        if base:
+            line += f"  ({result['throughput'] / base:.2f}x vs torch)"
+        if reference is not None and backend != 'torch':
+            report = compare_embeddings(reference, result['embeddings'])
+            ok = report['min_cosine'] >= ONNX_TOLERANCE[backend]
+            line += (
+                f"  | min cosine {report['min_cosine']:.5f}, max abs diff {report['max_abs_diff']:.2e} "
+                f"{'✅' if ok else '❌'} (toleransi {ONNX_TOLERANCE[backend]})"
+            )
+        print(line)
+    if reference is None:
+        print("\n💡 Tambahkan 'torch' ke --backends untuk membandingkan akurasi embedding")
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
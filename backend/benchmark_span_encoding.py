@@ -0,0 +1,110 @@
+"""
+Perbandingan encode sliding window: per window vs span pooling (token embedding bersama per chunk).
+
+Mengukur untuk setiap dokumen: cosine embedding span vs per window, token yang
+diproses transformer, waktu encode, dan (jika corpus dimuat) kecocokan top-1
+serta label Plagiat/Original terhadap local corpus.
+
+Usage:
+    python benchmark_span_encoding.py --folder data/corpus_txt --files 20
+    python benchmark_span_encoding.py --folder data/corpus_txt --corpus data/corpus --chunk-tokens 256 384
+"""
+
+import argparse
+import sys
+import os
+import numpy as np
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.plagiarism_detector import PlagiarismDetector
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bandingkan encode per window vs span pooling')
+    parser.add_argument('--folder', type=str, default='data/corpus_txt', help='Folder file .txt dokumen uji')
+    parser.add_argument('--files', type=int, default=20, help='Jumlah file maksimum (default: 20)')
+    parser.add_argument(
+        '--corpus',
+        type=str,
+        default=None,
+        help='Direktori corpus untuk cek kecocokan top-1 & label (opsional)'
+    )
+    parser.add_argument(
+        '--chunk-tokens',
+        type=int,
+        nargs='+',
+        default=[256],
+        help='Panjang chunk (token) yang dibandingkan (default: 256)'
+    )
+    parser.add_argument(
+        '--model',
+        type=str,
+        default='paraphrase-multilingual-mpnet-base-v2',
+        help='Nama / path model Sentence-BERT'
+    )
+    parser.add_argument(
+        '--backend',
+        type=str,
+        default=os.getenv('INFERENCE_BACKEND', 'torch'),
+        choices=['torch', 'onnx', 'onnx-int8'],
+        help='Inference backend encoder (default: torch / env INFERENCE_BACKEND)'
+    )
+    parser.add_argument('--threshold', type=float, default=0.75, help='Similarity threshold (default: 0.75)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        print(f"❌ Error: Folder tidak ditemukan: {args.folder}")
+        return 1
+    files = sorted(f for f in os.listdir(args.folder) if f.endswith('.txt'))[:args.files]
+    if not files:
+        print(f"❌ Error: Tidak ada file .txt di {args.folder}")
+        return 1
+
+    print("\n" + "="*60)
+    print("🧩 SPAN POOLING vs PER-WINDOW ENCODING")
+    print("="*60 + "\n")
+
+    detector = PlagiarismDetector(
+        model_name=args.model,
+        similarity_threshold=args.threshold,
+        inference_backend=args.backend,
+        lexical_prefilter=False
+    )
+    print(f"🧠 Model: {detector.active_model_name} ({detector.active_backend})")
+    if args.corpus:
+        loaded = detector.load_corpus(args.corpus)
+        print(f"📦 Corpus: {loaded['segments']} segments")
+    texts = []
+    for filename in files:
+        with open(os.path.join(args.folder, filename), 'r', encoding='utf-8', errors='ignore') as f:
+            texts.append(f.read())
+    detector.evaluate_span_encoding(texts[0], span_chunk_tokens=args.chunk_tokens[0])  # warm-up
+
+    for chunk_tokens in args.chunk_tokens:
+        reports = [r for r in (detector.evaluate_span_encoding(t, span_chunk_tokens=chunk_tokens) for t in texts) if r['success']]
+        if not reports:
+            print("❌ Semua dokumen terlalu pendek")
+            return 1
+        windows = sum(r['windows'] for r in reports)
+        chunk_tok = sum(r['chunk_tokens'] for r in reports)
+        window_tok = sum(r['window_tokens'] for r in reports)
+        window_time = sum(r['window_time_sec'] for r in reports)
+        span_time = sum(r['span_time_sec'] for r in reports)
+        print(f"\n📊 chunk {chunk_tokens} token — {len(reports)} dokumen, {windows} window")
+        print(f"   Token transformer: {window_tok} -> {chunk_tok} ({1 - chunk_tok / window_tok:.1%} lebih sedikit)")
+        print(f"   Waktu encode: {window_time:.2f}s -> {span_time:.2f}s ({window_time / span_time:.2f}x)")
+        print(f"   Cosine span vs per window: mean {np.mean([r['mean_cosine'] for r in reports]):.4f}, "
+              f"min {min(r['min_cosine'] for r in reports):.4f}, p05 {np.mean([r['p05_cosine'] for r in reports]):.4f}")
+        if 'top1_agreement' in reports[0]:
+            weights = [r['windows'] for r in reports]
+            print(f"   Top-1 corpus sama: {np.average([r['top1_agreement'] for r in reports], weights=weights):.4f}")
+            print(f"   Label @ {args.threshold} sama: {np.average([r['label_agreement'] for r in reports], weights=weights):.4f}")
+            print(f"   Selisih skor maks: {max(r['max_score_diff'] for r in reports):.4f}")
+    print("\n💡 Aktifkan dengan SEGMENT_ENCODING=span SPAN_CHUNK_TOKENS=<n> jika label tetap konsisten\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ Script helper untuk build local corpus dari folder PDF/TXT skripsi lama.
 Usage:
     python build_corpus.py --folder uploads/corpus_skripsi --extension .pdf
     python build_corpus.py --folder data/corpus_txt --extension .txt --clear
+    python build_corpus.py --folder uploads/corpus_skripsi --workers 8
 """
 
 import argparse
@@ -43,6 +44,31 @@ def main():
         default=0.75,
         help='Similarity threshold untuk deteksi (default: 0.75)'
     )
+    parser.add_argument(
+        '--embedding-cache',
+        type=str,
+        default=os.getenv('EMBEDDING_CACHE_PATH', 'data/embedding_cache.sqlite'),
+        help='File SQLite cache embedding yang dipakai bersama API (kosongkan untuk menonaktifkan)'
+    )
+    parser.add_argument(
+        '--backend',
+        type=str,
+        default=os.getenv('INFERENCE_BACKEND', 'torch'),
+        choices=['torch', 'onnx', 'onnx-int8'],
+        help='Inference backend encoder (default: torch / env INFERENCE_BACKEND)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=int(os.getenv('CORPUS_BUILD_WORKERS', '0')),
+        help='Jumlah proses encode paralel, masing-masing dengan model sendiri (default: 0 = satu proses)'
+    )
+    parser.add_argument(
+        '--threads-per-worker',
+        type=int,
+        default=None,
+        help='Thread torch/ORT per worker (default: jumlah core / workers)'
+    )
     
     args = parser.parse_args()
     
@@ -56,8 +82,12 @@ def main():
     detector = PlagiarismDetector(
         similarity_threshold=args.threshold,
         segment_size=25,
-        overlap=5
+        overlap=5,
+        embedding_cache_path=args.embedding_cache or None,
+        inference_backend=args.backend,
+        onnx_cache_dir=os.getenv('ONNX_CACHE_DIR', 'data/onnx')
     )
+    print(f"🧠 Inference backend: {detector.active_backend}")
     
     # Clear existing corpus jika diminta
     if args.clear:
@@ -84,7 +114,9 @@ def main():
     print(f"\n⏳ Building corpus... (ini mungkin memakan waktu beberapa menit)\n")
     
     # Build corpus
-    result = detector.build_corpus_from_folder(args.folder, args.extension)
+    result = detector.build_corpus_from_folder(
+        args.folder, args.extension, workers=args.workers, threads_per_worker=args.threads_per_worker
+    )
     
     # Display results
     print("\n" + "="*60)
@@ -94,6 +126,19 @@ def main():
     print(f"📁 Files processed: {result['files_processed']}/{len(files)}")
     print(f"📝 Total segments: {result['total_segments']}")
     print(f"💾 Corpus size: {result['corpus_size']}")
+    print(f"⚡ Throughput: {result['segments_per_sec']} segments/sec ({result['elapsed_seconds']}s, {result['workers']} worker)")
+    if result['encode_pool']:
+        pool_stats = result['encode_pool']
+        print(f"   Encode pool: {pool_stats['workers']} x {pool_stats['threads_per_worker']} threads, "
+              f"{pool_stats['segments']} segments di-encode ({pool_stats['segments_per_sec']} segments/sec)")
+    cache_stats = detector.get_cache_stats()['persistent']
+    if cache_stats:
+        process = cache_stats['process']
+        print(f"🗃️  Embedding cache: {process['hits']} hit / {process['misses']} miss ({cache_stats['entries']} entries)")
+    scheduler_stats = detector.get_cache_stats()['scheduler']
+    if scheduler_stats and scheduler_stats['batches']:
+        print(f"🧮 Encode batches: {scheduler_stats['batches']}, padding {scheduler_stats['padding_ratio']:.1%} "
+              f"(tanpa bucketing {scheduler_stats['naive_padding_ratio']:.1%})")
     
     if result['errors']:
         print(f"\n⚠️  Errors ({len(result['errors'])}):")
@@ -115,7 +160,7 @@ def main():
     # Save corpus to disk
     if result['success'] and result['corpus_size'] > 0:
         print(f"\n💾 Saving corpus to disk...")
-        save_result = detector.save_corpus('data/corpus.pkl')
+        save_result = detector.save_corpus('data/corpus')
         if save_result['success']:
             print(f"   ✅ Saved {save_result['segments']} segments to {save_result['path']}")
         else:
@@ -135,6 +180,7 @@ def main():
         print("   - Check logs di atas untuk detail error")
     print("="*60 + "\n")
     
+    detector.close()
     return 0 if result['success'] else 1
 
 
@@ -0,0 +1,55 @@
+"""
+Script konversi corpus pickle lama (format v1) ke format v2 memory-mapped.
+
+Usage:
+    python convert_corpus.py --input data/corpus.pkl
+    python convert_corpus.py --input data/corpus.pkl --output data/corpus
+"""
+
+import argparse
+import sys
+import os
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.corpus_store import convert_legacy_pickle, CorpusStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Konversi corpus pickle v1 ke format v2 (mmap)')
+    parser.add_argument(
+        '--input',
+        type=str,
+        default='data/corpus.pkl',
+        help='File corpus pickle lama (default: data/corpus.pkl)'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        default=None,
+        help='Direktori output format v2 (default: path input tanpa .pkl)'
+    )
+    args = parser.parse_args()
+
+    output = args.output or (args.input[:-4] if args.input.endswith('.pkl') else args.input + '_v2')
+
+    if not os.path.isfile(args.input):
+        print(f"❌ Error: File tidak ditemukan: {args.input}")
+        return 1
+
+    print(f"📦 Converting {args.input} -> {output} ...")
+    start = time.time()
+    result = convert_legacy_pickle(args.input, output)
+    print(f"   ✅ {result['segments']} segments, format v{result['format_version']} ({time.time() - start:.2f}s)")
+
+    # Verifikasi: load via mmap harus menghasilkan jumlah segmen yang sama
+    start = time.time()
+    store, _ = CorpusStore.load(output, mmap=True)
+    print(f"   🔎 mmap load: {len(store)} segments in {time.time() - start:.3f}s")
+    return 0 if len(store) == result['segments'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
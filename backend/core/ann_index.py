@@ -0,0 +1,276 @@
+"""
+Approximate Nearest Neighbour Index
+Index ANN (CPU-only, numpy) untuk local corpus agar pencarian tidak linear terhadap ukuran corpus
+"""
+
+import os
+import numpy as np
+from typing import Dict, Optional, Tuple
+from loguru import logger
+
+from .corpus_store import CorpusStore, l2_normalize
+
+
+class ANNIndex:
+    """
+    Interface index ANN di atas ``CorpusStore``.
+
+    Index hanya menyimpan struktur pencarian (mis. centroid + inverted list);
+    vektor dan skor tetap diambil dari store sehingga index bisa dipasang /
+    dilepas tanpa menyalin matriks embedding.
+    """
+
+    kind = "base"
+
+    def build(self, store: CorpusStore):
+        raise NotImplementedError
+
+    def add(self, store: CorpusStore, rows: range):
+        raise NotImplementedError
+
+    def search(self, store: CorpusStore, queries: np.ndarray, top_k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    @property
+    def size(self) -> int:
+        """Jumlah baris corpus yang sudah ter-index."""
+        raise NotImplementedError
+
+    def needs_rebuild(self, store: CorpusStore) -> bool:
+        return False
+
+    def prepare(self):
+        """Bentuk struktur lazy sekarang agar ``search`` read-only (aman untuk banyak thread pembaca)."""
+
+    def stats(self) -> Dict[str, any]:
+        return {'kind': self.kind}
+
+    def save(self, path: str):
+        raise NotImplementedError
+
+    @classmethod
+    def load(cls, path: str) -> "ANNIndex":
+        raise NotImplementedError
+
+
+def spherical_kmeans(
+    data: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 20,
+    seed: int = 42,
+    block_size: int = 16384
+) -> np.ndarray:
+    """K-means pada vektor ter-normalisasi (similarity = dot product). Return centroid (K, dim)."""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, data.shape[0])
+    centroids = data[rng.choice(data.shape[0], n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = assign_nearest(data, centroids, block_size=block_size)
+        counts = np.bincount(assign, minlength=n_clusters)
+        # Jumlah vektor per cluster via sort + reduceat (jauh lebih cepat dari np.add.at)
+        order = np.argsort(assign, kind='stable')
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)])[nonempty]
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(data[order], starts, axis=0)
+        empty = counts == 0
+        if empty.any():
+            # Cluster kosong diisi ulang dengan titik acak agar semua list terpakai
+            sums[empty] = data[rng.choice(data.shape[0], int(empty.sum()), replace=False)]
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+def assign_nearest(data: np.ndarray, centroids: np.ndarray, block_size: int = 16384) -> np.ndarray:
+    """Index centroid terdekat untuk setiap baris data (diproses per blok)."""
+    assign = np.empty(data.shape[0], dtype=np.int32)
+    for start in range(0, data.shape[0], block_size):
+        block = data[start:start + block_size]
+        assign[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+class IVFIndex(ANNIndex):
+    """
+    Inverted File index: corpus dipartisi ke ``n_lists`` cluster (spherical k-means),
+    query hanya di-scan pada ``nprobe`` cluster terdekat.
+
+    ``nprobe`` adalah knob recall/speed: nprobe = n_lists setara exact search.
+    """
+
+    kind = "ivf"
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        nprobe: int = 8,
+        train_sample: int = 100000,
+        kmeans_iter: int = 20,
+        retrain_growth: float = 2.0,
+        seed: int = 42
+    ):
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.train_sample = train_sample
+        self.kmeans_iter = kmeans_iter
+        self.retrain_growth = retrain_growth
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        # Buffer assignment dengan kapasitas amortized (add tidak menyalin seluruh array)
+        self._assign_buf = np.empty(0, dtype=np.int32)
+        self._n_assigned = 0
+        # Inverted list CSR (baris terurut per list, offset per list) sebagai satu tuple
+        # agar pembaca di thread lain selalu melihat pasangan yang konsisten
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def assignments(self) -> np.ndarray:
+        return self._assign_buf[:self._n_assigned]
+
+    @assignments.setter
+    def assignments(self, value: np.ndarray):
+        self._assign_buf = np.asarray(value, dtype=np.int32)
+        self._n_assigned = int(self._assign_buf.shape[0])
+        self._lists = None
+
+    @staticmethod
+    def default_n_lists(n_rows: int) -> int:
+        """Heuristik umum IVF: ~4 * sqrt(N) list."""
+        return max(1, int(4 * np.sqrt(n_rows)))
+
+    def build(self, store: CorpusStore):
+        data = store.embeddings
+        n_lists = self.n_lists or self.default_n_lists(len(store))
+        rng = np.random.default_rng(self.seed)
+        if data.shape[0] > self.train_sample:
+            sample = data[rng.choice(data.shape[0], self.train_sample, replace=False)]
+        else:
+            sample = data
+        self.centroids = spherical_kmeans(sample, n_lists, n_iter=self.kmeans_iter, seed=self.seed)
+        self.assignments = assign_nearest(data, self.centroids)
+        self.trained_size = len(store)
+        logger.info(f"IVF index built: {self.centroids.shape[0]} lists over {len(store)} segments")
+
+    def add(self, store: CorpusStore, rows: range):
+        """
+        Assign baris baru ke centroid yang sudah ada (tanpa retrain).
+
+        Inverted list yang sudah terbentuk di-merge dengan assignment baru
+        (sort hanya atas baris baru), bukan di-argsort ulang seluruh corpus.
+        """
+        new_assign = assign_nearest(store.embeddings[rows.start:rows.stop], self.centroids)
+        if rows.start != self._n_assigned:
+            # Corpus dipotong / diganti: bentuk ulang dari awal
+            self.assignments = np.concatenate([self.assignments[:rows.start], new_assign])
+            return
+        end = self._n_assigned + new_assign.shape[0]
+        if end > self._assign_buf.shape[0]:
+            grown = np.empty(max(end, 2 * self._assign_buf.shape[0], 1024), dtype=np.int32)
+            grown[:self._n_assigned] = self.assignments
+            self._assign_buf = grown
+        self._assign_buf[self._n_assigned:end] = new_assign
+        self._n_assigned = end
+        if self._lists is not None and new_assign.size:
+            list_rows, list_offsets = self._lists
+            order = np.argsort(new_assign, kind='stable')
+            # Baris baru selalu > baris lama: disisipkan di akhir list masing-masing
+            merged = np.insert(list_rows, list_offsets[1:][new_assign[order]], np.arange(rows.start, end)[order])
+            counts = np.bincount(new_assign, minlength=self.centroids.shape[0])
+            self._lists = (merged, list_offsets + np.concatenate([[0], np.cumsum(counts)]))
+
+    @property
+    def size(self) -> int:
+        return int(len(self.assignments))
+
+    def needs_rebuild(self, store: CorpusStore) -> bool:
+        """Centroid dilatih ulang jika corpus sudah tumbuh jauh sejak training terakhir."""
+        if self.centroids is None:
+            return True
+        return len(store) > self.trained_size * self.retrain_growth
+
+    def prepare(self):
+        self._inverted_lists()
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Layout CSR: baris corpus diurutkan per list + offset tiap list."""
+        lists = self._lists
+        if lists is None:
+            assignments = self.assignments
+            counts = np.bincount(assignments, minlength=self.centroids.shape[0])
+            lists = self._lists = (np.argsort(assignments, kind='stable'), np.concatenate([[0], np.cumsum(counts)]))
+        return lists
+
+    def search(self, store: CorpusStore, queries: np.ndarray, top_k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        queries = l2_normalize(queries)
+        k = max(1, top_k)
+        n_queries = queries.shape[0]
+        rows_out = np.full((n_queries, k), -1, dtype=np.int64)
+        scores_out = np.full((n_queries, k), -np.inf, dtype=np.float32)
+        list_rows, list_offsets = self._inverted_lists()
+        nprobe = min(self.nprobe, self.centroids.shape[0])
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        for qi in range(n_queries):
+            candidates = np.concatenate([
+                list_rows[list_offsets[c]:list_offsets[c + 1]] for c in probes[qi]
+            ])
+            if candidates.size == 0:
+                continue
+            rows, scores = store.score_candidates(queries[qi], candidates, k)
+            rows_out[qi, :rows.size] = rows
+            scores_out[qi, :rows.size] = scores
+        return rows_out, scores_out
+
+    def stats(self) -> Dict[str, any]:
+        return {
+            'kind': self.kind,
+            'n_lists': int(self.centroids.shape[0]) if self.centroids is not None else 0,
+            'nprobe': self.nprobe,
+            'indexed_segments': int(len(self.assignments)),
+            'trained_size': int(self.trained_size)
+        }
+
+    def save(self, path: str):
+        # Tulis via file handle agar numpy tidak menambah ekstensi .npz ke nama file;
+        # file sementara + rename agar pembaca tidak pernah melihat file setengah jadi
+        with open(path + ".tmp", 'wb') as f:
+            np.savez(
+                f,
+                kind=self.kind,
+                centroids=self.centroids,
+                assignments=self.assignments,
+                trained_size=self.trained_size,
+                nprobe=self.nprobe,
+                retrain_growth=self.retrain_growth
+            )
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            index = cls(nprobe=int(data['nprobe']), retrain_growth=float(data['retrain_growth']))
+            index.centroids = data['centroids']
+            index.n_lists = int(index.centroids.shape[0])
+            index.assignments = data['assignments']
+            index.trained_size = int(data['trained_size'])
+        return index
+
+
+ANN_INDEX_TYPES = {
+    IVFIndex.kind: IVFIndex,
+}
+
+
+def create_ann_index(kind: str, **params) -> ANNIndex:
+    """Factory index ANN berdasarkan nama ('ivf')."""
+    if kind not in ANN_INDEX_TYPES:
+        raise ValueError(f"Unknown ANN index type: {kind} (available: {list(ANN_INDEX_TYPES)})")
+    return ANN_INDEX_TYPES[kind](**params)
+
+
+def load_ann_index(path: str) -> ANNIndex:
+    """Muat index dari file, tipe ditentukan dari field 'kind' yang tersimpan."""
+    with np.load(path) as data:
+        kind = str(data['kind'])
+    return ANN_INDEX_TYPES[kind].load(path)
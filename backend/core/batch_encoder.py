@@ -0,0 +1,155 @@
+"""
+Micro-Batching Encoder
+Menggabungkan permintaan encode dari banyak request/thread menjadi satu forward pass model
+"""
+
+import time
+import queue
+import threading
+import numpy as np
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+from loguru import logger
+
+
+class MicroBatchEncoder:
+    """
+    Antrian encode bersama dengan satu thread worker.
+
+    Setiap pemanggil ``encode(texts)`` menaruh permintaan ke antrian lalu menunggu.
+    Worker mengambil permintaan pertama, menunggu paling lama ``max_wait_ms``
+    untuk permintaan lain hingga total ``max_batch_size`` teks, menjalankan satu
+    ``encode_fn`` untuk semuanya, lalu membagikan hasil ke masing-masing pemanggil.
+    Permintaan yang lebih besar dari ``max_batch_size`` tetap diproses utuh.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        latency_window: int = 1024
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue[Tuple[List[str], Future, float]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._batch_sizes = deque(maxlen=latency_window)
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.forward_time = 0.0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="micro-batch-encoder", daemon=True)
+        self._thread.start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode (blocking) lewat antrian bersama. Return (N, dim) float32."""
+        future: Future = Future()
+        with self._lock:
+            # Cek & put di bawah lock yang sama dengan close(): tidak ada request di belakang sentinel
+            stopped = self._stopped
+            if not stopped:
+                self._queue.put((list(texts), future, time.perf_counter()))
+        if stopped:
+            return self.encode_fn(texts)
+        return future.result()
+
+    def _collect(self) -> List[Tuple[List[str], Future, float]]:
+        first = self._queue.get()
+        if first is None:
+            return []
+        pending = [first]
+        total = len(first[0])
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while total < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            pending.append(item)
+            total += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            if not pending:
+                if self._stopped:
+                    break
+                continue
+            all_texts = [t for texts, _, _ in pending for t in texts]
+            start = time.perf_counter()
+            try:
+                vectors = self.encode_fn(all_texts)
+            except Exception as e:
+                logger.error(f"Micro-batch encode gagal ({len(all_texts)} teks): {e}")
+                for _, future, _ in pending:
+                    future.set_exception(e)
+                continue
+            done = time.perf_counter()
+            offset = 0
+            with self._lock:
+                self.requests += len(pending)
+                self.texts += len(all_texts)
+                self.batches += 1
+                self.forward_time += done - start
+                self._batch_sizes.append(len(all_texts))
+                for texts, _, enqueued in pending:
+                    self._latencies.append(done - enqueued)
+            for texts, future, _ in pending:
+                future.set_result(vectors[offset:offset + len(texts)])
+                offset += len(texts)
+        self._drain()
+
+    def _drain(self):
+        """Gagalkan request yang tersisa di antrian setelah worker berhenti (tidak ada yang menunggu selamanya)."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and not item[1].done():
+                item[1].set_exception(RuntimeError("MicroBatchEncoder sudah ditutup"))
+
+    def close(self, timeout: float = 5.0):
+        """
+        Hentikan worker; pemanggil berikutnya meng-encode langsung tanpa antrian.
+
+        Request yang sudah masuk antrian sebelum close tetap diproses (sentinel
+        diletakkan di belakangnya); close menunggu worker selesai paling lama ``timeout`` detik.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000.0
+            sizes = np.array(self._batch_sizes)
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'requests': self.requests,
+                'texts': self.texts,
+                'batches': self.batches,
+                'avg_batch_size': round(self.texts / self.batches, 2) if self.batches else 0.0,
+                'avg_requests_per_batch': round(self.requests / self.batches, 2) if self.batches else 0.0,
+                'recent_batch_size_p50': float(np.percentile(sizes, 50)) if sizes.size else 0.0,
+                'latency_ms_p50': round(float(np.percentile(latencies, 50)), 2) if latencies.size else 0.0,
+                'latency_ms_p95': round(float(np.percentile(latencies, 95)), 2) if latencies.size else 0.0,
+                'avg_forward_ms': round(self.forward_time / self.batches * 1000.0, 2) if self.batches else 0.0,
+                'queue_depth': self._queue.qsize()
+            }
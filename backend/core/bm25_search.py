@@ -0,0 +1,259 @@
+"""
+BM25 Search Provider
+Pencarian leksikal offline (inverted index BM25) atas teks local corpus dan snapshot web yang di-mirror lokal
+"""
+
+import os
+import re
+import json
+import html
+import threading
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+from .query_planner import STOPWORDS
+from .search_provider import SearchProvider
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_TAG_RE = re.compile(r"<(script|style|title)[^>]*>.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+SNAPSHOT_MANIFEST = "snapshots.json"
+SNAPSHOT_EXTENSIONS = (".txt", ".html", ".htm")
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index BM25 (Okapi) berbasis array numpy.
+
+    Posting disimpan per blok ``(term, doc, tf)`` terurut term sehingga posting
+    satu term diambil dengan ``searchsorted``. Setiap ``add`` membuat blok baru
+    (ingest inkremental murah); blok digabung saat jumlahnya melebihi ``max_blocks``.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_blocks: int = 8):
+        self.k1 = k1
+        self.b = b
+        self.max_blocks = max_blocks
+        self.clear()
+
+    def clear(self):
+        self._vocab: Dict[str, int] = {}
+        self._df = np.zeros(0, dtype=np.int64)
+        self._doc_len = np.zeros(0, dtype=np.float32)
+        self._n_docs = 0
+        self._total_len = 0
+        self._blocks: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return self._n_docs
+
+    @property
+    def postings(self) -> int:
+        return sum(block[0].size for block in self._blocks)
+
+    def add(self, texts: List[str]) -> range:
+        """Index dokumen baru. Return range id dokumen yang ditambahkan."""
+        start = self._n_docs
+        terms, docs, tfs, lengths = [], [], [], []
+        for offset, text in enumerate(texts):
+            tokens = _tokens(text)
+            lengths.append(len(tokens))
+            for token, tf in Counter(tokens).items():
+                terms.append(self._vocab.setdefault(token, len(self._vocab)))
+                docs.append(start + offset)
+                tfs.append(tf)
+        terms = np.asarray(terms, dtype=np.int32)
+        order = np.argsort(terms, kind='stable')  # doc tetap menaik dalam satu term
+        if terms.size:
+            self._blocks.append((terms[order], np.asarray(docs, dtype=np.int32)[order], np.asarray(tfs, dtype=np.float32)[order]))
+        if len(self._vocab) > self._df.size:
+            self._df = np.concatenate([self._df, np.zeros(max(len(self._vocab) - self._df.size, self._df.size // 2), dtype=np.int64)])
+        self._df[:len(self._vocab)] += np.bincount(terms, minlength=len(self._vocab))[:len(self._vocab)]
+        self._doc_len = np.concatenate([self._doc_len[:self._n_docs], np.asarray(lengths, dtype=np.float32)])
+        self._n_docs += len(texts)
+        self._total_len += int(sum(lengths))
+        if len(self._blocks) > self.max_blocks:
+            self._merge_blocks()
+        return range(start, self._n_docs)
+
+    def _merge_blocks(self):
+        terms = np.concatenate([block[0] for block in self._blocks])
+        docs = np.concatenate([block[1] for block in self._blocks])
+        tfs = np.concatenate([block[2] for block in self._blocks])
+        # Blok berurutan menurut id dokumen: sort stabil per term menjaga doc tetap menaik
+        order = np.argsort(terms, kind='stable')
+        self._blocks = [(terms[order], docs[order], tfs[order])]
+
+    def search(self, query: str, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Dokumen dengan skor BM25 tertinggi. Return (doc ids, skor) terurut menurun (tanpa skor 0)."""
+        tokens = set(_tokens(query))
+        content = {t for t in tokens if t not in STOPWORDS} or tokens
+        term_ids = [self._vocab[t] for t in content if t in self._vocab]
+        if not term_ids or not self._n_docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        avg_len = self._total_len / self._n_docs if self._total_len else 1.0
+        norm = self.k1 * (1 - self.b + self.b * self._doc_len[:self._n_docs] / avg_len)
+        hit_docs, hit_scores = [], []
+        for term in term_ids:
+            df = self._df[term]
+            idf = np.log(1 + (self._n_docs - df + 0.5) / (df + 0.5))
+            for block_terms, block_docs, block_tfs in self._blocks:
+                lo, hi = np.searchsorted(block_terms, [term, term + 1])
+                if hi > lo:
+                    docs, tfs = block_docs[lo:hi], block_tfs[lo:hi]
+                    hit_docs.append(docs)
+                    hit_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm[docs]))
+        if not hit_docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        # Akumulasi skor hanya untuk dokumen yang memuat minimal satu term query
+        unique, inverse = np.unique(np.concatenate(hit_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(hit_scores)).astype(np.float32)
+        k = min(top_k, unique.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return unique[top].astype(np.int64), scores[top]
+
+    def stats(self) -> Dict[str, any]:
+        return {'documents': self._n_docs, 'terms': len(self._vocab), 'postings': self.postings, 'blocks': len(self._blocks)}
+
+
+class BM25SearchProvider(SearchProvider):
+    """
+    Provider pencarian offline tanpa quota: BM25 atas teks local corpus dan snapshot web lokal.
+
+    Index corpus disinkronkan inkremental dari ``CorpusStore`` (teks diambil dari
+    store saat membentuk hasil, tidak disalin). Snapshot web adalah file
+    ``.txt``/``.html`` di ``snapshot_dir`` yang dipecah menjadi passage
+    ``passage_words`` kata; URL & judul asli dibaca dari ``snapshots.json``
+    (``{"file.html": {"url": ..., "title": ...}}``) bila ada. Hasil memakai
+    bentuk yang sama dengan Google CSE (``title/snippet/url/source``).
+    """
+
+    kind = "bm25"
+
+    def __init__(
+        self,
+        snapshot_dir: Optional[str] = None,
+        passage_words: int = 30,
+        passage_overlap: int = 5,
+        k1: float = 1.2,
+        b: float = 0.75
+    ):
+        self.passage_words = passage_words
+        self.passage_overlap = passage_overlap
+        self.corpus_index = BM25Index(k1=k1, b=b)
+        self.snapshot_index = BM25Index(k1=k1, b=b)
+        self._corpus = None
+        self._passages: List[Dict[str, str]] = []
+        self._lock = threading.RLock()
+        self.queries = 0
+        self.snapshot_dir = snapshot_dir
+        if snapshot_dir:
+            self.add_snapshots(snapshot_dir)
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+    def sync(self, corpus, batch_size: int = 65536) -> int:
+        """Index baris corpus yang belum ter-index. Return jumlah baris baru."""
+        with self._lock:
+            if corpus is not self._corpus or len(corpus) < len(self.corpus_index):
+                self.corpus_index.clear()
+                self._corpus = corpus
+            start = len(self.corpus_index)
+            for begin in range(start, len(corpus), batch_size):
+                end = min(len(corpus), begin + batch_size)
+                self.corpus_index.add([corpus.get_text(r) for r in range(begin, end)])
+        if len(corpus) > start:
+            logger.info(f"BM25 index corpus: {len(corpus) - start} baris baru, total {len(corpus)}")
+        return len(corpus) - start
+
+    def reset_corpus(self):
+        with self._lock:
+            self.corpus_index.clear()
+            self._corpus = None
+
+    def _passages_of(self, text: str) -> List[str]:
+        words = text.split()
+        if not words:
+            return []
+        step = max(1, self.passage_words - self.passage_overlap)
+        return [" ".join(words[i:i + self.passage_words]) for i in range(0, max(len(words) - self.passage_overlap, 1), step)]
+
+    def add_snapshots(self, folder: str) -> int:
+        """Index file snapshot web di ``folder``. Return jumlah passage yang ditambahkan."""
+        if not os.path.isdir(folder):
+            logger.warning(f"Folder snapshot web tidak ditemukan: {folder}")
+            return 0
+        manifest = {}
+        manifest_path = os.path.join(folder, SNAPSHOT_MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        passages, records = [], []
+        for filename in sorted(os.listdir(folder)):
+            if not filename.lower().endswith(SNAPSHOT_EXTENSIONS):
+                continue
+            with open(os.path.join(folder, filename), 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read()
+            meta = manifest.get(filename, {})
+            title = meta.get('title')
+            if filename.lower().endswith(('.html', '.htm')):
+                if title is None:
+                    match = re.search(r"<title[^>]*>(.*?)</title>", content, re.IGNORECASE | re.DOTALL)
+                    title = html.unescape(match.group(1)).strip() if match else None
+                content = html.unescape(_TAG_RE.sub(" ", content))
+            url = meta.get('url') or f"file://{os.path.abspath(os.path.join(folder, filename))}"
+            source = meta.get('source') or (re.sub(r"^\w+://", "", url).split('/')[0] if '://' in url else filename)
+            for passage in self._passages_of(content):
+                passages.append(passage)
+                records.append({'title': title or filename, 'url': url, 'source': source})
+        with self._lock:
+            self.snapshot_index.add(passages)
+            for record, passage in zip(records, passages):
+                self._passages.append({**record, 'snippet': passage})
+        logger.info(f"BM25 index snapshot web: {len(passages)} passage dari {folder}")
+        return len(passages)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _corpus_result(self, row: int) -> Dict[str, str]:
+        source_id = self._corpus.get_source(row)
+        segment_id = self._corpus.get_segment_id(row)
+        return {
+            'title': f"{source_id} (segmen {segment_id})",
+            'snippet': self._corpus.get_text(row),
+            'url': f"corpus://{source_id}#segment-{segment_id}",
+            'source': source_id
+        }
+
+    def search(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
+        with self._lock:
+            self.queries += 1
+            candidates = []
+            if self._corpus is not None:
+                rows, scores = self.corpus_index.search(query, num_results)
+                candidates += [(float(s), 'corpus', int(r)) for r, s in zip(rows, scores)]
+            docs, scores = self.snapshot_index.search(query, num_results)
+            candidates += [(float(s), 'snapshot', int(d)) for d, s in zip(docs, scores)]
+            candidates.sort(key=lambda c: -c[0])
+            return [
+                self._corpus_result(i) if kind == 'corpus' else dict(self._passages[i])
+                for _, kind, i in candidates[:num_results]
+            ]
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            return {
+                'kind': self.kind,
+                'snapshot_dir': self.snapshot_dir,
+                'queries': self.queries,
+                'corpus': self.corpus_index.stats(),
+                'snapshots': self.snapshot_index.stats()
+            }
@@ -0,0 +1,108 @@
+"""
+Cached Encoder
+Pipeline encode satu model lewat cache: LRU in-memory -> cache persisten -> model (per bucket panjang token)
+"""
+
+import numpy as np
+import torch
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from .embedding_cache import EmbeddingLRUCache, PersistentEmbeddingCache
+from .encode_scheduler import LengthBucketScheduler
+
+
+def to_numpy(embeddings) -> np.ndarray:
+    """Konversi embedding (tensor / list tensor / ndarray) ke ndarray float32."""
+    if isinstance(embeddings, torch.Tensor):
+        return embeddings.detach().cpu().numpy().astype(np.float32, copy=False)
+    if isinstance(embeddings, (list, tuple)):
+        return np.stack([to_numpy(e) for e in embeddings])
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+class CachedEncoder:
+    """
+    Encode teks dengan satu model lewat cache embedding.
+
+    Dipakai model utama detector dan model screening cascade. Teks dicari di
+    LRU in-memory lalu cache persisten; hanya teks unik yang belum ada di
+    keduanya yang di-forward ke model (dibagi per bucket panjang token bila
+    ``scheduler`` aktif) dan hasilnya ditulis kembali ke cache. Tahap
+    ``lookup``/``store``/``assemble`` juga bisa dipanggil terpisah oleh
+    pemanggil yang meng-encode di tempat lain (pool proses encode).
+    """
+
+    def __init__(
+        self,
+        model,
+        model_name: str,
+        memory_cache: EmbeddingLRUCache,
+        embedding_cache: Optional[PersistentEmbeddingCache] = None,
+        scheduler: Optional[LengthBucketScheduler] = None,
+        device: str = "cpu"
+    ):
+        self.model = model
+        self.model_name = model_name
+        self.memory_cache = memory_cache
+        self.embedding_cache = embedding_cache
+        self.scheduler = scheduler
+        self.device = device
+        self.dim = model.get_sentence_embedding_dimension()
+
+    def forward(self, texts: List[str]) -> np.ndarray:
+        """Satu forward pass untuk satu batch dari scheduler (ukuran batch sudah dibatasi budget token)."""
+        return to_numpy(self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True, device=self.device))
+
+    def model_encode(self, texts: List[str]) -> np.ndarray:
+        """Encode list teks dengan model tanpa cache. Return (N, dim) float32."""
+        if self.scheduler is not None and len(texts) > 1:
+            return self.scheduler.encode(texts, self.forward)
+        return to_numpy(self.model.encode(texts, convert_to_numpy=True, device=self.device))
+
+    def lookup(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], Dict[str, np.ndarray], List[str]]:
+        """Cari di LRU in-memory lalu cache persisten. Return (vektor LRU per teks / None, hasil cache persisten, teks unik yang harus di-encode)."""
+        vectors = self.memory_cache.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        found: Dict[str, np.ndarray] = {}
+        if missing and self.embedding_cache is not None:
+            try:
+                found = {t: v for t, v in zip(missing, self.embedding_cache.get_many(missing)) if v is not None}
+            except Exception as e:
+                logger.error(f"Gagal membaca embedding cache ({self.model_name}): {e}")
+        return vectors, found, [t for t in missing if t not in found]
+
+    def store(self, texts: List[str], encoded: np.ndarray, found: Dict[str, np.ndarray]):
+        """Tulis hasil encode model ke cache persisten dan ke ``found``."""
+        if self.embedding_cache is not None:
+            try:
+                self.embedding_cache.put_many(texts, encoded)
+            except Exception as e:
+                logger.error(f"Gagal menulis embedding cache ({self.model_name}): {e}")
+        found.update(zip(texts, encoded))
+
+    def assemble(
+        self, texts: List[str], vectors: List[Optional[np.ndarray]], found: Dict[str, np.ndarray], remember: bool
+    ) -> np.ndarray:
+        """Gabungkan hasil LRU dan ``found`` sesuai urutan ``texts``; ``remember`` mengisi LRU dengan teks yang tadinya miss."""
+        if found:
+            if remember:
+                missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+                self.memory_cache.put_many(missing, [found[t] for t in missing])
+            vectors = [v if v is not None else found[t] for t, v in zip(texts, vectors)]
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    def encode(
+        self, texts: List[str], remember: bool = True, model_encode: Optional[Callable[[List[str]], np.ndarray]] = None
+    ) -> np.ndarray:
+        """
+        Encode lewat cache. ``remember=False`` (ingest corpus massal) tetap membaca
+        cache tetapi tidak mengisi LRU in-memory; ``model_encode`` mengganti
+        ``self.model_encode`` (mis. micro-batching lintas request). Return (N, dim) float32.
+        """
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        vectors, found, to_encode = self.lookup(texts)
+        if to_encode:
+            self.store(to_encode, (model_encode or self.model_encode)(to_encode), found)
+        return self.assemble(texts, vectors, found, remember)
@@ -0,0 +1,194 @@
+"""
+Cascade Screener
+Screening murah dengan model kecil (mis. MiniLM) sebelum konfirmasi dengan model utama (mpnet)
+"""
+
+import os
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+from .corpus_store import l2_normalize
+from .cached_encoder import CachedEncoder
+from .embedding_cache import EmbeddingLRUCache, PersistentEmbeddingCache
+from .encode_scheduler import LengthBucketScheduler
+
+SCREEN_FILE = "screen_embeddings.npy"
+
+
+class CascadeScreener:
+    """
+    Tahap pertama deteksi dua-model.
+
+    Menyimpan embedding model screening untuk setiap baris local corpus (baris
+    ke-i sejajar dengan baris ke-i ``CorpusStore``). Segmen submission di-encode
+    dengan model screening lalu dibandingkan dengan matriks ini; hanya segmen
+    dengan skor >= ``suspicion_threshold`` yang perlu di-encode dan di-skor ulang
+    oleh model utama. Encode memakai ``CachedEncoder`` dengan LRU in-memory
+    sendiri dan (opsional) cache persisten berkey model screening.
+    """
+
+    def __init__(
+        self,
+        model,
+        model_name: str,
+        suspicion_threshold: float = 0.55,
+        memory_cache_mb: float = 16,
+        embedding_cache: Optional[PersistentEmbeddingCache] = None,
+        scheduler: Optional[LengthBucketScheduler] = None,
+        device: str = "cpu"
+    ):
+        self.model_name = model_name
+        self.suspicion_threshold = suspicion_threshold
+        self.encoder = CachedEncoder(
+            model, model_name, EmbeddingLRUCache(max_bytes=int(memory_cache_mb * 1024 * 1024)),
+            embedding_cache=embedding_cache, scheduler=scheduler, device=device
+        )
+        self.dim = self.encoder.dim
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.clear()
+        self.documents = 0
+        self.segments = 0
+        self.escalated = 0
+        self.screen_seconds = 0.0
+        self.confirm_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Matriks screening (sejajar baris local corpus)
+    # ------------------------------------------------------------------
+    def clear(self):
+        self._embeddings = np.empty((0, self.dim), dtype=np.float32)
+        self._size = 0
+        # Naik setiap matriks di-reset/dimuat: hasil encode yang di-snapshot sebelumnya tidak berlaku lagi
+        self.generation += 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _append(self, vectors: np.ndarray):
+        vectors = l2_normalize(vectors)
+        needed = self._size + vectors.shape[0]
+        if needed > self._embeddings.shape[0] or not self._embeddings.flags.writeable:
+            grown = np.empty((max(needed, int(self._embeddings.shape[0] * 1.5), 1024), self.dim), dtype=np.float32)
+            grown[:self._size] = self._embeddings[:self._size]
+            self._embeddings = grown
+        self._embeddings[self._size:needed] = vectors
+        self._size = needed
+
+    def pending(self, corpus, batch_size: int = 4096) -> Tuple[int, int, List[str]]:
+        """
+        Snapshot baris corpus berikutnya yang belum punya embedding screening.
+
+        Return (baris awal, generation, teks maksimal ``batch_size`` baris). Teks bisa
+        di-encode tanpa lock corpus lalu diserahkan ke ``append``.
+        """
+        if self._size > len(corpus):
+            self.clear()
+        end = min(len(corpus), self._size + batch_size)
+        return self._size, self.generation, [corpus.get_text(r) for r in range(self._size, end)]
+
+    def append(self, vectors: np.ndarray, start: int, generation: int) -> bool:
+        """Append embedding hasil ``pending`` jika matriks belum berubah sejak snapshot. Return False jika dibuang."""
+        if generation != self.generation or start != self._size:
+            return False
+        self._append(vectors)
+        return True
+
+    def sync(self, corpus, batch_size: int = 4096) -> int:
+        """Encode baris corpus yang belum punya embedding screening (satu thread). Return jumlah baris yang di-encode."""
+        encoded = 0
+        while True:
+            start, generation, texts = self.pending(corpus, batch_size)
+            if not texts:
+                break
+            self.append(self.encode(texts, remember=False), start, generation)
+            encoded += len(texts)
+        if encoded:
+            logger.info(f"Screening index ({self.model_name}): {encoded} baris di-encode, total {self._size}")
+        return encoded
+
+    def save(self, directory: str):
+        path = os.path.join(directory, SCREEN_FILE)
+        with open(path + ".tmp", 'wb') as f:
+            np.save(f, self._embeddings[:self._size])
+        os.replace(path + ".tmp", path)
+
+    def load(self, directory: str, rows: int, mmap: bool = True) -> bool:
+        """Muat embedding screening tersimpan (memory-mapped) jika jumlah baris & dimensi cocok."""
+        path = os.path.join(directory, SCREEN_FILE)
+        if not os.path.exists(path):
+            return False
+        embeddings = np.load(path, mmap_mode='r' if mmap else None)
+        if embeddings.ndim != 2 or embeddings.shape != (rows, self.dim):
+            logger.warning(f"Screening embeddings {path} tidak sejajar dengan corpus ({embeddings.shape}), di-encode ulang")
+            return False
+        self.clear()
+        self._embeddings = embeddings
+        self._size = rows
+        return True
+
+    # ------------------------------------------------------------------
+    # Encode & screening
+    # ------------------------------------------------------------------
+    def encode(self, texts: List[str], remember: bool = True) -> np.ndarray:
+        """Encode dengan model screening lewat LRU -> cache persisten -> model. Return (N, dim) float32."""
+        return self.encoder.encode(texts, remember=remember)
+
+    def best_matches(self, queries: np.ndarray, block_size: int = 16384) -> Tuple[np.ndarray, np.ndarray]:
+        """Baris corpus terdekat per query (cosine model screening). Return (rows, scores) shape (Q,)."""
+        queries = l2_normalize(queries)
+        best_rows = np.full(queries.shape[0], -1, dtype=np.int64)
+        best_scores = np.full(queries.shape[0], -np.inf, dtype=np.float32)
+        for start in range(0, self._size, block_size):
+            sims = queries @ self._embeddings[start:min(self._size, start + block_size)].T
+            arg = sims.argmax(axis=1)
+            scores = sims[np.arange(queries.shape[0]), arg]
+            better = scores > best_scores
+            best_rows[better] = arg[better] + start
+            best_scores[better] = scores[better]
+        return best_rows, best_scores
+
+    def screen(
+        self, texts: List[str], threshold: Optional[float] = None, embeddings: Optional[np.ndarray] = None
+    ) -> Dict[str, any]:
+        """
+        Screening segmen submission.
+
+        Args:
+            texts: Teks segmen
+            threshold: Threshold suspicion (default: ``suspicion_threshold``)
+            embeddings: Embedding screening ``texts`` yang sudah di-encode (mis. di luar lock corpus)
+
+        Returns:
+            Dict berisi ``rows``/``scores`` (match terbaik model screening per segmen)
+            dan ``escalate`` (mask bool segmen yang perlu dikonfirmasi model utama)
+        """
+        threshold = self.suspicion_threshold if threshold is None else threshold
+        rows, scores = self.best_matches(self.encode(texts) if embeddings is None else embeddings)
+        escalate = (rows >= 0) & (scores >= threshold)
+        return {'rows': rows, 'scores': scores, 'escalate': escalate, 'threshold': threshold}
+
+    def record(self, segments: int, escalated: int, screen_seconds: float, confirm_seconds: float):
+        """Catat hasil satu dokumen untuk statistik kumulatif."""
+        with self._lock:
+            self.documents += 1
+            self.segments += segments
+            self.escalated += escalated
+            self.screen_seconds += screen_seconds
+            self.confirm_seconds += confirm_seconds
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            return {
+                'screen_model': self.model_name,
+                'suspicion_threshold': self.suspicion_threshold,
+                'indexed_rows': self._size,
+                'documents': self.documents,
+                'segments': self.segments,
+                'escalated': self.escalated,
+                'escalation_rate': round(self.escalated / self.segments, 4) if self.segments else 0.0,
+                'screen_seconds': round(self.screen_seconds, 3),
+                'confirm_seconds': round(self.confirm_seconds, 3)
+            }
@@ -0,0 +1,220 @@
+"""
+Corpus Segment Log
+Log append-only untuk penambahan corpus agar setiap ingest langsung durable (O(segmen baru) I/O)
+"""
+
+import os
+import json
+import struct
+import uuid
+import zlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: hanya koordinasi antar-thread
+    fcntl = None
+
+LOG_MAGIC = b"CSLOG01\n"
+LOG_FILE_NAME = "segments.log"
+LOCK_FILE_NAME = "segments.log.lock"
+# Header record: panjang meta JSON, panjang payload vektor, crc32 (meta + payload)
+_RECORD_HEADER = struct.Struct("<IQI")
+
+
+def apply_append_record(store, record: Dict[str, any]) -> int:
+    """Terapkan record ``append`` hasil replay ke ``CorpusStore``. Return jumlah segmen (termasuk duplikat)."""
+    store.append(record['embeddings'], texts=record['texts'], segment_ids=record['segment_ids'], source_id=record['source_id'])
+    duplicates = record.get('duplicates', [])
+    for segment_id, owner_source, owner_segment in duplicates:
+        row = store.find_row(owner_source, owner_segment)
+        if row is None:
+            logger.warning(f"Corpus log: owner {owner_source}#{owner_segment} tidak ditemukan, duplikat dilewati")
+            continue
+        store.add_owner(row, record['source_id'], segment_id)
+    return len(record['texts']) + len(duplicates)
+
+
+class CorpusSegmentLog:
+    """
+    File log biner di dalam direktori corpus::
+
+        [magic 8B][generation 32B hex]
+        [record][record]...
+
+    Setiap record = header (json_len, payload_len, crc32) + meta JSON + vektor float32.
+    Record ``append`` berisi satu batch segmen dari satu source; record ``clear``
+    menandai corpus dikosongkan. ``generation`` berubah setiap kali log di-reset
+    (setelah compaction) sehingga snapshot bisa mencatat posisi log yang sudah
+    termasuk di dalamnya.
+
+    Beberapa proses (worker uvicorn) boleh berbagi satu log: append, replay dan
+    reset dilakukan di bawah ``fcntl.flock`` pada ``segments.log.lock``.
+    ``is_current()`` bernilai False bila proses lain sudah menulis / me-reset
+    log sejak posisi yang diketahui instance ini; compaction (snapshot + reset)
+    hanya aman bila True, karena snapshot hanya berisi corpus proses ini.
+    """
+
+    def __init__(self, directory: str, fsync: bool = True):
+        self.directory = directory
+        self.path = os.path.join(directory, LOG_FILE_NAME)
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._thread_lock = threading.RLock()
+        self._lock_file = open(os.path.join(directory, LOCK_FILE_NAME), 'a+b')
+        self._lock_depth = 0
+        with self.locked():
+            if not os.path.exists(self.path):
+                self._write_new_file()
+            header = self._read_header()
+            if not header.startswith(LOG_MAGIC):
+                raise ValueError(f"Bukan file corpus log: {self.path}")
+            self.generation = header[len(LOG_MAGIC):].decode('ascii')
+            self.header_size = len(header)
+            # Posisi log yang sudah tercermin di corpus proses ini (replay / append sendiri)
+            self.synced_size = self.header_size
+        self.records = 0
+        self.segments = 0
+
+    @contextmanager
+    def locked(self):
+        """Lock eksklusif log (antar-thread dan antar-proses). Reentrant dalam satu proses."""
+        with self._thread_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield self
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_header(self) -> bytes:
+        with open(self.path, 'rb') as f:
+            return f.read(len(LOG_MAGIC) + 32)
+
+    def _write_new_file(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(LOG_MAGIC + uuid.uuid4().hex.encode('ascii'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def is_current(self) -> bool:
+        """True jika log di disk belum disentuh proses lain sejak posisi ``synced_size``."""
+        with self.locked():
+            return self._read_header()[len(LOG_MAGIC):].decode('ascii') == self.generation and self.size == self.synced_size
+
+    def _write_record(self, meta: Dict[str, any], payload: bytes = b""):
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        crc = zlib.crc32(payload, zlib.crc32(meta_bytes))
+        record = _RECORD_HEADER.pack(len(meta_bytes), len(payload), crc) + meta_bytes + payload
+        with self.locked():
+            current = self.is_current()
+            with open(self.path, 'ab') as f:
+                f.write(record)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            # Record proses lain di antaranya belum ada di corpus ini: posisi sinkron tidak maju
+            if current:
+                self.synced_size = self.size
+        self.records += 1
+
+    def append(
+        self,
+        embeddings: np.ndarray,
+        texts: List[str],
+        segment_ids: List[int],
+        source_id: str,
+        duplicates: Optional[List[Tuple[int, str, int]]] = None
+    ):
+        """Catat satu batch segmen (dipanggil setelah append ke CorpusStore berhasil).
+
+        ``duplicates`` berisi (segment_id, owner_source_id, owner_segment_id) segmen yang
+        tidak disimpan ulang karena sudah ada di corpus. Baris yang memuatnya dicatat
+        lewat owner utamanya, bukan nomor baris, karena nomor baris hanya berlaku di
+        proses penulis (record worker lain bisa menyisip di log bersama).
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        meta = {
+            'op': 'append',
+            'source_id': source_id,
+            'segment_ids': [int(x) for x in segment_ids],
+            'texts': texts,
+            'shape': list(embeddings.shape),
+            'duplicates': [[int(seg), str(src), int(owner_seg)] for seg, src, owner_seg in (duplicates or [])]
+        }
+        self._write_record(meta, embeddings.tobytes())
+        self.segments += len(texts) + len(duplicates or [])
+
+    def append_clear(self):
+        """Catat bahwa corpus dikosongkan (replay akan mengosongkan store pada titik ini)."""
+        self._write_record({'op': 'clear'})
+
+    def replay(self, start_offset: Optional[int] = None) -> Iterator[Dict[str, any]]:
+        """
+        Baca record mulai ``start_offset`` (default: awal log).
+
+        Record terakhir yang terpotong / crc tidak cocok (crash saat menulis)
+        dibuang dan file dipotong ke record valid terakhir.
+        """
+        with self.locked():
+            offset = max(start_offset or 0, self.header_size)
+            file_size = self.size
+            good_end = offset
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                while True:
+                    head = f.read(_RECORD_HEADER.size)
+                    if len(head) < _RECORD_HEADER.size:
+                        break
+                    meta_len, payload_len, crc = _RECORD_HEADER.unpack(head)
+                    meta_bytes = f.read(meta_len)
+                    payload = f.read(payload_len)
+                    if len(meta_bytes) < meta_len or len(payload) < payload_len:
+                        break
+                    if zlib.crc32(payload, zlib.crc32(meta_bytes)) != crc:
+                        break
+                    meta = json.loads(meta_bytes.decode('utf-8'))
+                    if meta['op'] == 'append':
+                        meta['embeddings'] = np.frombuffer(payload, dtype=np.float32).reshape(meta['shape'])
+                    good_end = f.tell()
+                    yield meta
+            if good_end < file_size:
+                logger.warning(f"Corpus log {self.path}: membuang {file_size - good_end} byte record tidak lengkap")
+                with open(self.path, 'r+b') as f:
+                    f.truncate(good_end)
+            self.synced_size = good_end
+
+    def reset(self):
+        """Kosongkan log dengan generation baru (dipanggil setelah snapshot tersimpan)."""
+        with self.locked():
+            self._write_new_file()
+            self.generation = self._read_header()[len(LOG_MAGIC):].decode('ascii')
+            self.synced_size = self.size
+        self.records = 0
+        self.segments = 0
+
+    def stats(self) -> Dict[str, any]:
+        return {
+            'path': self.path,
+            'generation': self.generation,
+            'bytes': self.size,
+            'synced_bytes': self.synced_size,
+            'records_since_open': self.records,
+            'segments_pending': self.segments
+        }
+
+    def close(self):
+        self._lock_file.close()
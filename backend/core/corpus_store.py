@@ -0,0 +1,708 @@
+"""
+Corpus Store
+Penyimpanan local corpus sebagai satu matriks embedding kontigu (float32, L2-normalized)
+"""
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from typing import List, Dict, Optional, Iterator, Tuple, Callable
+
+from .quantization import create_quantizer, QUANTIZERS
+
+# Versi format on-disk (v1 = pickle list-of-float, v2 = direktori .npy memory-mapped)
+CORPUS_FORMAT_VERSION = 2
+CORPUS_META_FILE = "meta.json"
+QUANTIZER_FILE = "quantizer.npz"
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """Normalisasi L2 per baris (float32). Baris nol dibiarkan nol."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class CorpusStore:
+    """
+    Local corpus dalam layout kolumnar:
+
+    - ``embeddings``: matriks (N, dim) float32 yang sudah di-normalisasi L2,
+      sehingga cosine similarity = dot product biasa
+    - array paralel ``source_idx`` / ``segment_ids`` (int32)
+    - teks segmen disimpan dalam satu blob UTF-8 dengan tabel offset (N+1)
+    - segmen duplikat disimpan sekali; source lain yang memuatnya dicatat sebagai
+      owner tambahan baris tersebut (``add_owner`` / ``owners``)
+
+    Kapasitas tumbuh secara amortized (growth factor) sehingga ``append``
+    tidak menyalin ulang seluruh matriks setiap kali corpus bertambah.
+
+    Mode storage terkompresi (``quantize('int8' | 'pq')``): kode kuantisasi disimpan
+    di RAM untuk pencarian aproksimasi, sedangkan matriks float32 dipindah ke file
+    memory-mapped (``spill_path``) dan hanya dibaca untuk re-ranking exact
+    ``rerank_k`` kandidat teratas per query.
+    """
+
+    def __init__(self, dim: Optional[int] = None, initial_capacity: int = 1024, growth_factor: float = 1.5, rerank_k: int = 32):
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        self.growth_factor = growth_factor
+        self.rerank_k = rerank_k
+        self.storage = "float32"
+        self._quantizer = None
+        self.quantizer_info: Dict[str, any] = {}
+        # Quantizer/proyeksi terlatih yang ikut tersimpan di direktori corpus (dipakai ulang tanpa training)
+        self.saved_quantizer = None
+        self.saved_quantizer_info: Dict[str, any] = {}
+        self._spill_path: Optional[str] = None
+        self.clear()
+
+    def clear(self) -> int:
+        """Kosongkan corpus. Return jumlah segmen yang dihapus."""
+        count = getattr(self, '_size', 0)
+        self._release_spill()
+        self._size = 0
+        self._capacity = 0
+        self._embeddings = np.empty((0, self.dim or 0), dtype=np.float32)
+        self._source_idx = np.empty(0, dtype=np.int32)
+        self._segment_ids = np.empty(0, dtype=np.int32)
+        self._text_offsets = np.zeros(1, dtype=np.int64)
+        self._text_blob = bytearray()
+        self._sources: List[str] = []
+        self._source_lookup: Dict[str, int] = {}
+        self._codes: Dict[str, np.ndarray] = {}
+        # row -> [(source_idx, segment_id)] untuk source lain yang memuat segmen identik
+        self._extra_owners: Dict[int, List[Tuple[int, int]]] = {}
+        # (source_idx, segment_id) -> baris pertama, dibangun lazy oleh find_row
+        self._row_lookup: Dict[Tuple[int, int], int] = {}
+        self._row_lookup_size = 0
+        return count
+
+    def _release_spill(self):
+        """Kembali ke mode float32 in-memory dan hapus file spill (jika ada)."""
+        self.storage = "float32"
+        self._quantizer = None
+        self.quantizer_info = {}
+        self._codes = {}
+        if self._spill_path:
+            self._embeddings = np.empty((0, self.dim or 0), dtype=np.float32)
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+            self._spill_path = None
+
+    # ------------------------------------------------------------------
+    # Akses
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """View (tanpa copy) ke baris yang terisi."""
+        return self._embeddings[:self._size]
+
+    @property
+    def source_idx(self) -> np.ndarray:
+        return self._source_idx[:self._size]
+
+    @property
+    def segment_ids(self) -> np.ndarray:
+        return self._segment_ids[:self._size]
+
+    @property
+    def text_offsets(self) -> np.ndarray:
+        return self._text_offsets[:self._size + 1]
+
+    @property
+    def sources(self) -> List[str]:
+        return self._sources
+
+    def get_text(self, row: int) -> str:
+        start, end = self._text_offsets[row], self._text_offsets[row + 1]
+        return bytes(self._text_blob[start:end]).decode('utf-8')
+
+    def get_source(self, row: int) -> str:
+        return self._sources[self._source_idx[row]]
+
+    def get_segment_id(self, row: int) -> int:
+        return int(self._segment_ids[row])
+
+    def owners(self, row: int) -> List[Dict[str, any]]:
+        """Semua (source_id, segment_id) yang memuat segmen di baris ini (owner utama pertama)."""
+        owners = [{'source_id': self.get_source(row), 'segment_id': self.get_segment_id(row)}]
+        for src_i, segment_id in self._extra_owners.get(int(row), ()):
+            owners.append({'source_id': self._sources[src_i], 'segment_id': segment_id})
+        return owners
+
+    def find_row(self, source_id: str, segment_id: int) -> Optional[int]:
+        """Baris tempat ``source_id`` menyimpan ``segment_id`` sebagai owner utama, atau None."""
+        src_i = self._source_lookup.get(source_id)
+        if src_i is None:
+            return None
+        if self._row_lookup_size < self._size:
+            start = self._row_lookup_size
+            keys = zip(self._source_idx[start:self._size].tolist(), self._segment_ids[start:self._size].tolist())
+            for row, key in enumerate(keys, start):
+                self._row_lookup.setdefault(key, row)
+            self._row_lookup_size = self._size
+        return self._row_lookup.get((src_i, int(segment_id)))
+
+    @property
+    def extra_owner_count(self) -> int:
+        return sum(len(v) for v in self._extra_owners.values())
+
+    def __getitem__(self, row: int) -> Dict[str, any]:
+        """Akses per baris dalam bentuk dict (kompatibel dengan layout lama)."""
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError(row)
+        return {
+            'source_id': self.get_source(row),
+            'segment_id': self.get_segment_id(row),
+            'text': self.get_text(row),
+            'embedding': self._embeddings[row]
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, any]]:
+        for row in range(self._size):
+            yield self[row]
+
+    def source_counts(self) -> Dict[str, int]:
+        """Jumlah segmen per source_id, termasuk segmen duplikat yang disimpan di baris source lain."""
+        counts = np.bincount(self.source_idx, minlength=len(self._sources))
+        for extra in self._extra_owners.values():
+            for src_i, _ in extra:
+                counts[src_i] += 1
+        return {src: int(c) for src, c in zip(self._sources, counts) if c > 0}
+
+    @property
+    def quantized(self) -> bool:
+        return self._quantizer is not None
+
+    def _code_bytes(self) -> int:
+        total = sum(arr.nbytes for arr in self._codes.values())
+        for arr in (self._quantizer.state().values() if self._quantizer else []):
+            total += arr.nbytes
+        return int(total)
+
+    def memory_bytes(self) -> int:
+        """Perkiraan memori resident (kapasitas teralokasi; matriks spill memmap tidak dihitung)."""
+        vectors = self._code_bytes() if self.quantized else self._embeddings.nbytes
+        return int(
+            vectors + self._source_idx.nbytes + self._segment_ids.nbytes
+            + self._text_offsets.nbytes + len(self._text_blob)
+        )
+
+    def memory_report(self) -> Dict[str, any]:
+        """Perbandingan memori vektor float32 vs kode terkompresi untuk baris terisi."""
+        float_bytes = self._size * (self.dim or 0) * 4
+        if self.quantized:
+            per_vector = self._quantizer.code_bytes_per_vector(self.dim)
+            compressed = self._size * per_vector + sum(a.nbytes for a in self._quantizer.state().values())
+        else:
+            compressed = float_bytes
+        return {
+            'storage': self.storage,
+            'segments': self._size,
+            'float32_bytes': int(float_bytes),
+            'resident_vector_bytes': int(compressed),
+            'saved_bytes': int(float_bytes - compressed),
+            'compression_ratio': round(float_bytes / compressed, 2) if compressed else 1.0,
+            'quantizer': self.quantizer_info or None
+        }
+
+    # ------------------------------------------------------------------
+    # Mutasi
+    # ------------------------------------------------------------------
+    def _source_index(self, source_id: str) -> int:
+        idx = self._source_lookup.get(source_id)
+        if idx is None:
+            idx = len(self._sources)
+            self._sources.append(source_id)
+            self._source_lookup[source_id] = idx
+        return idx
+
+    def add_owner(self, row: int, source_id: str, segment_id: int):
+        """Catat bahwa ``source_id`` juga memuat segmen di ``row`` (dedup saat ingest)."""
+        if not 0 <= row < self._size:
+            raise IndexError(row)
+        self._extra_owners.setdefault(int(row), []).append((self._source_index(source_id), int(segment_id)))
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self._capacity:
+            return
+        new_capacity = max(needed, int(self._capacity * self.growth_factor), self.initial_capacity)
+        if self._spill_path:
+            embeddings = self._grow_spill(new_capacity)
+        else:
+            embeddings = np.empty((new_capacity, self.dim), dtype=np.float32)
+            embeddings[:self._size] = self._embeddings[:self._size]
+        for name, arr in list(self._codes.items()):
+            grown = np.empty((new_capacity,) + arr.shape[1:], dtype=arr.dtype)
+            grown[:self._size] = arr[:self._size]
+            self._codes[name] = grown
+        source_idx = np.empty(new_capacity, dtype=np.int32)
+        segment_ids = np.empty(new_capacity, dtype=np.int32)
+        text_offsets = np.zeros(new_capacity + 1, dtype=np.int64)
+        n = self._size
+        source_idx[:n] = self._source_idx[:n]
+        segment_ids[:n] = self._segment_ids[:n]
+        text_offsets[:n + 1] = self._text_offsets[:n + 1]
+        self._embeddings = embeddings
+        self._source_idx = source_idx
+        self._segment_ids = segment_ids
+        self._text_offsets = text_offsets
+        self._capacity = new_capacity
+
+    def _grow_spill(self, capacity: int) -> np.ndarray:
+        """Perbesar file spill lalu map ulang (isi lama tetap di disk, tanpa copy ke RAM)."""
+        if not os.path.exists(self._spill_path):
+            # Matriks sebelumnya read-only (mmap file corpus): buat file spill baru
+            spill = np.memmap(self._spill_path, dtype=np.float32, mode='w+', shape=(capacity, self.dim))
+            spill[:self._size] = self._embeddings[:self._size]
+            return spill
+        if isinstance(self._embeddings, np.memmap):
+            self._embeddings.flush()
+        with open(self._spill_path, 'ab') as f:
+            f.truncate(capacity * self.dim * 4)
+        return np.memmap(self._spill_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+
+    def quantize(self, kind: str, spill_path: str, quantizer=None, **params) -> Dict[str, any]:
+        """
+        Aktifkan storage terkompresi ('int8', 'pq') atau proyeksi dimensi rendah ('pca', 'truncate').
+
+        Args:
+            kind: Tipe quantizer
+            spill_path: File tujuan matriks float32 (memory-mapped, untuk re-ranking exact)
+            quantizer: Quantizer yang sudah terlatih (mis. ``saved_quantizer``); None = latih dari corpus
+            **params: Parameter quantizer (mis. n_subvectors untuk PQ, dims untuk PCA)
+
+        Returns:
+            memory_report() setelah kompresi
+        """
+        if self._size == 0:
+            raise ValueError("Corpus kosong, quantizer tidak bisa dilatih")
+        if self.quantized:
+            self.dequantize()
+        if quantizer is None:
+            quantizer = create_quantizer(kind, **params).train(self.embeddings)
+            info = {
+                'kind': kind,
+                'params': quantizer.params(),
+                'dim': self.dim,
+                'version': self.quantizer_version(quantizer),
+                'fitted_rows': self._size,
+                'fitted_at': time.time()
+            }
+        else:
+            info = dict(self.saved_quantizer_info) if quantizer is self.saved_quantizer else {
+                'kind': quantizer.kind, 'params': quantizer.params(), 'dim': self.dim,
+                'version': self.quantizer_version(quantizer)
+            }
+        codes: Dict[str, np.ndarray] = {}
+        for start in range(0, self._size, 65536):
+            block = quantizer.encode(self._embeddings[start:min(self._size, start + 65536)])
+            for name, arr in block.items():
+                if name not in codes:
+                    codes[name] = np.empty((self._capacity,) + arr.shape[1:], dtype=arr.dtype)
+                codes[name][start:start + arr.shape[0]] = arr
+
+        os.makedirs(os.path.dirname(os.path.abspath(spill_path)), exist_ok=True)
+        if not (isinstance(self._embeddings, np.memmap) and not self._embeddings.flags.writeable):
+            spill = np.memmap(spill_path, dtype=np.float32, mode='w+', shape=(self._capacity, self.dim))
+            spill[:self._size] = self._embeddings[:self._size]
+            spill.flush()
+            self._embeddings = spill
+        # else: matriks sudah memory-mapped dari file corpus; file spill baru dibuat saat append
+        self._spill_path = spill_path
+        self._quantizer = quantizer
+        self.quantizer_info = info
+        self._codes = codes
+        self.storage = kind
+        return self.memory_report()
+
+    @staticmethod
+    def quantizer_version(quantizer) -> str:
+        """Versi quantizer = hash (kind, params, state) sehingga setiap fit ulang mendapat versi baru."""
+        digest = hashlib.blake2b(digest_size=6)
+        digest.update(json.dumps([quantizer.kind, quantizer.params()], sort_keys=True).encode('utf-8'))
+        for name, arr in sorted(quantizer.state().items()):
+            digest.update(name.encode('utf-8'))
+            digest.update(np.ascontiguousarray(arr).tobytes())
+        return digest.hexdigest()
+
+    def dequantize(self):
+        """Kembalikan matriks float32 ke RAM dan buang kode kuantisasi."""
+        if not self.quantized:
+            return
+        embeddings = np.empty((self._capacity, self.dim), dtype=np.float32)
+        embeddings[:self._size] = self._embeddings[:self._size]
+        self._release_spill()
+        self._embeddings = embeddings
+
+    def append(self, embeddings: np.ndarray, texts: List[str], segment_ids: List[int], source_id: str) -> range:
+        """
+        Tambahkan batch segmen dari satu source.
+
+        Returns:
+            range index baris yang baru ditambahkan
+        """
+        embeddings = l2_normalize(embeddings)
+        n_new = embeddings.shape[0]
+        if n_new != len(texts) or n_new != len(segment_ids):
+            raise ValueError("Jumlah embeddings, texts, dan segment_ids harus sama")
+        if n_new == 0:
+            return range(self._size, self._size)
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+            self._embeddings = np.empty((0, self.dim), dtype=np.float32)
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Dimensi embedding {embeddings.shape[1]} tidak sama dengan corpus ({self.dim})")
+
+        start = self._size
+        end = start + n_new
+        self._ensure_capacity(end)
+        self._embeddings[start:end] = embeddings
+        if self.quantized:
+            for name, arr in self._quantizer.encode(embeddings).items():
+                self._codes[name][start:end] = arr
+        self._source_idx[start:end] = self._source_index(source_id)
+        self._segment_ids[start:end] = segment_ids
+        if not isinstance(self._text_blob, bytearray):
+            # Blob hasil mmap (read-only) disalin sekali saat corpus pertama kali ditambah
+            self._text_blob = bytearray(self._text_blob)
+        offset = self._text_offsets[start]
+        for i, text in enumerate(texts):
+            encoded = text.encode('utf-8')
+            self._text_blob.extend(encoded)
+            offset += len(encoded)
+            self._text_offsets[start + i + 1] = offset
+        self._size = end
+        return range(start, end)
+
+    # ------------------------------------------------------------------
+    # Pencarian
+    # ------------------------------------------------------------------
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity query (1D, tidak perlu ter-normalisasi) terhadap seluruh corpus."""
+        query = l2_normalize(query)[0]
+        return self.embeddings @ query
+
+    def score_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Skor cosine exact query (sudah ter-normalisasi) terhadap subset baris tertentu."""
+        return self._embeddings[rows] @ query
+
+    def _block_scores(self, prepared: np.ndarray, start: int, end: int) -> np.ndarray:
+        """Skor (Q, B) untuk blok baris: exact (float32) atau aproksimasi dari kode."""
+        if not self.quantized:
+            return prepared @ self._embeddings[start:end].T
+        block_codes = {name: arr[start:end] for name, arr in self._codes.items()}
+        return self._quantizer.scores(prepared, block_codes)
+
+    def _rerank(self, queries: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Skor ulang kandidat (Q, R) dengan vektor float32 exact, ambil top-k."""
+        valid = rows >= 0
+        safe_rows = np.where(valid, rows, 0)
+        vectors = self._embeddings[safe_rows.reshape(-1)].reshape(rows.shape + (self.dim,))
+        exact = np.einsum('qrd,qd->qr', vectors, queries)
+        exact[~valid] = -np.inf
+        order = np.argsort(-exact, axis=1)[:, :k]
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(exact, order, axis=1).astype(np.float32)
+
+    def score_candidates(self, query: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k dari sekumpulan kandidat untuk satu query ter-normalisasi.
+        Pada mode terkompresi: skor aproksimasi, lalu re-rank exact ``rerank_k`` teratas.
+        """
+        if self.quantized:
+            codes = {name: arr[candidates] for name, arr in self._codes.items()}
+            approx = self._quantizer.scores(self._quantizer.prepare(query.reshape(1, -1)), codes)[0]
+            kr = min(max(k, self.rerank_k), candidates.size)
+            short = np.argpartition(-approx, kr - 1)[:kr]
+            rows, scores = self._rerank(query.reshape(1, -1), candidates[short].reshape(1, -1), k)
+            return rows[0], scores[0]
+        scores = self.score_rows(query, candidates)
+        kq = min(k, candidates.size)
+        top = np.argpartition(-scores, kq - 1)[:kq]
+        top = top[np.argsort(-scores[top])]
+        return candidates[top], scores[top]
+
+    def search(self, query: np.ndarray, top_k: int = 1) -> List[Dict[str, any]]:
+        """Top-k baris termirip untuk satu query: list of {row, score} urut menurun."""
+        rows, scores = self.search_batch(np.asarray(query).reshape(1, -1), top_k=top_k)
+        return [{'row': int(r), 'score': float(s)} for r, s in zip(rows[0], scores[0]) if r >= 0]
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        top_k: int = 1,
+        block_size: int = 16384
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k per query untuk banyak query sekaligus (satu matmul per blok corpus).
+
+        Corpus di-tile per ``block_size`` baris sehingga memori puncak
+        dibatasi ~ Q x block_size x 4 byte, dan top-k berjalan di-merge antar blok.
+        Pada mode terkompresi, ``rerank_k`` kandidat aproksimasi teratas di-skor
+        ulang secara exact sebelum diambil top-k.
+
+        Returns:
+            (rows, scores) masing-masing shape (Q, k), urut menurun per baris.
+            Baris diisi -1 / -inf jika corpus lebih kecil dari k.
+        """
+        queries = l2_normalize(queries)
+        n_queries = queries.shape[0]
+        final_k = max(1, top_k)
+        k = max(final_k, self.rerank_k) if self.quantized else final_k
+        best_rows = np.full((n_queries, k), -1, dtype=np.int64)
+        best_scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+        if self._size == 0 or n_queries == 0:
+            return best_rows[:, :final_k], best_scores[:, :final_k]
+
+        prepared = self._quantizer.prepare(queries) if self.quantized else queries
+        for start in range(0, self._size, block_size):
+            end = min(self._size, start + block_size)
+            sims = self._block_scores(prepared, start, end)  # (Q, B)
+            kb = min(k, end - start)
+            part = np.argpartition(-sims, kb - 1, axis=1)[:, :kb]
+            cand_rows = np.concatenate([best_rows, part + start], axis=1)
+            cand_scores = np.concatenate([best_scores, np.take_along_axis(sims, part, axis=1)], axis=1)
+            keep = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+            best_rows = np.take_along_axis(cand_rows, keep, axis=1)
+            best_scores = np.take_along_axis(cand_scores, keep, axis=1)
+
+        if self.quantized:
+            return self._rerank(queries, best_rows, final_k)
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def rows_of_sources(self, source_indices: np.ndarray) -> np.ndarray:
+        """Baris milik sekumpulan source (owner utama maupun owner tambahan segmen duplikat)."""
+        source_indices = np.asarray(source_indices, dtype=np.int32)
+        rows = np.flatnonzero(np.isin(self.source_idx, source_indices))
+        if self._extra_owners:
+            wanted = set(source_indices.tolist())
+            extra = [row for row, owners in self._extra_owners.items() if any(src_i in wanted for src_i, _ in owners)]
+            if extra:
+                rows = np.union1d(rows, np.asarray(extra, dtype=np.int64))
+        return rows
+
+    def search_rows(self, queries: np.ndarray, rows: np.ndarray, top_k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k per query, dibatasi pada subset baris ``rows`` (kandidat dikumpulkan sekali untuk semua query).
+
+        Returns:
+            (rows, scores) shape (Q, k) seperti ``search_batch``, padding -1 / -inf
+        """
+        queries = l2_normalize(queries)
+        rows = np.asarray(rows, dtype=np.int64)
+        n_queries = queries.shape[0]
+        final_k = max(1, top_k)
+        if rows.size == 0 or n_queries == 0:
+            return np.full((n_queries, final_k), -1, dtype=np.int64), np.full((n_queries, final_k), -np.inf, dtype=np.float32)
+        if self.quantized:
+            codes = {name: arr[rows] for name, arr in self._codes.items()}
+            sims = self._quantizer.scores(self._quantizer.prepare(queries), codes)
+            k = min(max(final_k, self.rerank_k), rows.size)
+        else:
+            sims = queries @ self._embeddings[rows].T
+            k = min(final_k, rows.size)
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        cand_rows = rows[part]
+        if self.quantized:
+            best_rows, best_scores = self._rerank(queries, cand_rows, final_k)
+        else:
+            cand_scores = np.take_along_axis(sims, part, axis=1)
+            order = np.argsort(-cand_scores, axis=1)
+            best_rows = np.take_along_axis(cand_rows, order, axis=1)
+            best_scores = np.take_along_axis(cand_scores, order, axis=1).astype(np.float32)
+        if best_rows.shape[1] < final_k:
+            pad = final_k - best_rows.shape[1]
+            best_rows = np.pad(best_rows, ((0, 0), (0, pad)), constant_values=-1)
+            best_scores = np.pad(best_scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        return best_rows, best_scores
+
+    # ------------------------------------------------------------------
+    # Persistensi (format v2: direktori memory-mapped)
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _atomic_save_npy(path: str, array: np.ndarray):
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp, path)
+
+    def save(self, directory: str, model_name: Optional[str] = None, extra_meta: Optional[Dict[str, any]] = None) -> Dict[str, any]:
+        """
+        Simpan corpus ke direktori format v2:
+
+        - ``embeddings.npy`` (N, dim) float32, ``source_idx.npy``, ``segment_ids.npy``
+        - ``texts.bin`` (blob UTF-8) + ``text_offsets.npy`` (N+1, int64)
+        - ``owners.npy`` (M, 3) int32: row, source_idx, segment_id owner tambahan
+        - ``meta.json`` (format_version, model_name, dim, count, sources) ditulis terakhir
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._atomic_save_npy(os.path.join(directory, "embeddings.npy"), self.embeddings)
+        self._atomic_save_npy(os.path.join(directory, "source_idx.npy"), self.source_idx)
+        self._atomic_save_npy(os.path.join(directory, "segment_ids.npy"), self.segment_ids)
+        self._atomic_save_npy(os.path.join(directory, "text_offsets.npy"), self.text_offsets)
+        blob_path = os.path.join(directory, "texts.bin")
+        with open(blob_path + ".tmp", 'wb') as f:
+            f.write(memoryview(self._text_blob)[:int(self._text_offsets[self._size])])
+        os.replace(blob_path + ".tmp", blob_path)
+        owners = [(row, src_i, seg) for row, extra in sorted(self._extra_owners.items()) for src_i, seg in extra]
+        self._atomic_save_npy(os.path.join(directory, "owners.npy"), np.asarray(owners, dtype=np.int32).reshape(-1, 3))
+        quantizer_info = self._save_quantizer_state(directory)
+        meta = {
+            'format_version': CORPUS_FORMAT_VERSION,
+            'model_name': model_name,
+            'dim': self.dim,
+            'count': self._size,
+            'sources': self._sources,
+            'extra_owners': len(owners),
+            'quantizer': quantizer_info,
+            'saved_at': time.time(),
+            **(extra_meta or {})
+        }
+        meta_path = os.path.join(directory, CORPUS_META_FILE)
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        return meta
+
+    def _save_quantizer_state(self, directory: str) -> Optional[Dict[str, any]]:
+        """Tulis state quantizer aktif (atau yang dimuat dari corpus) ke ``quantizer.npz``. Return info-nya."""
+        if self.quantized:
+            quantizer, info = self._quantizer, self.quantizer_info
+        elif self.saved_quantizer is not None:
+            quantizer, info = self.saved_quantizer, self.saved_quantizer_info
+        else:
+            return None
+        path = os.path.join(directory, QUANTIZER_FILE)
+        with open(path + ".tmp", 'wb') as f:
+            np.savez(f, **quantizer.state())
+        os.replace(path + ".tmp", path)
+        return info
+
+    def save_quantizer(self, directory: str) -> Optional[Dict[str, any]]:
+        """Simpan quantizer/proyeksi ke direktori corpus yang sudah ada (update ``meta.json`` saja)."""
+        meta = self.read_meta(directory)
+        if meta is None:
+            raise FileNotFoundError(f"Corpus metadata not found in {directory}")
+        meta['quantizer'] = self._save_quantizer_state(directory)
+        meta_path = os.path.join(directory, CORPUS_META_FILE)
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        return meta['quantizer']
+
+    @staticmethod
+    def read_meta(directory: str) -> Optional[Dict[str, any]]:
+        meta_path = os.path.join(directory, CORPUS_META_FILE)
+        if not os.path.isfile(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True, **store_kwargs) -> Tuple["CorpusStore", Dict[str, any]]:
+        """
+        Muat corpus format v2. Dengan ``mmap=True`` semua array di-map langsung dari
+        file (tanpa copy, waktu load hampir konstan); salinan ke RAM baru terjadi
+        saat corpus pertama kali di-append.
+        """
+        meta = cls.read_meta(directory)
+        if meta is None:
+            raise FileNotFoundError(f"Corpus metadata not found in {directory}")
+        if meta.get('format_version') != CORPUS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus format v{meta.get('format_version')}")
+        mode = 'r' if mmap else None
+        store = cls(dim=meta['dim'], **store_kwargs)
+        count = int(meta['count'])
+        if count > 0:
+            store._embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode=mode)
+            store._source_idx = np.load(os.path.join(directory, "source_idx.npy"), mmap_mode=mode)
+            store._segment_ids = np.load(os.path.join(directory, "segment_ids.npy"), mmap_mode=mode)
+            store._text_offsets = np.load(os.path.join(directory, "text_offsets.npy"), mmap_mode=mode)
+            blob_path = os.path.join(directory, "texts.bin")
+            if os.path.getsize(blob_path) > 0:
+                if mmap:
+                    store._text_blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+                else:
+                    with open(blob_path, 'rb') as f:
+                        store._text_blob = bytearray(f.read())
+        store._sources = list(meta['sources'])
+        store._source_lookup = {src: i for i, src in enumerate(store._sources)}
+        owners_path = os.path.join(directory, "owners.npy")
+        if os.path.exists(owners_path):
+            for row, src_i, segment_id in np.load(owners_path).tolist():
+                store._extra_owners.setdefault(row, []).append((src_i, segment_id))
+        quantizer_info = meta.get('quantizer')
+        quantizer_path = os.path.join(directory, QUANTIZER_FILE)
+        if quantizer_info and quantizer_info.get('kind') in QUANTIZERS and os.path.exists(quantizer_path):
+            if quantizer_info.get('dim') == meta['dim']:
+                with np.load(quantizer_path) as state:
+                    store.saved_quantizer = QUANTIZERS[quantizer_info['kind']].from_state(dict(state))
+                store.saved_quantizer_info = quantizer_info
+        store._size = count
+        store._capacity = count
+        return store, meta
+
+
+def load_legacy_pickle(
+    path: str,
+    encode_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+    **store_kwargs
+) -> Tuple[CorpusStore, Dict[str, any]]:
+    """
+    Muat corpus format v1 (pickle berisi list segmen dengan embedding list float).
+
+    Args:
+        path: File pickle
+        encode_fn: Fallback untuk meng-encode ulang teks jika embedding rusak/hilang
+
+    Returns:
+        (store, metadata) dengan metadata berisi format_version dan model_name
+    """
+    import pickle
+    with open(path, 'rb') as f:
+        data = pickle.load(f)
+    segments_raw = data.get('segments', [])
+    store = CorpusStore(**store_kwargs)
+    # Kelompokkan segmen berurutan per source agar append dilakukan per batch
+    batch: List[Dict[str, any]] = []
+    for seg in segments_raw + [None]:
+        if batch and (seg is None or seg['source_id'] != batch[0]['source_id']):
+            texts = [b['text'] for b in batch]
+            try:
+                embeddings = np.asarray([b['embedding'] for b in batch], dtype=np.float32)
+                if embeddings.ndim != 2:
+                    raise ValueError("embedding tidak lengkap")
+            except Exception:
+                if encode_fn is None:
+                    raise
+                embeddings = encode_fn(texts)
+            store.append(embeddings, texts=texts, segment_ids=[b['segment_id'] for b in batch], source_id=batch[0]['source_id'])
+            batch = []
+        if seg is not None:
+            batch.append(seg)
+    meta = {'format_version': data.get('format_version', 0), 'model_name': data.get('model_name')}
+    return store, meta
+
+
+def convert_legacy_pickle(pkl_path: str, out_dir: str) -> Dict[str, any]:
+    """Konversi sekali jalan corpus pickle v1 ke direktori format v2."""
+    store, legacy_meta = load_legacy_pickle(pkl_path)
+    meta = store.save(out_dir, model_name=legacy_meta.get('model_name'), extra_meta={'converted_from': os.path.abspath(pkl_path)})
+    return {'success': True, 'segments': meta['count'], 'path': out_dir, 'format_version': meta['format_version']}
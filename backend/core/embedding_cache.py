@@ -0,0 +1,329 @@
+"""
+Embedding Cache
+Cache LRU in-memory (budget byte) dan cache persisten berbasis SQLite (content-addressed)
+yang dipakai bersama oleh worker API dan build_corpus.py
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from loguru import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key BLOB PRIMARY KEY,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+_WHITESPACE_RE = re.compile(r"\s+")
+# Batas parameter per query IN (...) (SQLite default 999)
+_CHUNK = 500
+
+
+def normalize_cache_text(text: str) -> str:
+    """Normalisasi ringan (whitespace) agar teks yang sama dari PDF/form berbeda memakai entri yang sama."""
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class EmbeddingLRUCache:
+    """
+    Cache embedding in-memory dengan eviksi LRU berdasarkan total byte vektor.
+
+    Satu lapisan untuk semua encode di ``PlagiarismDetector`` (segmen, snippet,
+    corpus); key = teks ter-normalisasi sehingga teks yang sama tidak disimpan dua kali.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for text in texts:
+                key = normalize_cache_text(text)
+                vector = self._entries.get(key)
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                results.append(vector)
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = normalize_cache_text(text)
+                vector = np.array(vector, dtype=np.float32)  # salinan sendiri, bukan view batch
+                vector.setflags(write=False)
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self.bytes -= old.nbytes
+                if vector.nbytes > self.max_bytes:
+                    continue
+                self._entries[key] = vector
+                self.bytes += vector.nbytes
+            while self.bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class PersistentEmbeddingCache:
+    """
+    Cache embedding di file SQLite (mode WAL) dengan key hash(model_name, teks ter-normalisasi).
+
+    Aman dipakai beberapa proses sekaligus (uvicorn workers, build_corpus.py);
+    setiap thread memakai koneksi sendiri. Ukuran dibatasi ``max_bytes``: bila
+    terlampaui, entri dengan ``last_access`` terlama dihapus (LRU aproksimasi).
+    Counter hit/miss disimpan per proses dan akumulasi global di tabel ``counters``.
+
+    Pembacaan tidak membuka transaksi tulis: ``last_access`` dan counter
+    ditampung di memori lalu ditulis sekaligus (``flush``) setiap
+    ``flush_interval`` detik / ``flush_batch`` key, ikut transaksi ``put_many``,
+    atau sebelum eviction / stats.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model_name: str,
+        max_bytes: int = 512 * 1024 * 1024,
+        evict_every: int = 1024,
+        timeout: float = 30.0,
+        flush_interval: float = 5.0,
+        flush_batch: int = 1024
+    ):
+        self.path = path
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        # last_access & counter yang belum ditulis ke SQLite
+        self._pending_access: Dict[bytes, float] = {}
+        self._pending_counters: Dict[str, int] = {}
+        self._last_flush = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+        logger.info(f"Embedding cache: {path} (model={model_name}, max {max_bytes // (1024 * 1024)} MB)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def key(self, text: str) -> bytes:
+        payload = f"{self.model_name}\x00{normalize_cache_text(text)}".encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Embedding (float32) per teks, atau None jika belum ada di cache."""
+        if not texts:
+            return []
+        keys = [self.key(t) for t in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        conn = self._conn()
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), _CHUNK):
+            chunk = unique[start:start + _CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for key, dim, vector in conn.execute(
+                f"SELECT key, dim, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            ):
+                found[key] = np.frombuffer(vector, dtype=np.float32, count=dim)
+        results = [found.get(k) for k in keys]
+        hits = sum(r is not None for r in results)
+        misses = len(results) - hits
+        now = time.time()
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            for key in found:
+                self._pending_access[key] = now
+            for name, value in (('hits', hits), ('misses', misses)):
+                self._pending_counters[name] = self._pending_counters.get(name, 0) + value
+            due = len(self._pending_access) >= self.flush_batch or time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+        return results
+
+    def _take_pending(self):
+        with self._lock:
+            access, counters = self._pending_access, self._pending_counters
+            self._pending_access, self._pending_counters = {}, {}
+            self._last_flush = time.monotonic()
+        return access, counters
+
+    def _write_pending(self, conn: sqlite3.Connection, access: Dict[bytes, float], counters: Dict[str, int]):
+        if access:
+            conn.executemany(
+                "UPDATE embeddings SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(t, k) for k, t in access.items()]
+            )
+        self._bump(conn, counters)
+
+    def _restore_pending(self, access: Dict[bytes, float], counters: Dict[str, int]):
+        with self._lock:
+            for key, t in access.items():
+                self._pending_access[key] = max(t, self._pending_access.get(key, t))
+            for name, value in counters.items():
+                self._pending_counters[name] = self._pending_counters.get(name, 0) + value
+
+    def flush(self):
+        """Tulis last_access & counter yang tertunda dalam satu transaksi."""
+        access, counters = self._take_pending()
+        if not access and not any(counters.values()):
+            return
+        try:
+            with self._conn() as conn:
+                self._write_pending(conn, access, counters)
+        except sqlite3.Error as e:
+            # Database sibuk (proses lain menulis): coba lagi pada flush berikutnya
+            self._restore_pending(access, counters)
+            logger.warning(f"Embedding cache flush tertunda: {e}")
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Simpan embedding batch (INSERT OR REPLACE), lalu eviction berkala bila melewati ``max_bytes``."""
+        if len(texts) == 0:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        now = time.time()
+        rows = [(self.key(t), int(v.shape[0]), v.tobytes(), now) for t, v in zip(texts, vectors)]
+        conn = self._conn()
+        access, counters = self._take_pending()
+        try:
+            with conn:
+                # Akses tertunda ikut transaksi tulis ini (tanpa transaksi tambahan)
+                self._write_pending(conn, access, counters)
+                conn.executemany("INSERT OR REPLACE INTO embeddings (key, dim, vector, last_access) VALUES (?, ?, ?, ?)", rows)
+                self._bump(conn, {'writes': len(rows)})
+        except sqlite3.Error:
+            self._restore_pending(access, counters)
+            raise
+        with self._lock:
+            self.writes += len(rows)
+            self._writes_since_evict += len(rows)
+            due = self._writes_since_evict >= self.evict_every
+            if due:
+                self._writes_since_evict = 0
+        if due:
+            self.evict()
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, deltas: Dict[str, int]):
+        conn.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [(name, value) for name, value in deltas.items() if value]
+        )
+
+    def _size_bytes(self, conn: sqlite3.Connection) -> int:
+        return int(conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0])
+
+    def evict(self) -> int:
+        """Hapus entri terlama hingga total ukuran vektor <= ``max_bytes``. Return jumlah entri dihapus."""
+        self.flush()
+        conn = self._conn()
+        with conn:
+            total = self._size_bytes(conn)
+            if total <= self.max_bytes:
+                return 0
+            count, = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            avg = total / max(count, 1)
+            # Sisakan ~10% ruang agar eviction tidak terjadi di setiap batch berikutnya
+            n_delete = int((total - 0.9 * self.max_bytes) / avg) + 1
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                (n_delete,)
+            )
+            self._bump(conn, {'evictions': n_delete})
+        with self._lock:
+            self.evictions += n_delete
+        logger.info(f"Embedding cache eviction: {n_delete} entries removed ({total} > {self.max_bytes} bytes)")
+        return n_delete
+
+    def clear(self):
+        self._take_pending()
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM embeddings")
+            conn.execute("DELETE FROM counters")
+
+    def close(self):
+        self.flush()
+
+    def stats(self) -> Dict[str, any]:
+        self.flush()
+        conn = self._conn()
+        entries, = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        totals = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        lookups = self.hits + self.misses
+        return {
+            'path': self.path,
+            'model_name': self.model_name,
+            'entries': int(entries),
+            'bytes': self._size_bytes(conn),
+            'max_bytes': self.max_bytes,
+            'process': {
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            },
+            'global': {name: int(totals.get(name, 0)) for name in ('hits', 'misses', 'writes', 'evictions')}
+        }
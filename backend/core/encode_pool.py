@@ -0,0 +1,140 @@
+"""
+Corpus Encode Pool
+Encode segmen corpus paralel di beberapa proses worker (masing-masing dengan salinan model sendiri)
+"""
+
+import os
+import time
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional
+from loguru import logger
+
+# State per proses worker (diisi oleh _init_worker)
+_worker: Dict[str, any] = {}
+
+
+def _init_worker(model_name: str, inference_backend: str, onnx_cache_dir: str, threads: int, max_tokens: int):
+    """Initializer proses worker: batasi thread BLAS/OpenMP lalu muat model sekali."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    import torch
+    from .encode_scheduler import LengthBucketScheduler
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # sudah di-set (parallel work sudah berjalan)
+    if inference_backend in ("onnx", "onnx-int8"):
+        from .onnx_backend import OnnxSentenceEncoder
+        model = OnnxSentenceEncoder.from_pretrained(
+            model_name, cache_dir=onnx_cache_dir, quantize=inference_backend == "onnx-int8", num_threads=threads
+        )
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name, device="cpu")
+    _worker['model'] = model
+    _worker['scheduler'] = LengthBucketScheduler(
+        model.tokenizer, max_seq_length=getattr(model, 'max_seq_length', None), max_tokens=max_tokens
+    )
+
+
+def _forward(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker['model'].encode(texts, batch_size=len(texts), convert_to_numpy=True), dtype=np.float32)
+
+
+def _encode_chunk(texts: List[str]) -> np.ndarray:
+    return _worker['scheduler'].encode(texts, _forward)
+
+
+class CorpusEncodePool:
+    """
+    Pool proses (spawn) untuk encode corpus massal.
+
+    Setiap worker memuat model sendiri dengan ``threads_per_worker`` thread
+    torch/ORT (default: jumlah core dibagi jumlah worker) sehingga N worker
+    tidak saling berebut core. ``submit(texts)`` membagi teks menjadi chunk
+    ``chunk_size`` yang tersebar ke semua worker dan mengembalikan satu Future
+    berisi (N, dim) float32 dengan urutan input.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        workers: int,
+        threads_per_worker: Optional[int] = None,
+        inference_backend: str = "torch",
+        onnx_cache_dir: str = "data/onnx",
+        chunk_size: int = 128,
+        max_tokens: int = 8192
+    ):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self.segments = 0
+        self.chunks = 0
+        self._first_submit: Optional[float] = None
+        self._last_done: Optional[float] = None
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, inference_backend, onnx_cache_dir, self.threads_per_worker, max_tokens)
+        )
+        logger.info(
+            f"Corpus encode pool: {workers} workers x {self.threads_per_worker} threads "
+            f"(model={model_name}, backend={inference_backend})"
+        )
+
+    def submit(self, texts: List[str]) -> Future:
+        combined: Future = Future()
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        if not chunks:
+            combined.set_result(None)
+            return combined
+        results: List[Optional[np.ndarray]] = [None] * len(chunks)
+        remaining = [len(chunks)]
+        with self._lock:
+            if self._first_submit is None:
+                self._first_submit = time.perf_counter()
+        for i, chunk in enumerate(chunks):
+            future = self._executor.submit(_encode_chunk, chunk)
+            future.add_done_callback(partial(self._chunk_done, combined, results, remaining, i, len(chunk)))
+        return combined
+
+    def _chunk_done(self, combined: Future, results: List, remaining: List[int], i: int, size: int, future: Future):
+        with self._lock:
+            if combined.done():
+                return
+            error = future.exception()
+            if error is not None:
+                combined.set_exception(error)
+                return
+            results[i] = future.result()
+            self.segments += size
+            self.chunks += 1
+            self._last_done = time.perf_counter()
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                combined.set_result(np.concatenate(results))
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            elapsed = (self._last_done - self._first_submit) if self._first_submit and self._last_done else 0.0
+            return {
+                'workers': self.workers,
+                'threads_per_worker': self.threads_per_worker,
+                'segments': self.segments,
+                'chunks': self.chunks,
+                'encode_seconds': round(elapsed, 2),
+                'segments_per_sec': round(self.segments / elapsed, 1) if elapsed > 0 else 0.0
+            }
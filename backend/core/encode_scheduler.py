@@ -0,0 +1,111 @@
+"""
+Encode Scheduler
+Batching encode berdasarkan panjang token: tokenisasi dulu, kelompokkan per bucket panjang, batch per budget token
+"""
+
+import threading
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from loguru import logger
+
+
+class LengthBucketScheduler:
+    """
+    Penjadwal batch encode yang meminimalkan padding.
+
+    Semua teks di-tokenisasi lebih dulu (tanpa padding) untuk mendapatkan panjang
+    token. Teks dikelompokkan ke bucket selebar ``bucket_width`` token sehingga
+    padding per teks di dalam satu batch < ``bucket_width``. Di dalam bucket,
+    teks dipaket hingga ``max_tokens`` (panjang batch ter-padding x jumlah teks)
+    atau ``max_batch_size`` teks — batch segmen pendek jadi besar, batch teks
+    panjang jadi kecil, dan memori aktivasi per forward pass tetap terbatas.
+    Hasil dikembalikan dalam urutan input semula.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        max_seq_length: Optional[int] = None,
+        max_tokens: int = 8192,
+        max_batch_size: int = 128,
+        bucket_width: int = 16
+    ):
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.bucket_width = max(1, bucket_width)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+        self.batches = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.naive_padded_tokens = 0
+
+    def token_lengths(self, texts: List[str]) -> np.ndarray:
+        """Panjang token per teks (termasuk token spesial, dipotong ke ``max_seq_length``)."""
+        kwargs = {'truncation': True, 'max_length': self.max_seq_length} if self.max_seq_length else {}
+        encoded = self.tokenizer([str(t).strip() for t in texts], add_special_tokens=True, **kwargs)
+        return np.array([len(ids) for ids in encoded['input_ids']], dtype=np.int64)
+
+    def plan(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """Bagi index teks menjadi batch (list array index) berdasarkan bucket panjang dan budget token."""
+        order = np.argsort(-lengths, kind='stable')
+        buckets = (lengths[order] - 1) // self.bucket_width
+        batches: List[np.ndarray] = []
+        start = 0
+        for end in np.flatnonzero(np.diff(buckets)).tolist() + [len(order) - 1]:
+            bucket = order[start:end + 1]
+            # Teks terpanjang bucket menentukan panjang padding setiap batch di bucket ini (urutan menurun)
+            i = 0
+            while i < bucket.size:
+                per_batch = max(1, min(self.max_batch_size, self.max_tokens // max(int(lengths[bucket[i]]), 1)))
+                batches.append(bucket[i:i + per_batch])
+                i += per_batch
+            start = end + 1
+        return batches
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Encode ``texts`` per batch hasil ``plan`` lewat ``encode_fn``; return (N, dim) urutan semula."""
+        if not texts:
+            return encode_fn([])
+        lengths = self.token_lengths(texts)
+        batches = self.plan(lengths)
+        result: Optional[np.ndarray] = None
+        padded = 0
+        for idx in batches:
+            vectors = np.asarray(encode_fn([texts[i] for i in idx]), dtype=np.float32)
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            result[idx] = vectors
+            padded += int(lengths[idx].max()) * idx.size
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+            self.batches += len(batches)
+            self.real_tokens += int(lengths.sum())
+            self.padded_tokens += padded
+            # Pembanding: batch berurutan berisi max_batch_size teks tanpa pengurutan panjang
+            self.naive_padded_tokens += sum(
+                int(lengths[s:s + self.max_batch_size].max()) * len(lengths[s:s + self.max_batch_size])
+                for s in range(0, len(lengths), self.max_batch_size)
+            )
+        if len(batches) > 1:
+            logger.debug(f"Encode scheduler: {len(texts)} teks -> {len(batches)} batch, padding {padded - int(lengths.sum())} token")
+        return result
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            return {
+                'max_tokens': self.max_tokens,
+                'max_batch_size': self.max_batch_size,
+                'bucket_width': self.bucket_width,
+                'calls': self.calls,
+                'texts': self.texts,
+                'batches': self.batches,
+                'real_tokens': self.real_tokens,
+                'padded_tokens': self.padded_tokens,
+                'padding_ratio': round(1 - self.real_tokens / self.padded_tokens, 4) if self.padded_tokens else 0.0,
+                'naive_padding_ratio': round(1 - self.real_tokens / self.naive_padded_tokens, 4) if self.naive_padded_tokens else 0.0
+            }
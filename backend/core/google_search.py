@@ -0,0 +1,202 @@
+"""
+Google CSE Client
+Query Google Custom Search paralel (client per thread) dengan batas konkurensi dan rate limit token bucket
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from loguru import logger
+
+from .search_cache import SearchResultCache, normalize_query
+from .search_provider import SearchProvider
+
+# Status HTTP yang layak dicoba ulang (quota per menit / error sementara server)
+_RETRY_STATUS = {429, 500, 502, 503}
+
+
+class TokenBucket:
+    """
+    Rate limiter token bucket (thread-safe).
+
+    Token terisi ``rate`` per detik hingga ``capacity`` (burst). ``acquire``
+    memblok sampai satu token tersedia dan mengembalikan lama menunggu.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class GoogleSearchClient(SearchProvider):
+    """
+    Client Google Custom Search untuk banyak query sekaligus.
+
+    Transport httplib2 di ``googleapiclient`` tidak thread-safe, sehingga setiap
+    thread worker membangun service sendiri (``threading.local``). Maksimal
+    ``max_concurrency`` request berjalan bersamaan dan laju request dibatasi
+    token bucket ``rate_limit`` query/detik (burst ``burst``) agar sesuai quota.
+    ``search_many`` mengembalikan hasil dengan urutan yang sama dengan query.
+    Jika ``cache`` diberikan, query yang sudah pernah dicari (dan belum
+    kedaluwarsa) tidak dikirim ulang ke CSE; hanya hasil sukses yang di-cache.
+    """
+
+    kind = "google"
+
+    def __init__(
+        self,
+        api_key: str,
+        cse_id: str,
+        max_concurrency: int = 4,
+        rate_limit: float = 5.0,
+        burst: Optional[float] = None,
+        max_retries: int = 2,
+        cache: Optional[SearchResultCache] = None,
+        service_factory: Optional[Callable[[], any]] = None
+    ):
+        self.api_key = api_key
+        self.cse_id = cse_id
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.cache = cache
+        self.bucket = TokenBucket(rate_limit, burst if burst is not None else float(self.max_concurrency))
+        self._service_factory = service_factory or self._build_service
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="google-cse")
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rate_limited_seconds = 0.0
+        self._in_flight = 0
+        self.max_in_flight = 0
+
+    def _build_service(self):
+        from googleapiclient.discovery import build
+        return build("customsearch", "v1", developerKey=self.api_key, cache_discovery=False)
+
+    def _service(self):
+        """Service CSE milik thread ini (dibuat sekali per thread)."""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self._service_factory()
+        return service
+
+    def _fetch(self, query: str, num_results: int) -> Optional[List[Dict[str, str]]]:
+        """Satu request CSE (query sudah ter-normalisasi). Return None jika gagal (tidak di-cache)."""
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire()
+            with self._lock:
+                self.rate_limited_seconds += waited
+                self.requests += 1
+                self._in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            try:
+                result = self._service().cse().list(q=query, cx=self.cse_id, num=num_results).execute()
+                break
+            except Exception as e:
+                status = getattr(getattr(e, 'resp', None), 'status', None)
+                if status in _RETRY_STATUS and attempt < self.max_retries:
+                    with self._lock:
+                        self.retries += 1
+                    time.sleep(0.5 * 2 ** attempt)
+                    continue
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"Error searching Google: {e}")
+                return None
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+        search_results = [
+            {
+                'title': item.get('title', ''),
+                'snippet': item.get('snippet', ''),
+                'url': item.get('link', ''),
+                'source': item.get('displayLink', '')
+            }
+            for item in result.get('items', [])
+        ]
+        logger.info(f"Found {len(search_results)} results for query: {query[:50]}...")
+        return search_results
+
+    def _cache_get(self, queries: List[str], num_results: int) -> List[Optional[List[Dict[str, str]]]]:
+        if self.cache is None:
+            return [None] * len(queries)
+        try:
+            return self.cache.get_many(queries, num_results)
+        except Exception as e:
+            logger.error(f"Gagal membaca search cache: {e}")
+            return [None] * len(queries)
+
+    def _cache_put(self, queries: List[str], results: List[Optional[List[Dict[str, str]]]], num_results: int):
+        fetched = [(q, r) for q, r in zip(queries, results) if r is not None]
+        if self.cache is None or not fetched:
+            return
+        try:
+            self.cache.put_many([q for q, _ in fetched], [r for _, r in fetched], num_results)
+        except Exception as e:
+            logger.error(f"Gagal menulis search cache: {e}")
+
+    def search(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
+        """Satu query CSE (di thread pemanggil, lewat cache). Error dicatat dan menghasilkan list kosong."""
+        return self.search_many([query], num_results)[0]
+
+    def search_many(self, queries: List[str], num_results: int = 5) -> List[List[Dict[str, str]]]:
+        """
+        Jalankan banyak query paralel (dibatasi konkurensi & rate limit). Return hasil urut sesuai ``queries``.
+
+        Query dinormalisasi (whitespace, 128 karakter) sebelum lookup cache; query
+        identik dalam satu batch hanya dikirim sekali.
+        """
+        if not queries:
+            return []
+        normalized = [normalize_query(q) for q in queries]
+        cached = self._cache_get(normalized, num_results)
+        missing = list(dict.fromkeys(q for q, r in zip(normalized, cached) if r is None))
+        if len(missing) == 1:
+            fetched = [self._fetch(missing[0], num_results)]
+        else:
+            fetched = list(self._executor.map(lambda q: self._fetch(q, num_results), missing))
+        self._cache_put(missing, fetched, num_results)
+        lookup = dict(zip(missing, fetched))
+        return [r if r is not None else (lookup.get(q) or []) for q, r in zip(normalized, cached)]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            stats = {
+                'kind': self.kind,
+                'max_concurrency': self.max_concurrency,
+                'rate_limit': self.bucket.rate,
+                'burst': self.bucket.capacity,
+                'requests': self.requests,
+                'errors': self.errors,
+                'retries': self.retries,
+                'max_in_flight': self.max_in_flight,
+                'rate_limited_seconds': round(self.rate_limited_seconds, 3)
+            }
+        stats['cache'] = self.cache.stats() if self.cache is not None else None
+        return stats
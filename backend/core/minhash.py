@@ -0,0 +1,209 @@
+"""
+MinHash / LSH
+Prefilter leksikal (word shingles) untuk menemukan segmen corpus yang hampir verbatim secara murah
+"""
+
+import re
+import zlib
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+
+# Prime > 2^32 untuk universal hashing (a*x + b) mod p; a, x < 2^32 sehingga tidak overflow uint64
+_MERSENNE_PRIME = np.uint64(4294967311)
+_EMPTY_HASH = np.uint32(0xFFFFFFFF)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def word_shingles(text: str, size: int = 3) -> List[str]:
+    """Shingle k-kata (lowercase). Teks lebih pendek dari k menghasilkan satu shingle."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+class MinHashLSH:
+    """
+    Signature MinHash per segmen + index LSH berbasis band.
+
+    Signature (num_perm,) uint32; index membagi signature menjadi ``bands`` band
+    berisi ``num_perm / bands`` baris. Dua segmen menjadi kandidat jika minimal
+    satu band identik; Jaccard diestimasi dari fraksi posisi signature yang sama.
+    Key band disimpan dalam array numpy terurut (searchsorted) agar ringkas untuk
+    ratusan ribu segmen.
+
+    Signature & key ditulis ke buffer berkapasitas amortized (seperti
+    ``CorpusStore.append``). Baris baru masuk ke tail yang belum terurut (hanya
+    tail yang di-sort saat query); setelah ``tail_size`` baris, tail disegel
+    menjadi run terurut dan run bertetangga dengan ukuran sebanding digabung,
+    sehingga build bertahap O(N log N) dan query cukup searchsorted per run.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 1,
+        tail_size: int = 4096,
+        growth_factor: float = 1.5
+    ):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm harus habis dibagi bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.tail_size = tail_size
+        self.growth_factor = growth_factor
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), num_perm, dtype=np.uint64)
+        # Pengali untuk menggabungkan nilai satu band menjadi satu key uint64
+        self._band_mix = rng.integers(1, 2 ** 63, self.rows_per_band, dtype=np.uint64) | np.uint64(1)
+        self.clear()
+
+    def clear(self):
+        self._size = 0
+        self._capacity = 0
+        self._signatures = np.empty((0, self.num_perm), dtype=np.uint32)
+        self._band_keys = np.empty((0, self.bands), dtype=np.uint64)
+        # Run terurut (keys, rows) per band untuk baris [0, _indexed); sisanya tail
+        self._runs: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._indexed = 0
+        self._tail_run: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        # Total baris yang pernah di-sort/merge (ukuran kerja build index)
+        self.sorted_rows = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ------------------------------------------------------------------
+    # Signature
+    # ------------------------------------------------------------------
+    def signature(self, text: str) -> np.ndarray:
+        shingles = word_shingles(text, self.shingle_size)
+        if not shingles:
+            return np.full(self.num_perm, _EMPTY_HASH, dtype=np.uint32)
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in set(shingles)), dtype=np.uint64)
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.num_perm), dtype=np.uint32)
+        return np.stack([self.signature(t) for t in texts])
+
+    def _keys(self, signatures: np.ndarray) -> np.ndarray:
+        banded = signatures.astype(np.uint64).reshape(-1, self.bands, self.rows_per_band)
+        # Perkalian uint64 sengaja wrap-around (hash mixing)
+        with np.errstate(over='ignore'):
+            return (banded * self._band_mix).sum(axis=2)
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+    def add(self, texts: List[str]) -> range:
+        return self.add_signatures(self.signatures(texts))
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, int(self._capacity * self.growth_factor), 1024)
+        signatures = np.empty((capacity, self.num_perm), dtype=np.uint32)
+        band_keys = np.empty((capacity, self.bands), dtype=np.uint64)
+        signatures[:self._size] = self._signatures[:self._size]
+        band_keys[:self._size] = self._band_keys[:self._size]
+        self._signatures, self._band_keys = signatures, band_keys
+        self._capacity = capacity
+
+    def add_signatures(self, signatures: np.ndarray) -> range:
+        start = self._size
+        end = start + signatures.shape[0]
+        self._ensure_capacity(end)
+        self._signatures[start:end] = signatures
+        self._band_keys[start:end] = self._keys(signatures)
+        self._size = end
+        self._tail_run = None
+        if end - self._indexed >= self.tail_size:
+            self._seal_tail()
+        return range(start, end)
+
+    def _sort_rows(self, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        keys = self._band_keys[start:end]
+        order = np.argsort(keys, axis=0, kind='stable')  # (n, bands)
+        self.sorted_rows += end - start
+        return np.take_along_axis(keys, order, axis=0), order + start
+
+    def _seal_tail(self):
+        """Jadikan tail run terurut, lalu gabung run yang tidak lebih besar dari run sesudahnya (merge bertingkat)."""
+        self._runs.append(self._sort_rows(self._indexed, self._size))
+        self._indexed = self._size
+        self._tail_run = None
+        while len(self._runs) > 1 and len(self._runs[-2][0]) <= len(self._runs[-1][0]):
+            (keys_a, rows_a), (keys_b, rows_b) = self._runs[-2:]
+            keys = np.concatenate([keys_a, keys_b])
+            rows = np.concatenate([rows_a, rows_b])
+            # Dua run terurut: sort stabil (timsort) menggabungkan secara linear, baris lama tetap di depan
+            order = np.argsort(keys, axis=0, kind='stable')
+            self.sorted_rows += len(keys)
+            self._runs[-2:] = [(np.take_along_axis(keys, order, axis=0), np.take_along_axis(rows, order, axis=0))]
+
+    def _sorted_runs(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        if self._indexed == self._size:
+            return self._runs
+        if self._tail_run is None:
+            self._tail_run = self._sort_rows(self._indexed, self._size)
+        return self._runs + [self._tail_run]
+
+    def prepare(self):
+        """Urutkan tail sekarang agar ``query`` read-only (aman untuk banyak thread pembaca)."""
+        self._sorted_runs()
+
+    def query(self, signatures: np.ndarray, max_candidates: int = 256) -> List[np.ndarray]:
+        """Kandidat baris corpus per signature query (minimal satu band identik)."""
+        if self._size == 0:
+            return [np.empty(0, dtype=np.int64) for _ in range(signatures.shape[0])]
+        keys = self._keys(signatures)
+        candidates: List[List[np.ndarray]] = [[] for _ in range(signatures.shape[0])]
+        for sorted_keys, sorted_rows in self._sorted_runs():
+            for b in range(self.bands):
+                lo = np.searchsorted(sorted_keys[:, b], keys[:, b], side='left')
+                hi = np.searchsorted(sorted_keys[:, b], keys[:, b], side='right')
+                for qi in np.flatnonzero(hi > lo):
+                    # Bucket raksasa (mis. boilerplate) dibatasi agar biaya query tetap kecil
+                    candidates[qi].append(sorted_rows[lo[qi]:min(hi[qi], lo[qi] + max_candidates), b])
+        return [np.unique(np.concatenate(c)) if c else np.empty(0, dtype=np.int64) for c in candidates]
+
+    def jaccard(self, signature: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Estimasi Jaccard antara satu signature dan baris-baris index."""
+        return (self._signatures[rows] == signature[None, :]).mean(axis=1)
+
+    def stats(self) -> Dict[str, any]:
+        return {
+            'segments': self._size,
+            'num_perm': self.num_perm,
+            'bands': self.bands,
+            'shingle_size': self.shingle_size,
+            'sorted_runs': len(self._runs),
+            'tail': self._size - self._indexed,
+            'sorted_rows': self.sorted_rows,
+            'memory_bytes': int(self._signatures.nbytes + self._band_keys.nbytes + sum(k.nbytes + r.nbytes for k, r in self._runs))
+        }
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                signatures=self._signatures[:self._size],
+                params=np.array([self.num_perm, self.bands, self.shingle_size, self.seed])
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "MinHashLSH":
+        data = np.load(path)
+        num_perm, bands, shingle_size, seed = (int(x) for x in data['params'])
+        index = cls(num_perm=num_perm, bands=bands, shingle_size=shingle_size, seed=seed)
+        index.add_signatures(data['signatures'])
+        return index
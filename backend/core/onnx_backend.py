@@ -0,0 +1,304 @@
+"""
+ONNX Runtime Backend
+Export model Sentence-BERT sekali ke ONNX (opsional int8 dynamic quantization) dan encode lewat ONNX Runtime
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import inspect
+import numpy as np
+from typing import Dict, List, Optional, Union
+from loguru import logger
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+CONFIG_FILE = "onnx_config.json"
+ONNX_OPSET = 14
+
+# Toleransi terhadap embedding PyTorch (cosine minimal per kalimat) yang dicek saat export dan oleh benchmark_encoder.py.
+# fp32: perbedaan hanya dari urutan operasi float (max abs diff biasanya < 1e-5).
+# int8: bobot Linear di-quantize per-tensor sehingga ada deviasi kecil, cukup untuk threshold similarity 0.75.
+ONNX_TOLERANCE = {
+    'onnx': 0.9999,
+    'onnx-int8': 0.98
+}
+
+_VERIFY_TEXTS = [
+    "Deteksi plagiarisme semantik membandingkan makna kalimat, bukan hanya kata yang sama.",
+    "Semantic plagiarism detection compares sentence meaning rather than exact wording.",
+    "Penelitian ini menggunakan Sentence-BERT untuk menghasilkan embedding setiap segmen teks.",
+    "singkat"
+]
+
+
+def onnx_artifact_dir(cache_dir: str, model_name: str) -> str:
+    """Folder artefak ONNX untuk satu model (nama model di-sanitasi)."""
+    return os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9._-]+", "__", model_name.strip("/")))
+
+
+def _pooling_mode(config: Dict[str, any]) -> str:
+    """Mode pooling dari config modul Pooling (format sentence-transformers lama maupun baru)."""
+    mode = config.get('pooling_mode')
+    if mode:
+        if mode not in ('mean', 'cls', 'max'):
+            raise ValueError(f"Pooling '{mode}' belum didukung backend ONNX")
+        return mode
+    if config.get('pooling_mode_mean_sqrt_len_tokens') or config.get('pooling_mode_weightedmean_tokens') \
+            or config.get('pooling_mode_lasttoken'):
+        raise ValueError("Pooling selain mean/cls/max belum didukung backend ONNX")
+    if config.get('pooling_mode_cls_token'):
+        return 'cls'
+    if config.get('pooling_mode_max_tokens'):
+        return 'max'
+    return 'mean'
+
+
+class OnnxSentenceEncoder:
+    """
+    Pengganti ``SentenceTransformer`` untuk inference CPU via ONNX Runtime.
+
+    Yang di-export hanya transformer (token embeddings); tokenisasi memakai
+    tokenizer HuggingFace yang disimpan di folder artefak, pooling dan
+    normalisasi dikerjakan di numpy. Dengan begitu model PyTorch hanya dimuat
+    sekali saat export pertama. ``encode`` mengikuti signature
+    ``SentenceTransformer.encode`` yang dipakai di repo ini.
+    """
+
+    def __init__(
+        self,
+        artifact_dir: str,
+        quantized: bool = False,
+        device: str = "cpu",
+        num_threads: Optional[int] = None
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(artifact_dir, CONFIG_FILE), 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+        self.artifact_dir = artifact_dir
+        self.quantized = quantized
+        self.model_name = self.config['model_name']
+        self.pooling = self.config['pooling']
+        self.normalize = self.config['normalize']
+        self.max_seq_length = self.config['max_seq_length']
+        self.do_lower_case = self.config.get('do_lower_case', False)
+        self.input_names = self.config['input_names']
+        self.tokenizer = AutoTokenizer.from_pretrained(artifact_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        providers = ['CPUExecutionProvider']
+        if device == "cuda" and 'CUDAExecutionProvider' in ort.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+        path = os.path.join(artifact_dir, ONNX_INT8_FILE if quantized else ONNX_FILE)
+        self.session = ort.InferenceSession(path, sess_options=options, providers=providers)
+        logger.info(f"ONNX Runtime session: {path} (providers={self.session.get_providers()})")
+
+    # ------------------------------------------------------------------
+    # Export / cache artefak
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_pretrained(
+        cls,
+        model_name: str,
+        cache_dir: str = "data/onnx",
+        quantize: bool = False,
+        device: str = "cpu",
+        num_threads: Optional[int] = None
+    ) -> "OnnxSentenceEncoder":
+        """Muat artefak ONNX dari cache; export (dan quantize) sekali jika belum ada."""
+        artifact_dir = onnx_artifact_dir(cache_dir, model_name)
+        if not os.path.exists(os.path.join(artifact_dir, CONFIG_FILE)):
+            cls.export(model_name, artifact_dir)
+        if quantize and not os.path.exists(os.path.join(artifact_dir, ONNX_INT8_FILE)):
+            cls.quantize(artifact_dir)
+        return cls(artifact_dir, quantized=quantize, device=device, num_threads=num_threads)
+
+    @staticmethod
+    def export(model_name: str, artifact_dir: str) -> Dict[str, any]:
+        """
+        Export transformer ``model_name`` ke ``artifact_dir``/model.onnx (+ tokenizer, config).
+
+        Export ditulis ke folder sementara lalu di-rename, sehingga beberapa
+        worker yang start bersamaan tidak membaca artefak setengah jadi.
+        """
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        start = time.time()
+        logger.info(f"Export ONNX: {model_name} -> {artifact_dir}")
+        st_model = SentenceTransformer(model_name, device="cpu")
+        modules = [type(m).__name__ for m in st_model]
+        if modules[:2] != ['Transformer', 'Pooling'] or any(m != 'Normalize' for m in modules[2:]):
+            raise ValueError(f"Arsitektur {modules} belum didukung backend ONNX")
+        transformer = st_model[0]
+        auto_model = transformer.auto_model.eval()
+        tokenizer = st_model.tokenizer
+        dummy = tokenizer(_VERIFY_TEXTS[:2], padding=True, truncation=True, return_tensors='pt')
+        input_names = [n for n in ('input_ids', 'attention_mask', 'token_type_ids') if n in dummy]
+
+        class _TokenEmbeddings(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, *inputs):
+                return self.model(**dict(zip(input_names, inputs)), return_dict=False)[0]
+
+        tmp_dir = f"{artifact_dir}.tmp{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        export_kwargs = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+        axes = {0: 'batch', 1: 'sequence'}
+        with torch.no_grad():
+            torch.onnx.export(
+                _TokenEmbeddings(auto_model),
+                tuple(dummy[n] for n in input_names),
+                os.path.join(tmp_dir, ONNX_FILE),
+                input_names=input_names,
+                output_names=['token_embeddings'],
+                dynamic_axes={**{n: axes for n in input_names}, 'token_embeddings': axes},
+                opset_version=ONNX_OPSET,
+                do_constant_folding=True,
+                **export_kwargs
+            )
+        tokenizer.save_pretrained(tmp_dir)
+        config = {
+            'model_name': model_name,
+            'modules': modules,
+            'pooling': _pooling_mode(st_model[1].get_config_dict()),
+            'normalize': 'Normalize' in modules,
+            'max_seq_length': int(st_model.max_seq_length),
+            'do_lower_case': bool(getattr(transformer, 'do_lower_case', False)),
+            'dim': int(st_model.get_sentence_embedding_dimension()),
+            'input_names': input_names,
+            'opset': ONNX_OPSET,
+            'torch_version': torch.__version__,
+            'exported_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        with open(os.path.join(tmp_dir, CONFIG_FILE), 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2)
+
+        # Verifikasi sebelum artefak dipublikasikan: output ONNX harus sama dengan PyTorch
+        encoder = OnnxSentenceEncoder(tmp_dir)
+        report = compare_embeddings(
+            st_model.encode(_VERIFY_TEXTS, convert_to_numpy=True), encoder.encode(_VERIFY_TEXTS)
+        )
+        if report['min_cosine'] < ONNX_TOLERANCE['onnx']:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise RuntimeError(f"Output ONNX menyimpang dari PyTorch: {report}")
+        config['verification'] = report
+        with open(os.path.join(tmp_dir, CONFIG_FILE), 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2)
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(artifact_dir)), exist_ok=True)
+            os.rename(tmp_dir, artifact_dir)
+        except OSError:
+            # Worker lain sudah lebih dulu mem-publish artefak yang sama
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.info(f"Export ONNX selesai dalam {time.time() - start:.1f}s (max abs diff {report['max_abs_diff']:.2e})")
+        return config
+
+    @staticmethod
+    def quantize(artifact_dir: str) -> str:
+        """Dynamic quantization int8 (bobot) dari model.onnx -> model.int8.onnx."""
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        source = os.path.join(artifact_dir, ONNX_FILE)
+        target = os.path.join(artifact_dir, ONNX_INT8_FILE)
+        tmp = f"{target}.tmp{os.getpid()}"
+        start = time.time()
+        quantize_dynamic(source, tmp, weight_type=QuantType.QInt8)
+        os.replace(tmp, target)
+        logger.info(
+            f"Quantize int8 selesai dalam {time.time() - start:.1f}s "
+            f"({os.path.getsize(source) // (1024 * 1024)} MB -> {os.path.getsize(target) // (1024 * 1024)} MB)"
+        )
+        return target
+
+    # ------------------------------------------------------------------
+    # Encode
+    # ------------------------------------------------------------------
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dim']
+
+    def tokenize(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        texts = [str(t).strip() for t in texts]
+        if self.do_lower_case:
+            texts = [t.lower() for t in texts]
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors='np'
+        )
+        return {name: encoded[name].astype(np.int64) for name in self.input_names}
+
+    def _pool(self, token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self.pooling == 'cls':
+            pooled = token_embeddings[:, 0]
+        elif self.pooling == 'max':
+            masked = np.where(attention_mask[:, :, None] > 0, token_embeddings, -1e9)
+            pooled = masked.max(axis=1)
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled.astype(np.float32, copy=False)
+
+    def token_embeddings(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """Forward pass transformer untuk input yang sudah di-tokenisasi. Return (N, T, dim) float32."""
+        return self.session.run(None, {name: np.asarray(inputs[name], dtype=np.int64) for name in self.input_names})[0]
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Satu forward pass ONNX untuk satu batch. Return (N, dim) float32."""
+        inputs = self.tokenize(texts)
+        token_embeddings = self.token_embeddings(inputs)
+        embeddings = self._pool(token_embeddings, inputs['attention_mask'])
+        if self.normalize:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        convert_to_tensor: bool = False,
+        normalize_embeddings: bool = False,
+        **kwargs
+    ):
+        """Kompatibel dengan ``SentenceTransformer.encode`` (show_progress_bar, device, dll diabaikan)."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        dim = self.get_sentence_embedding_dimension()
+        result = np.empty((len(texts), dim), dtype=np.float32)
+        # Urutkan menurut panjang seperti SentenceTransformer agar padding per batch minimal
+        order = np.argsort([-len(t) for t in texts], kind='stable')
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            result[idx] = self.encode_batch([texts[i] for i in idx])
+        if normalize_embeddings:
+            result /= np.clip(np.linalg.norm(result, axis=1, keepdims=True), 1e-12, None)
+        if single:
+            result = result[0]
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(result)
+        return result
+
+
+def compare_embeddings(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Ringkasan deviasi embedding kandidat terhadap referensi (PyTorch)."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    ref_n = reference / np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    cand_n = candidate / np.clip(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12, None)
+    cosine = (ref_n * cand_n).sum(axis=1)
+    return {
+        'max_abs_diff': float(np.abs(reference - candidate).max()) if reference.size else 0.0,
+        'min_cosine': float(cosine.min()) if cosine.size else 1.0,
+        'mean_cosine': float(cosine.mean()) if cosine.size else 1.0
+    }
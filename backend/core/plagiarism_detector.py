@@ -5,14 +5,37 @@ Integrasi Google CSE dan Sentence-BERT untuk Deteksi Plagiarisme Semantik
 
 import os
 import re
+import time
+import hashlib
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from collections import deque
+from contextlib import ExitStack
+from typing import Callable, List, Dict, Tuple, Optional
 from sentence_transformers import SentenceTransformer, util
-from googleapiclient.discovery import build
 from loguru import logger
 import torch
-from functools import lru_cache
 
+from .corpus_store import CorpusStore, CORPUS_FORMAT_VERSION, load_legacy_pickle, l2_normalize
+from .quantization import create_quantizer
+from .ann_index import ANNIndex, create_ann_index, load_ann_index
+from .corpus_log import CorpusSegmentLog, LOG_FILE_NAME, apply_append_record
+from .rw_lock import ReadWriteLock
+from .sharding import ShardedCorpusClient
+from .minhash import MinHashLSH
+from .source_index import SourceCentroidIndex
+from .embedding_cache import EmbeddingLRUCache, PersistentEmbeddingCache
+from .cached_encoder import CachedEncoder, to_numpy
+from .batch_encoder import MicroBatchEncoder
+from .onnx_backend import OnnxSentenceEncoder
+from .encode_scheduler import LengthBucketScheduler
+from .encode_pool import CorpusEncodePool
+from .cascade import CascadeScreener, SCREEN_FILE
+from .span_encoder import SpanPoolingEncoder
+from .search_provider import SearchProvider
+from .google_search import GoogleSearchClient
+from .bm25_search import BM25SearchProvider
+from .search_cache import SearchResultCache
+from .query_planner import SearchQueryPlanner
 
 
 class PlagiarismDetector:
@@ -29,7 +52,56 @@ class PlagiarismDetector:
         similarity_threshold: float = 0.75,
         segment_size: int = 25,
         overlap: int = 5,
-        cache_size: int = 512
+        cache_size: Optional[int] = None,
+        memory_cache_mb: float = 64,
+        local_top_k: int = 3,
+        corpus_block_size: int = 16384,
+        index_type: str = "exact",
+        ann_min_corpus_size: int = 20000,
+        ann_nprobe: int = 8,
+        ann_n_lists: Optional[int] = None,
+        corpus_storage: str = "float32",
+        corpus_spill_dir: Optional[str] = None,
+        quantize_rerank_k: int = 32,
+        projection_dims: int = 128,
+        corpus_log_enabled: bool = False,
+        corpus_log_compact_segments: int = 20000,
+        lexical_prefilter: bool = True,
+        lexical_resolve_jaccard: float = 0.5,
+        minhash_num_perm: int = 64,
+        minhash_bands: int = 16,
+        dedup_corpus: bool = True,
+        dedup_threshold: float = 0.97,
+        hierarchical_top_sources: int = 0,
+        source_centroids: int = 1,
+        embedding_cache_path: Optional[str] = None,
+        embedding_cache_max_mb: int = 512,
+        micro_batching: bool = False,
+        micro_batch_size: int = 64,
+        micro_batch_wait_ms: float = 5.0,
+        inference_backend: str = "torch",
+        onnx_cache_dir: str = "data/onnx",
+        inference_threads: Optional[int] = None,
+        length_bucketing: bool = True,
+        encode_max_tokens: int = 8192,
+        encode_max_batch: int = 128,
+        encode_bucket_width: int = 16,
+        cascade: bool = False,
+        cascade_model_name: Optional[str] = None,
+        cascade_threshold: float = 0.55,
+        segment_encoding: str = "window",
+        span_chunk_tokens: int = 256,
+        search_max_concurrency: int = 4,
+        search_rate_limit: float = 5.0,
+        search_cache_path: Optional[str] = None,
+        search_cache_ttl_hours: float = 168,
+        search_cache_negative_ttl_hours: float = 24,
+        search_cache_max_mb: int = 64,
+        search_planning: bool = True,
+        search_query_words: int = 16,
+        search_query_budget: int = 0,
+        search_provider: str = "google",
+        search_snapshot_dir: Optional[str] = None
     ):
         """
         Inisialisasi Plagiarism Detector
@@ -41,6 +113,56 @@ class PlagiarismDetector:
             similarity_threshold: Threshold untuk klasifikasi plagiat (0-1)
             segment_size: Jumlah kata per segment
             overlap: Jumlah kata overlap antar segment
+            cache_size: Deprecated, jumlah entri cache embedding; dipetakan ke ``memory_cache_mb`` (entri x ukuran vektor)
+            memory_cache_mb: Budget memori (MB) cache LRU embedding in-memory
+            local_top_k: Jumlah kandidat local corpus teratas per segmen
+            corpus_block_size: Jumlah baris corpus per blok matmul saat matching batch
+            index_type: 'exact' (brute-force) atau tipe index ANN ('ivf')
+            ann_min_corpus_size: Di bawah ukuran ini tetap pakai exact search
+            ann_nprobe: Jumlah cluster IVF yang di-scan per query (recall vs speed)
+            ann_n_lists: Jumlah cluster IVF (default: ~4*sqrt(N))
+            corpus_storage: 'float32', 'int8', 'pq' (vektor terkompresi) atau 'pca' / 'truncate' (proyeksi dimensi rendah)
+            corpus_spill_dir: Folder file memmap float32 untuk re-ranking exact (default: temp dir)
+            quantize_rerank_k: Jumlah kandidat aproksimasi yang di-skor ulang secara exact
+            projection_dims: Dimensi pencarian tahap pertama untuk storage 'pca' / 'truncate'
+            corpus_log_enabled: Catat setiap add_to_corpus ke log append-only di direktori corpus
+            corpus_log_compact_segments: Compaction (snapshot + reset log) setelah sekian segmen di log
+            lexical_prefilter: Pakai index MinHash/LSH sebagai kandidat cepat sebelum matching SBERT
+            lexical_resolve_jaccard: Estimasi Jaccard minimal agar segmen cukup di-skor pada kandidat LSH saja
+            minhash_num_perm: Panjang signature MinHash
+            minhash_bands: Jumlah band LSH (rows per band = num_perm / bands)
+            dedup_corpus: Simpan segmen duplikat / hampir duplikat sekali (source lain dicatat sebagai owner)
+            dedup_threshold: Cosine minimal antar embedding untuk dianggap hampir duplikat
+            hierarchical_top_sources: Jumlah source (M) yang di-shortlist per submission sebelum matching segmen (0 = flat)
+            source_centroids: Jumlah centroid per source pada index dokumen (1 = mean segmen)
+            embedding_cache_path: File SQLite cache embedding persisten (dipakai bersama antar worker; None = nonaktif)
+            embedding_cache_max_mb: Batas ukuran cache embedding persisten (MB)
+            micro_batching: Gabungkan encode dari request/thread yang berjalan bersamaan ke satu forward pass
+            micro_batch_size: Maksimum teks per forward pass micro-batch
+            micro_batch_wait_ms: Waktu tunggu maksimum untuk mengumpulkan batch
+            inference_backend: 'torch', 'onnx' atau 'onnx-int8' (ONNX Runtime, artefak export di-cache)
+            onnx_cache_dir: Folder cache artefak export ONNX per model
+            inference_threads: Jumlah thread intra-op ONNX Runtime (None = default ORT)
+            length_bucketing: Tokenisasi dulu lalu batch encode per bucket panjang token (padding minimal)
+            encode_max_tokens: Budget token (panjang ter-padding x jumlah teks) per forward pass
+            encode_max_batch: Maksimum teks per forward pass saat length bucketing
+            encode_bucket_width: Lebar bucket panjang token (padding per teks < nilai ini)
+            cascade: Screening semua segmen dengan model kecil, hanya segmen mencurigakan yang dikonfirmasi model utama
+            cascade_model_name: Model screening (default: ``fallback_model_name``)
+            cascade_threshold: Skor model screening minimal agar segmen di-escalate ke model utama
+            segment_encoding: 'window' (encode tiap window) atau 'span' (encode chunk dokumen sekali, mean-pool rentang kata per window)
+            span_chunk_tokens: Panjang maksimum chunk (token) pada mode 'span'
+            search_max_concurrency: Maksimum query Google CSE yang berjalan bersamaan
+            search_rate_limit: Batas laju query Google CSE (query/detik, token bucket sesuai quota)
+            search_cache_path: File SQLite cache hasil Google CSE (dipakai bersama antar worker & script; None = nonaktif)
+            search_cache_ttl_hours: Umur hasil pencarian di cache (jam)
+            search_cache_negative_ttl_hours: Umur hasil pencarian kosong di cache (jam)
+            search_cache_max_mb: Batas ukuran cache hasil pencarian (MB)
+            search_planning: Rencanakan query web per dokumen (lewati segmen yang sudah cocok di local corpus, sub-span kata langka, gabung segmen bertetangga)
+            search_query_words: Panjang sub-span query web (kata)
+            search_query_budget: Maksimum query web per dokumen (0 = tanpa batas)
+            search_provider: 'google' (Google CSE) atau 'bm25' (index BM25 offline atas teks corpus + snapshot web)
+            search_snapshot_dir: Folder snapshot web (.txt/.html) yang ikut di-index provider 'bm25'
         """
         self.google_api_key = google_api_key or os.getenv("GOOGLE_API_KEY")
         self.google_cse_id = google_cse_id or os.getenv("GOOGLE_CSE_ID")
@@ -48,100 +170,661 @@ class PlagiarismDetector:
         self.segment_size = segment_size
         self.overlap = overlap
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.cache_size = cache_size
+        self.local_top_k = local_top_k
+        self.corpus_block_size = corpus_block_size
+        self.index_type = index_type
+        self.ann_min_corpus_size = ann_min_corpus_size
+        self.ann_nprobe = ann_nprobe
+        self.ann_n_lists = ann_n_lists
+        self.corpus_storage = corpus_storage
+        self.corpus_spill_dir = corpus_spill_dir
+        self.quantize_rerank_k = quantize_rerank_k
+        self.projection_dims = projection_dims
+        self.corpus_log_enabled = corpus_log_enabled
+        self.corpus_log_compact_segments = corpus_log_compact_segments
+        self.lexical_prefilter = lexical_prefilter
+        self.lexical_resolve_jaccard = lexical_resolve_jaccard
+        self.dedup_corpus = dedup_corpus
+        self.dedup_threshold = dedup_threshold
+        self.hierarchical_top_sources = hierarchical_top_sources
+        self.source_centroids = source_centroids
 
         # Load Sentence-BERT model dengan fallback & logging yang lebih informatif
         self.model_name = model_name
         self.fallback_model_name = fallback_model_name
+        self.active_model_name = model_name
+        self.inference_backend = inference_backend
+        self.onnx_cache_dir = onnx_cache_dir
+        self.inference_threads = inference_threads
+        self.active_backend = inference_backend
         self.model = self._load_model_with_fallback()
+        # Penjadwal batch berbasis panjang token (None = satu model.encode per pemanggilan)
+        self.encode_scheduler: Optional[LengthBucketScheduler] = None
+        if length_bucketing and getattr(self.model, 'tokenizer', None) is not None:
+            self.encode_scheduler = LengthBucketScheduler(
+                self.model.tokenizer, max_seq_length=getattr(self.model, 'max_seq_length', None),
+                max_tokens=encode_max_tokens, max_batch_size=encode_max_batch, bucket_width=encode_bucket_width
+            )
 
-        # Simple embedding cache (LRU via decorator for text->embedding mapping)
-        # Cache tingkat instance untuk segment embeddings agar tidak dihitung ulang saat similarity antar banyak snippet.
-        self._segment_embedding_cache: Dict[str, torch.Tensor] = {}
-        # Local corpus (list of dict: {source_id, text, embedding}) untuk pembanding non-Google
-        self.local_corpus: List[Dict[str, any]] = []
+        # Encode window via token embedding bersama per chunk dokumen (None = encode per window)
+        self.span_encoder: Optional[SpanPoolingEncoder] = None
+        if segment_encoding == "span":
+            try:
+                self.span_encoder = SpanPoolingEncoder(
+                    self.model, max_tokens=span_chunk_tokens, max_batch_tokens=encode_max_tokens, device=self.device
+                )
+            except Exception as e:
+                logger.warning(f"Span encoding tidak tersedia untuk model '{self.active_model_name}', memakai encode per window: {e}")
+        elif segment_encoding != "window":
+            logger.warning(f"Segment encoding '{segment_encoding}' tidak dikenal, memakai encode per window")
+
+        # Cache embedding persisten (key = hash(model aktif, teks ter-normalisasi))
+        self.embedding_cache: Optional[PersistentEmbeddingCache] = None
+        if embedding_cache_path:
+            try:
+                self.embedding_cache = PersistentEmbeddingCache(
+                    embedding_cache_path, self._embedding_model_id(), max_bytes=embedding_cache_max_mb * 1024 * 1024
+                )
+            except Exception as e:
+                logger.error(f"Gagal membuka embedding cache {embedding_cache_path}: {e}")
+        # Encoder micro-batching lintas request (None = encode langsung di thread pemanggil)
+        self.batch_encoder: Optional[MicroBatchEncoder] = None
+        if micro_batching:
+            self.batch_encoder = MicroBatchEncoder(
+                self._model_encode, max_batch_size=micro_batch_size, max_wait_ms=micro_batch_wait_ms
+            )
+
+        # Satu cache LRU in-memory (budget byte) untuk semua encode: segmen, snippet, corpus
+        if cache_size is not None:
+            memory_cache_mb = cache_size * self.model.get_sentence_embedding_dimension() * 4 / (1024 * 1024)
+            logger.warning(
+                f"cache_size sudah deprecated, gunakan memory_cache_mb; cache_size={cache_size} "
+                f"dipetakan ke memory_cache_mb={memory_cache_mb:g}"
+            )
+        self.memory_cache = EmbeddingLRUCache(max_bytes=int(memory_cache_mb * 1024 * 1024))
+        self.encoder = CachedEncoder(
+            self.model, self._embedding_model_id(), self.memory_cache, self.embedding_cache, self.encode_scheduler, self.device
+        )
+        # Cascade dua-model: screening model kecil terhadap embedding corpus model kecil (None = nonaktif)
+        self.cascade_screener: Optional[CascadeScreener] = None
+        if cascade:
+            self.cascade_screener = self._create_cascade_screener(
+                cascade_model_name or fallback_model_name, cascade_threshold, embedding_cache_path,
+                embedding_cache_max_mb, encode_max_tokens, encode_max_batch, encode_bucket_width
+            )
+        # Planner query web per dokumen (None = satu query per segmen)
+        self.query_planner: Optional[SearchQueryPlanner] = None
+        if search_planning:
+            self.query_planner = SearchQueryPlanner(query_words=search_query_words, max_queries=search_query_budget)
+        # Local corpus (matriks embedding kontigu + array paralel) untuk pembanding non-Google
+        self.local_corpus = CorpusStore(rerank_k=quantize_rerank_k)
+        # Lock corpus (deteksi berjalan paralel di threadpool FastAPI): ``with _corpus_lock`` eksklusif untuk
+        # ingest/clear/load/save/quantize dan sync index lazy, ``_corpus_lock.shared()`` untuk scan read-only;
+        # encode model tetap di luar lock
+        self._corpus_lock = ReadWriteLock()
+        # Index ANN opsional di atas local_corpus (None = exact search)
+        self.ann_index: Optional[ANNIndex] = None
+        # Jumlah build folder yang sedang berjalan (> 0 = update index per ingest ditunda ke akhir build)
+        self._defer_index_updates = 0
+        # Log append-only (aktif setelah load/attach ke direktori corpus)
+        self.corpus_log: Optional[CorpusSegmentLog] = None
+        # Log yang di-replay saat load tetapi tidak ditulisi (corpus_log_enabled=False); dipakai save_corpus
+        self._replayed_log: Optional[CorpusSegmentLog] = None
+        # Shard server remote (scatter-gather) untuk corpus yang tidak muat di satu proses
+        self.shard_client: Optional[ShardedCorpusClient] = None
+        # Index MinHash/LSH sejajar dengan baris local_corpus (prefilter leksikal)
+        self.lexical_index: Optional[MinHashLSH] = MinHashLSH(num_perm=minhash_num_perm, bands=minhash_bands) if lexical_prefilter else None
+        # Index centroid per source (matching dua tingkat: dokumen lalu segmen)
+        self.source_index: Optional[SourceCentroidIndex] = None
+        # Hash teks ter-normalisasi -> baris corpus (dedup exact saat ingest)
+        self._reset_dedup_index()
+        self.last_ingest: Dict[str, any] = {}
         # Metadata untuk versi format penyimpanan
-        self._corpus_format_version = 1
+        self._corpus_format_version = CORPUS_FORMAT_VERSION
         
-        # Setup Google CSE
-        if self.google_api_key and self.google_cse_id:
+        # Setup search provider: Google CSE (client per thread, query paralel dengan rate limit) atau BM25 offline
+        self.search_service: Optional[SearchProvider] = None
+        if search_provider == "bm25":
+            self.search_service = BM25SearchProvider(snapshot_dir=search_snapshot_dir)
+        elif search_provider != "google":
+            raise ValueError(f"Unknown search provider: {search_provider} (available: ['google', 'bm25'])")
+        elif self.google_api_key and self.google_cse_id:
+            search_cache = None
+            if search_cache_path:
+                try:
+                    search_cache = SearchResultCache(
+                        search_cache_path,
+                        namespace=self.google_cse_id,
+                        ttl_seconds=search_cache_ttl_hours * 3600,
+                        negative_ttl_seconds=search_cache_negative_ttl_hours * 3600,
+                        max_bytes=search_cache_max_mb * 1024 * 1024
+                    )
+                except Exception as e:
+                    logger.error(f"Gagal membuka search cache {search_cache_path}: {e}")
             try:
-                self.search_service = build("customsearch", "v1", developerKey=self.google_api_key)
+                self.search_service = GoogleSearchClient(
+                    self.google_api_key,
+                    self.google_cse_id,
+                    max_concurrency=search_max_concurrency,
+                    rate_limit=search_rate_limit,
+                    cache=search_cache
+                )
             except Exception as e:
                 logger.error(f"Gagal inisialisasi Google CSE: {e}")
                 self.search_service = None
         else:
             logger.warning("Google API credentials not provided. Search functionality disabled.")
-            self.search_service = None
 
         logger.info("PlagiarismDetector initialized successfully")
 
     def _load_model_with_fallback(self):
         """Memuat model utama dengan fallback ke model yang lebih ringan jika gagal."""
         try:
-            logger.info(f"Memuat model SBERT utama: {self.model_name} (device={self.device})")
-            model = SentenceTransformer(self.model_name, device=self.device)
+            logger.info(f"Memuat model SBERT utama: {self.model_name} (device={self.device}, backend={self.inference_backend})")
+            model = self._load_model(self.model_name)
             return model
         except Exception as e:
             logger.error(f"Gagal memuat model utama '{self.model_name}': {e}")
             logger.info(f"Mencoba fallback model: {self.fallback_model_name}")
             try:
-                model = SentenceTransformer(self.fallback_model_name, device=self.device)
+                model = self._load_model(self.fallback_model_name)
+                self.active_model_name = self.fallback_model_name
                 logger.info("Fallback model berhasil dimuat")
                 return model
             except Exception as e2:
                 logger.error(f"Fallback model juga gagal dimuat: {e2}")
                 raise RuntimeError("Tidak dapat memuat model SBERT apapun.")
 
-    @lru_cache(maxsize=1024)
+    def _load_model(self, name: str):
+        """Muat satu model lewat backend terpilih; backend ONNX yang gagal jatuh ke PyTorch."""
+        if self.inference_backend in ("onnx", "onnx-int8"):
+            try:
+                model = OnnxSentenceEncoder.from_pretrained(
+                    name, cache_dir=self.onnx_cache_dir, quantize=self.inference_backend == "onnx-int8",
+                    device=self.device, num_threads=self.inference_threads
+                )
+                self.active_backend = self.inference_backend
+                return model
+            except Exception as e:
+                logger.error(f"Backend {self.inference_backend} gagal untuk '{name}', fallback ke PyTorch: {e}")
+        elif self.inference_backend != "torch":
+            logger.warning(f"Inference backend '{self.inference_backend}' tidak dikenal, memakai PyTorch")
+        self.active_backend = "torch"
+        return SentenceTransformer(name, device=self.device)
+
+    def _create_cascade_screener(
+        self, name: str, threshold: float, embedding_cache_path: Optional[str], embedding_cache_max_mb: int,
+        max_tokens: int, max_batch: int, bucket_width: int
+    ) -> Optional[CascadeScreener]:
+        """Muat model screening untuk cascade; nonaktif jika model utama sudah model kecil atau gagal dimuat."""
+        if name == self.active_model_name:
+            logger.warning(f"Cascade dinonaktifkan: model aktif sudah '{name}'")
+            return None
+        backend = self.active_backend
+        try:
+            logger.info(f"Memuat model screening cascade: {name}")
+            model = self._load_model(name)
+        except Exception as e:
+            logger.error(f"Gagal memuat model screening '{name}', cascade dinonaktifkan: {e}")
+            return None
+        finally:
+            # active_backend melaporkan backend model utama
+            self.active_backend = backend
+        scheduler = None
+        if self.encode_scheduler is not None and getattr(model, 'tokenizer', None) is not None:
+            scheduler = LengthBucketScheduler(
+                model.tokenizer, max_seq_length=getattr(model, 'max_seq_length', None),
+                max_tokens=max_tokens, max_batch_size=max_batch, bucket_width=bucket_width
+            )
+        cache = None
+        if embedding_cache_path:
+            try:
+                cache = PersistentEmbeddingCache(embedding_cache_path, name, max_bytes=embedding_cache_max_mb * 1024 * 1024)
+            except Exception as e:
+                logger.error(f"Gagal membuka embedding cache screening {embedding_cache_path}: {e}")
+        return CascadeScreener(model, name, suspicion_threshold=threshold, embedding_cache=cache, scheduler=scheduler, device=self.device)
+
+    def _embedding_model_id(self) -> str:
+        """Identitas model untuk key cache embedding; int8 berbeda sedikit dari fp32 sehingga dipisah."""
+        if self.active_backend == "onnx-int8":
+            return f"{self.active_model_name}@int8"
+        return self.active_model_name
+
+    def _model_encode(self, texts: List[str]) -> np.ndarray:
+        """Encode list teks dengan model; dibagi per bucket panjang token bila scheduler aktif. Return (N, dim) float32."""
+        return self.encoder.model_encode(texts)
+
+    def _encode_batch(self, texts: List[str], remember: bool = True) -> np.ndarray:
+        """
+        Encode banyak teks sekaligus lewat cache: LRU in-memory -> cache persisten -> model.
+
+        Hanya teks yang belum ada di kedua cache (unik) yang di-encode model dalam
+        satu batch; hasilnya disimpan kembali ke cache. ``remember=False`` (ingest
+        corpus massal) tetap membaca cache tetapi tidak mengisi LRU in-memory agar
+        embedding segmen/snippet yang sering dipakai tidak ter-evict.
+        Return (N, dim) float32.
+        """
+        encoder = self.batch_encoder
+        return self.encoder.encode(texts, remember=remember, model_encode=encoder.encode if encoder is not None else None)
+
+    def _encode_segments(self, text: str, segments: List[Dict[str, any]], remember: bool = True) -> np.ndarray:
+        """
+        Embedding semua window ``segment_text(text)``.
+
+        Mode 'span': transformer dijalankan sekali per chunk dokumen dan setiap
+        window di-mean-pool dari token embedding rentang katanya (tanpa cache,
+        karena embedding bergantung pada konteks chunk). Selain itu encode per
+        window lewat ``_encode_batch`` (cache + micro-batching).
+        """
+        if self.span_encoder is not None and len(segments) > 1:
+            try:
+                words = self.preprocess_text(text).split()
+                return self.span_encoder.encode(words, [(s['start_word'], s['end_word']) for s in segments])
+            except Exception as e:
+                logger.error(f"Span encoding gagal, fallback encode per window: {e}")
+        return self._encode_batch([s['segment_text'] for s in segments], remember=remember)
+
     def _encode_text_cached(self, text: str) -> torch.Tensor:
-        """Encode teks dengan cache LRU (per proses)."""
-        return self.model.encode(text, convert_to_tensor=True, device=self.device)
+        """Encode satu teks (snippet / teks pembanding) lewat cache embedding terpadu."""
+        return torch.from_numpy(self._encode_batch([text])[0].copy()).to(self.device)
 
     def _get_segment_embedding(self, text: str) -> torch.Tensor:
-        """Ambil embedding segment dari cache instance, jika penuh lakukan eviction sederhana."""
-        if text in self._segment_embedding_cache:
-            return self._segment_embedding_cache[text]
-        emb = self._encode_text_cached(text)
-        if len(self._segment_embedding_cache) >= self.cache_size:
-            # Evict first inserted (simple FIFO); bisa ditingkatkan ke LRU penuh bila perlu
-            self._segment_embedding_cache.pop(next(iter(self._segment_embedding_cache)))
-        self._segment_embedding_cache[text] = emb
-        return emb
+        """Embedding satu segmen lewat cache embedding terpadu (LRU in-memory + persisten)."""
+        return self._encode_text_cached(text)
+
+    _to_numpy = staticmethod(to_numpy)
 
     def add_to_corpus(self, text: str, source_id: str = "local") -> int:
-        """Tambahkan teks penuh ke local corpus (di-segmentasi dan di-embed batch). Return jumlah segmen ditambahkan."""
+        """Tambahkan teks penuh ke local corpus (di-segmentasi dan di-embed batch). Return jumlah segmen ditambahkan.
+
+        Segmen yang sudah ada di corpus (teks ter-normalisasi identik, atau embedding
+        dengan cosine >= ``dedup_threshold``) tidak disimpan ulang; ``source_id``
+        dicatat sebagai owner tambahan baris yang sudah ada.
+        """
         segments = self.segment_text(text)
         # Ambil list teks segmen
         segment_texts = [s['segment_text'] for s in segments]
         if not segment_texts:
+            self.last_ingest = {'source_id': source_id, 'segments': 0, 'stored': 0, 'duplicates': 0}
             return 0
         try:
-            embeddings = self.model.encode(segment_texts, convert_to_tensor=True, device=self.device)
+            embeddings = self._encode_segments(text, segments, remember=False)
         except Exception as e:
             logger.error(f"Gagal batch encode corpus: {e}")
             # Fallback per-segment
             embeddings = [self._get_segment_embedding(t) for t in segment_texts]
-        # Simpan
-        added = 0
-        for seg, emb in zip(segments, embeddings):
-            self.local_corpus.append({
-                'source_id': source_id,
-                'segment_id': seg['segment_id'],
-                'text': seg['segment_text'],
-                'embedding': emb
-            })
-            added += 1
-        logger.info(f"Added {added} segments to local corpus (source_id={source_id}). Total corpus size: {len(self.local_corpus)}")
+        return self._ingest_segments(segments, self._to_numpy(embeddings), source_id)
+
+    def _ingest_segments(self, segments: List[Dict[str, any]], embeddings: np.ndarray, source_id: str) -> int:
+        """Simpan segmen + embedding-nya ke local corpus (dedup, log, update index). Return jumlah segmen."""
+        with self._corpus_lock:
+            segment_texts = [s['segment_text'] for s in segments]
+            segment_ids = [seg['segment_id'] for seg in segments]
+            duplicate_rows = self._find_duplicates(segment_texts, embeddings) if self.dedup_corpus else [None] * len(segment_texts)
+            keep = [i for i, row in enumerate(duplicate_rows) if row is None]
+            duplicates = [(row, segment_ids[i]) for i, row in enumerate(duplicate_rows) if row is not None]
+            # Simpan (append amortized ke matriks kontigu)
+            rows = self.local_corpus.append(
+                embeddings[keep],
+                texts=[segment_texts[i] for i in keep],
+                segment_ids=[segment_ids[i] for i in keep],
+                source_id=source_id
+            )
+            for row, segment_id in duplicates:
+                self.local_corpus.add_owner(row, source_id, segment_id)
+            added = len(segment_texts)
+            if self.corpus_log is not None:
+                try:
+                    self.corpus_log.append(
+                        self.local_corpus.embeddings[rows.start:rows.stop],
+                        texts=[segment_texts[i] for i in keep],
+                        segment_ids=[segment_ids[i] for i in keep],
+                        source_id=source_id,
+                        duplicates=[(segment_id, self.local_corpus.get_source(row), self.local_corpus.get_segment_id(row)) for row, segment_id in duplicates]
+                    )
+                except Exception as e:
+                    logger.error(f"Gagal menulis corpus log: {e}")
+            sync_screening = not self._defer_index_updates and len(rows) > 0
+            if sync_screening:
+                self._apply_corpus_storage()
+                self._update_ann_index(rows)
+                self._update_source_index(rows)
+                self._sync_lexical_index()
+            self.last_ingest = {'source_id': source_id, 'segments': added, 'stored': len(rows), 'duplicates': len(duplicates)}
+            logger.info(
+                f"Added {added} segments to local corpus (source_id={source_id}, {len(duplicates)} duplicates stored once). "
+                f"Total corpus size: {len(self.local_corpus)}"
+            )
+        # Model screening di-encode di luar lock; compaction sesudahnya agar snapshot memuat embedding screening
+        if sync_screening:
+            self._sync_screening_index()
+        self._maybe_compact_corpus()
         return added
 
-    def build_corpus_from_folder(self, folder_path: str, file_extension: str = ".pdf") -> Dict[str, any]:
+    @staticmethod
+    def _dedup_key(text: str) -> int:
+        """Hash 64-bit teks ter-normalisasi (lowercase, hanya kata) untuk deteksi duplikat exact."""
+        normalized = " ".join(re.findall(r"\w+", text.lower()))
+        return int.from_bytes(hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def _reset_dedup_index(self):
+        self._dedup_hashes = {}
+        self._dedup_synced_rows = 0
+
+    def _sync_dedup_index(self):
+        """Tambahkan hash teks untuk baris corpus yang belum ter-index."""
+        with self._corpus_lock:
+            if self._dedup_synced_rows > len(self.local_corpus):
+                self._reset_dedup_index()
+            for row in range(self._dedup_synced_rows, len(self.local_corpus)):
+                self._dedup_hashes.setdefault(self._dedup_key(self.local_corpus.get_text(row)), row)
+            self._dedup_synced_rows = len(self.local_corpus)
+
+    def _find_duplicates(self, texts: List[str], embeddings: np.ndarray) -> List[Optional[int]]:
+        """
+        Baris corpus yang sudah memuat tiap segmen (None = segmen baru).
+
+        Duplikat exact dicek via hash teks ter-normalisasi (termasuk duplikat di
+        dalam batch yang sama); hampir duplikat via cosine embedding >= ``dedup_threshold``
+        terhadap kandidat LSH (atau scan corpus jika prefilter leksikal nonaktif).
+        """
+        self._sync_dedup_index()
+        store = self.local_corpus
+        result: List[Optional[int]] = [None] * len(texts)
+        first_in_batch: Dict[int, int] = {}
+        batch_duplicate_of: Dict[int, int] = {}
+        near_check = []
+        for i, text in enumerate(texts):
+            key = self._dedup_key(text)
+            if key in self._dedup_hashes:
+                result[i] = self._dedup_hashes[key]
+            elif key in first_in_batch:
+                batch_duplicate_of[i] = first_in_batch[key]
+            else:
+                first_in_batch[key] = i
+                near_check.append(i)
+        if store and near_check:
+            queries = l2_normalize(embeddings[near_check])
+            if self.lexical_index is not None:
+                # Juga saat build ditunda: sync hanya menambah baris baru ke tail LSH (run terurut
+                # digabung bertingkat), sehingga biaya per file tidak tumbuh dengan ukuran corpus
+                self._sync_lexical_index()
+                candidates = self.lexical_index.query(self.lexical_index.signatures([texts[i] for i in near_check]))
+                best = [store.score_candidates(q, c, 1) if c.size else ((), ()) for q, c in zip(queries, candidates)]
+            else:
+                rows, scores = store.search_batch(queries, top_k=1, block_size=self.corpus_block_size)
+                best = list(zip(rows, scores))
+            for i, (rows, scores) in zip(near_check, best):
+                if len(rows) and rows[0] >= 0 and scores[0] >= self.dedup_threshold:
+                    result[i] = int(rows[0])
+        # Duplikat di dalam batch menunjuk ke baris tempat kemunculan pertamanya berakhir
+        next_row = len(store)
+        new_rows: Dict[int, int] = {}
+        for i in range(len(texts)):
+            if i in batch_duplicate_of:
+                first = batch_duplicate_of[i]
+                result[i] = result[first] if result[first] is not None else new_rows[first]
+            elif result[i] is None:
+                new_rows[i] = next_row
+                next_row += 1
+        return result
+
+    def attach_corpus_log(self, path: str) -> Dict[str, any]:
+        """Aktifkan log append-only di direktori corpus (dibuat jika belum ada)."""
+        with self._corpus_lock:
+            self._close_corpus_logs()
+            self.corpus_log = CorpusSegmentLog(self._resolve_corpus_dir(path))
+            logger.info(f"Corpus log attached: {self.corpus_log.path}")
+            return self.corpus_log.stats()
+
+    def _maybe_compact_corpus(self):
+        """Gabungkan log ke snapshot utama jika segmen di log sudah melewati batas."""
+        with self._corpus_lock:
+            log = self.corpus_log
+            if log is None or self._defer_index_updates or log.segments < self.corpus_log_compact_segments:
+                return
+            if not log.is_current():
+                # Proses lain sudah menulis ke log: snapshot proses ini tidak mencakup record mereka
+                logger.debug(f"Compaction corpus log dilewati: {log.path} diubah proses lain")
+                return
+            logger.info(f"Compacting corpus log ({log.segments} segments pending) into {log.directory}")
+            try:
+                self.save_corpus(log.directory)
+            except Exception as e:
+                logger.error(f"Gagal compaction corpus log: {e}")
+
+    def _corpus_spill_path(self) -> str:
+        """File memmap float32 untuk corpus terkompresi (unik per proses/instance)."""
+        import tempfile
+        folder = self.corpus_spill_dir or tempfile.gettempdir()
+        return os.path.join(folder, f"corpus_vectors_{os.getpid()}_{id(self)}.f32")
+
+    def quantize_corpus(self, mode: Optional[str] = None, refit: bool = False) -> Dict[str, any]:
+        """
+        Ubah mode storage vektor corpus ('float32', 'int8', 'pq', 'pca', 'truncate').
+
+        Mode terkompresi menyimpan kode kuantisasi di RAM dan matriks float32 di
+        file memmap; top ``quantize_rerank_k`` kandidat selalu di-skor ulang exact
+        sehingga keputusan Plagiat/Original di ``similarity_threshold`` tetap stabil.
+        Mode 'pca' / 'truncate' mencari tahap pertama di ``projection_dims`` dimensi
+        dengan re-rank yang sama. Quantizer terlatih yang tersimpan bersama corpus
+        dipakai ulang bila jenis & parameternya cocok (kecuali ``refit=True``).
+
+        Returns:
+            Laporan memori (float32 vs terkompresi, byte yang dihemat)
+        """
+        with self._corpus_lock:
+            if mode is not None:
+                self.corpus_storage = mode
+            store = self.local_corpus
+            store.rerank_k = self.quantize_rerank_k
+            if self.corpus_storage == "float32":
+                store.dequantize()
+            elif self.corpus_storage != store.storage or refit:
+                min_rows = 256 if self.corpus_storage in ("pq", "pca") else 1
+                if len(store) < min_rows:
+                    logger.info(f"Corpus terlalu kecil untuk storage '{self.corpus_storage}' ({len(store)} < {min_rows}), tetap float32")
+                    return store.memory_report()
+                params = self._quantizer_params()
+                saved = store.saved_quantizer
+                reuse = None
+                if not refit and saved is not None and saved.kind == self.corpus_storage \
+                        and saved.params() == create_quantizer(self.corpus_storage, **params).params():
+                    reuse = saved
+                    fitted = store.saved_quantizer_info.get('fitted_rows') or len(store)
+                    if len(store) > 2 * fitted:
+                        logger.warning(
+                            f"Quantizer '{saved.kind}' v{store.saved_quantizer_info.get('version')} dilatih pada {fitted} segmen, "
+                            f"corpus kini {len(store)}; pertimbangkan fit ulang (fit_projection.py)"
+                        )
+                report = store.quantize(self.corpus_storage, self._corpus_spill_path(), quantizer=reuse, **params)
+                logger.info(
+                    f"Corpus quantized ({report['storage']}, v{store.quantizer_info.get('version')}"
+                    f"{', reused' if reuse is not None else ''}): {report['float32_bytes']} -> "
+                    f"{report['resident_vector_bytes']} bytes (saved {report['saved_bytes']}, {report['compression_ratio']}x)"
+                )
+            return store.memory_report()
+
+    def _quantizer_params(self) -> Dict[str, any]:
+        if self.corpus_storage in ("pca", "truncate"):
+            return {'dims': self.projection_dims}
+        return {}
+
+    def _apply_corpus_storage(self):
+        """Terapkan corpus_storage yang dikonfigurasi jika belum aktif."""
+        if self.corpus_storage != self.local_corpus.storage:
+            try:
+                self.quantize_corpus()
+            except Exception as e:
+                logger.error(f"Gagal quantize corpus, tetap float32: {e}")
+
+    def _ann_enabled(self) -> bool:
+        """Index ANN hanya dipakai jika dikonfigurasi dan corpus cukup besar (exact untuk corpus kecil)."""
+        return self.index_type != "exact" and len(self.local_corpus) >= self.ann_min_corpus_size
+
+    def build_ann_index(
+        self,
+        index_type: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        min_corpus_size: Optional[int] = None
+    ) -> Dict[str, any]:
+        """Bangun (ulang) index ANN dari seluruh local corpus. Parameter yang diberikan mengganti konfigurasi index."""
+        with self._corpus_lock:
+            if index_type is not None:
+                self.index_type = index_type
+            if nprobe is not None:
+                self.ann_nprobe = nprobe
+            if min_corpus_size is not None:
+                self.ann_min_corpus_size = min_corpus_size
+            if self.index_type == "exact" or not self.local_corpus:
+                self.ann_index = None
+                return {'success': False, 'message': 'ANN index disabled or corpus empty'}
+            start = time.time()
+            params = {'nprobe': self.ann_nprobe}
+            if self.ann_n_lists:
+                params['n_lists'] = self.ann_n_lists
+            index = create_ann_index(self.index_type, **params)
+            index.build(self.local_corpus)
+            self.ann_index = index
+            dur = round(time.time() - start, 2)
+            return {'success': True, 'time_sec': dur, **index.stats()}
+
+    def _update_ann_index(self, rows: range):
+        """Update index ANN setelah append: assign incremental, atau rebuild bila perlu."""
+        with self._corpus_lock:
+            if not self._ann_enabled():
+                return
+            try:
+                index = self.ann_index
+                if index is None or index.size != rows.start or index.needs_rebuild(self.local_corpus):
+                    self.build_ann_index()
+                else:
+                    self.ann_index.add(self.local_corpus, rows)
+            except Exception as e:
+                logger.error(f"Gagal update ANN index, fallback ke exact search: {e}")
+                self.ann_index = None
+
+    def _hierarchical_enabled(self, top_sources: Optional[int] = None) -> bool:
+        """Shortlist source hanya berguna jika jumlah source melebihi M (default: ``hierarchical_top_sources``)."""
+        top_m = self.hierarchical_top_sources if top_sources is None else top_sources
+        return 0 < top_m < len(self.local_corpus.sources)
+
+    def _update_source_index(self, rows: range):
+        """Update index centroid source setelah append (incremental, atau build penuh bila tidak sinkron)."""
+        with self._corpus_lock:
+            if self.hierarchical_top_sources <= 0 or not self.local_corpus:
+                return
+            try:
+                index = self.source_index
+                if index is None or index.size != rows.start or index.centroids_per_source != self.source_centroids:
+                    index = SourceCentroidIndex(centroids_per_source=self.source_centroids)
+                    index.build(self.local_corpus)
+                    self.source_index = index
+                else:
+                    index.add(self.local_corpus, rows)
+            except Exception as e:
+                logger.error(f"Gagal update source centroid index, fallback ke flat matching: {e}")
+                self.source_index = None
+
+    def _sync_lexical_index(self):
+        """Tambahkan signature MinHash untuk baris corpus yang belum ter-index."""
+        with self._corpus_lock:
+            index = self.lexical_index
+            if index is None:
+                return
+            if len(index) > len(self.local_corpus):
+                index.clear()
+            start = len(index)
+            if start < len(self.local_corpus):
+                index.add([self.local_corpus.get_text(r) for r in range(start, len(self.local_corpus))])
+
+    def _sync_screening_index(self):
+        """
+        Encode baris corpus yang belum punya embedding model screening (cascade).
+
+        Teks baris baru di-snapshot di bawah ``_corpus_lock``, forward pass model
+        screening berjalan tanpa lock, lalu hasilnya di-append di bawah lock hanya
+        jika matriks screening belum berubah sejak snapshot (clear/load di tengah
+        jalan membuang hasilnya dan baris di-snapshot ulang). Panggil di luar
+        ``_corpus_lock`` agar ingest dan deteksi lain tidak tertahan encode.
+        """
+        screener = self.cascade_screener
+        if screener is None:
+            return
+        encoded = 0
+        while True:
+            with self._corpus_lock:
+                start, generation, texts = screener.pending(self.local_corpus)
+            if not texts:
+                break
+            try:
+                vectors = screener.encode(texts, remember=False)
+            except Exception as e:
+                # Baris yang belum ter-encode dicoba lagi di sync berikutnya; screening menunggu sampai sejajar
+                logger.error(f"Gagal sync screening index cascade: {e}")
+                return
+            with self._corpus_lock:
+                if screener.append(vectors, start, generation):
+                    encoded += len(texts)
+        if encoded:
+            logger.info(f"Screening index ({screener.model_name}): {encoded} baris di-encode, total {len(screener)}")
+
+    def _lexical_candidates(self, segment_texts: List[str]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Kandidat LSH per segmen beserta estimasi Jaccard (urut menurun). Index harus sudah di-``_prepare_local_search``."""
+        index = self.lexical_index
+        signatures = index.signatures(segment_texts)
+        results = []
+        for signature, rows in zip(signatures, index.query(signatures)):
+            jaccard = index.jaccard(signature, rows) if rows.size else np.empty(0)
+            order = np.argsort(-jaccard, kind='stable')
+            results.append((rows[order], jaccard[order]))
+        return results
+
+    def _prepare_local_search(self):
+        """
+        Sinkronkan index lazy (LSH, centroid source, inverted list ANN) di bawah lock eksklusif
+        yang singkat, sehingga scan sesudahnya cukup memegang ``_corpus_lock.shared()``.
+        """
+        with self._corpus_lock:
+            if self.lexical_index is not None:
+                self._sync_lexical_index()
+                self.lexical_index.prepare()
+            if self.source_index is not None:
+                self.source_index.prepare()
+            if self.ann_index is not None:
+                self.ann_index.nprobe = self.ann_nprobe
+                self.ann_index.prepare()
+
+    @staticmethod
+    def _resolve_corpus_dir(path: str) -> str:
+        """Path corpus format v2 adalah direktori; 'data/corpus.pkl' dipetakan ke 'data/corpus'."""
+        return path[:-4] if path.endswith(".pkl") else path
+
+    @staticmethod
+    def _ann_index_path(corpus_dir: str) -> str:
+        """Lokasi file index ANN yang disimpan di dalam direktori corpus."""
+        return os.path.join(corpus_dir, "ann.npz")
+
+    @staticmethod
+    def _minhash_path(corpus_dir: str) -> str:
+        """Lokasi signature MinHash yang disimpan di dalam direktori corpus."""
+        return os.path.join(corpus_dir, "minhash.npz")
+
+    def build_corpus_from_folder(
+        self,
+        folder_path: str,
+        file_extension: str = ".pdf",
+        workers: int = 0,
+        threads_per_worker: Optional[int] = None
+    ) -> Dict[str, any]:
         """
         Build corpus dari semua file dalam folder (biasanya PDF/TXT skripsi lama).
         
         Args:
             folder_path: Path ke folder berisi file corpus
             file_extension: Extension file yang diproses (.pdf atau .txt)
+            workers: Jumlah proses encode paralel (<= 1 = encode di proses ini)
+            threads_per_worker: Thread torch/ORT per proses worker (default: jumlah core / workers)
             
         Returns:
             Dictionary hasil build: jumlah file, jumlah segment, error list
@@ -169,164 +852,717 @@ class PlagiarismDetector:
         
         files_processed = 0
         total_segments = 0
+        duplicate_segments = 0
         errors = []
-        
-        # Scan semua file di folder
-        for filename in os.listdir(folder_path):
-            if not filename.endswith(file_extension):
-                continue
-            
-            file_path = os.path.join(folder_path, filename)
-            source_id = f"corpus_{filename}"
-            
+        start_time = time.perf_counter()
+        if workers > 1 and self.span_encoder is not None:
+            # Worker pool meng-encode per window; embedding corpus harus sama dengan segmen query (span pooling)
+            logger.warning("Span encoding aktif: build corpus memakai encode satu proses, bukan pool worker")
+            workers = 0
+        pool = self._create_encode_pool(workers, threads_per_worker) if workers > 1 else None
+        # File yang sedang di-encode pool (diproses ke corpus sesuai urutan submit)
+        in_flight: deque = deque()
+        # Index di-update sekali di akhir build, bukan per file. Ingest paralel (API) selama build juga
+        # ditunda, dan ikut ter-index karena berada setelah rows_before
+        with self._corpus_lock:
+            rows_before = len(self.local_corpus)
+            self._defer_index_updates += 1
+
+        def ingest(filename: str, add: Callable[[], int]):
+            nonlocal files_processed, total_segments, duplicate_segments
             try:
-                logger.info(f"Processing {filename}...")
-                
-                # Ekstrak teks
-                if file_extension == ".pdf":
-                    text = pdf_processor.extract_text(file_path)
-                elif file_extension == ".txt":
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        text = f.read()
-                else:
-                    logger.warning(f"Unsupported file type: {filename}")
-                    continue
-                
-                # Validasi teks
-                if not text or len(text.strip()) < 100:
-                    logger.warning(f"Text too short in {filename}, skipping")
-                    errors.append(f"{filename}: Text too short")
-                    continue
-                
-                # Tambahkan ke corpus
-                segments_added = self.add_to_corpus(text, source_id=source_id)
+                segments_added = add()
                 files_processed += 1
                 total_segments += segments_added
-                
+                duplicate_segments += self.last_ingest.get('duplicates', 0)
                 logger.info(f"✓ {filename}: {segments_added} segments added")
-                
             except Exception as e:
                 logger.error(f"Error processing {filename}: {e}")
                 errors.append(f"{filename}: {str(e)}")
+
+        try:
+            # Scan semua file di folder
+            for filename in os.listdir(folder_path):
+                if not filename.endswith(file_extension):
+                    continue
+
+                file_path = os.path.join(folder_path, filename)
+                source_id = f"corpus_{filename}"
+
+                try:
+                    logger.info(f"Processing {filename}...")
+
+                    # Ekstrak teks
+                    if file_extension == ".pdf":
+                        text = pdf_processor.extract_text(file_path)
+                    elif file_extension == ".txt":
+                        with open(file_path, 'r', encoding='utf-8') as f:
+                            text = f.read()
+                    else:
+                        logger.warning(f"Unsupported file type: {filename}")
+                        continue
+
+                    # Validasi teks
+                    if not text or len(text.strip()) < 100:
+                        logger.warning(f"Text too short in {filename}, skipping")
+                        errors.append(f"{filename}: Text too short")
+                        continue
+                except Exception as e:
+                    logger.error(f"Error processing {filename}: {e}")
+                    errors.append(f"{filename}: {str(e)}")
+                    continue
+
+                if pool is None:
+                    # Tambahkan ke corpus
+                    ingest(filename, lambda: self.add_to_corpus(text, source_id=source_id))
+                    continue
+
+                # Mode pool: ekstraksi file berikutnya berjalan selagi worker meng-encode file sebelumnya
+                segments = self.segment_text(text)
+                segment_texts = [s['segment_text'] for s in segments]
+                vectors, lookup, to_encode = self.encoder.lookup(segment_texts)
+                in_flight.append((filename, source_id, segments, vectors, lookup, to_encode, pool.submit(to_encode)))
+                while in_flight and (len(in_flight) > 2 * pool.workers or in_flight[0][-1].done()):
+                    item = in_flight.popleft()
+                    ingest(item[0], lambda: self._ingest_pooled_file(*item[1:]))
+            while in_flight:
+                item = in_flight.popleft()
+                ingest(item[0], lambda: self._ingest_pooled_file(*item[1:]))
+        finally:
+            with self._corpus_lock:
+                self._defer_index_updates -= 1
+            if pool is not None:
+                pool.close()
+        
+        with self._corpus_lock:
+            self._apply_corpus_storage()
+            self._update_ann_index(range(rows_before, len(self.local_corpus)))
+            self._update_source_index(range(rows_before, len(self.local_corpus)))
+            self._sync_lexical_index()
+        self._sync_screening_index()
+        self._maybe_compact_corpus()
+        elapsed = time.perf_counter() - start_time
         
         result = {
             'success': files_processed > 0,
             'message': f'Successfully processed {files_processed} files',
             'files_processed': files_processed,
             'total_segments': total_segments,
+            'duplicate_segments': duplicate_segments,
             'corpus_size': len(self.local_corpus),
-            'errors': errors
+            'errors': errors,
+            'workers': pool.workers if pool is not None else 1,
+            'elapsed_seconds': round(elapsed, 2),
+            'segments_per_sec': round(total_segments / elapsed, 1) if elapsed > 0 else 0.0,
+            'encode_pool': pool.stats() if pool is not None else None
         }
         
         logger.info(f"Corpus build completed: {files_processed} files, {total_segments} segments, {len(errors)} errors")
         return result
 
+    def _create_encode_pool(self, workers: int, threads_per_worker: Optional[int] = None) -> CorpusEncodePool:
+        """Pool proses encode dengan model & backend yang sama dengan detector ini."""
+        scheduler = self.encode_scheduler
+        return CorpusEncodePool(
+            self.active_model_name, workers, threads_per_worker=threads_per_worker,
+            inference_backend=self.active_backend, onnx_cache_dir=self.onnx_cache_dir,
+            max_tokens=scheduler.max_tokens if scheduler is not None else 8192
+        )
+
+    def _ingest_pooled_file(
+        self, source_id: str, segments: List[Dict[str, any]], vectors: List[Optional[np.ndarray]],
+        lookup: Dict[str, np.ndarray], to_encode: List[str], future
+    ) -> int:
+        """Tunggu hasil encode pool satu file lalu simpan ke corpus. Return jumlah segmen."""
+        if not segments:
+            self.last_ingest = {'source_id': source_id, 'segments': 0, 'stored': 0, 'duplicates': 0}
+            return 0
+        if to_encode:
+            self.encoder.store(to_encode, future.result(), lookup)
+        texts = [s['segment_text'] for s in segments]
+        return self._ingest_segments(segments, self.encoder.assemble(texts, vectors, lookup, remember=False), source_id)
+
     def clear_corpus(self):
         """Clear semua corpus lokal."""
-        count = len(self.local_corpus)
-        self.local_corpus = []
-        logger.info(f"Cleared {count} segments from local corpus")
-        return count
+        with self._corpus_lock:
+            count = self.local_corpus.clear()
+            self.ann_index = None
+            self.source_index = None
+            if self.lexical_index is not None:
+                self.lexical_index.clear()
+            if self.cascade_screener is not None:
+                self.cascade_screener.clear()
+            if self.query_planner is not None:
+                self.query_planner.reset_vocabulary()
+            if isinstance(self.search_service, BM25SearchProvider):
+                self.search_service.reset_corpus()
+            self._reset_dedup_index()
+            if self.corpus_log is not None:
+                self.corpus_log.append_clear()
+            logger.info(f"Cleared {count} segments from local corpus")
+            return count
 
     def save_corpus(self, path: str) -> Dict[str, any]:
-        """Simpan corpus lokal (teks + embeddings) ke file pickle.
-
-        Embedding disimpan sebagai list float agar portable.
-        """
-        import pickle, time
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        start = time.time()
-        serializable = {
-            'format_version': self._corpus_format_version,
-            'model_name': self.model_name,
-            'segments': [
-                {
-                    'source_id': item['source_id'],
-                    'segment_id': item['segment_id'],
-                    'text': item['text'],
-                    'embedding': item['embedding'].detach().cpu().tolist()
-                }
-                for item in self.local_corpus
-            ]
-        }
-        with open(path, 'wb') as f:
-            pickle.dump(serializable, f, protocol=pickle.HIGHEST_PROTOCOL)
-        dur = round(time.time() - start, 2)
-        logger.info(f"Saved corpus ({len(self.local_corpus)} segments) to {path} in {dur}s")
-        return {'success': True, 'segments': len(self.local_corpus), 'path': path, 'time_sec': dur}
+        """Simpan corpus lokal ke direktori format v2 (array .npy + blob teks + meta.json).
+
+        Path berakhiran .pkl dipetakan ke direktori dengan nama yang sama tanpa ekstensi.
+        """
+        self._sync_screening_index()
+        with self._corpus_lock:
+            corpus_dir = self._resolve_corpus_dir(path)
+            start = time.time()
+            store = self.local_corpus
+            log = self.corpus_log or self._replayed_log
+            compacting = log is not None and os.path.abspath(log.directory) == os.path.abspath(corpus_dir)
+            extra_meta = {}
+            if self.cascade_screener is not None:
+                extra_meta['screen_model'] = self.cascade_screener.model_name
+            with ExitStack() as stack:
+                if compacting:
+                    stack.enter_context(log.locked())
+                    if not log.is_current():
+                        logger.warning(f"Save corpus ditolak: {log.path} diubah proses lain sejak dimuat")
+                        return {'success': False, 'segments': len(store), 'path': corpus_dir, 'message': 'Corpus log diubah proses lain; load ulang corpus sebelum menyimpan'}
+                    extra_meta.update({'log_generation': log.generation, 'log_offset': log.size})
+                store.save(corpus_dir, model_name=self.model_name, extra_meta=extra_meta)
+                if compacting:
+                    # Snapshot sudah mencakup seluruh isi log -> mulai generation log baru
+                    log.reset()
+            ann_path = self._ann_index_path(corpus_dir)
+            if self.ann_index is not None:
+                self.ann_index.save(ann_path)
+            elif os.path.exists(ann_path):
+                os.remove(ann_path)
+            minhash_path = self._minhash_path(corpus_dir)
+            if self.lexical_index is not None:
+                self._sync_lexical_index()
+                self.lexical_index.save(minhash_path)
+            elif os.path.exists(minhash_path):
+                os.remove(minhash_path)
+            screen_path = os.path.join(corpus_dir, SCREEN_FILE)
+            if self.cascade_screener is not None and len(self.cascade_screener) == len(store):
+                self.cascade_screener.save(corpus_dir)
+            elif os.path.exists(screen_path):
+                # Cascade nonaktif atau embedding screening belum sejajar: di-encode ulang saat load
+                os.remove(screen_path)
+            dur = round(time.time() - start, 2)
+            logger.info(f"Saved corpus ({len(store)} segments) to {corpus_dir} in {dur}s (format v{self._corpus_format_version})")
+            return {'success': True, 'segments': len(store), 'path': corpus_dir, 'format_version': self._corpus_format_version, 'time_sec': dur}
+
+    def _read_corpus(self, path: str, corpus_dir: str, log: Optional[CorpusSegmentLog]):
+        """Baca snapshot (v2 / pickle v1) lalu replay log di atasnya. Return None jika corpus tidak ada."""
+        legacy_path = path if os.path.isfile(path) else corpus_dir + ".pkl"
+        if CorpusStore.read_meta(corpus_dir) is not None:
+            store, meta = CorpusStore.load(corpus_dir, mmap=True, rerank_k=self.quantize_rerank_k)
+            loaded_path = corpus_dir
+        elif os.path.isfile(legacy_path):
+            logger.warning(f"Loading legacy pickle corpus {legacy_path}; convert with convert_corpus.py for fast mmap startup")
+            store, meta = load_legacy_pickle(
+                legacy_path,
+                encode_fn=self._encode_batch,
+                rerank_k=self.quantize_rerank_k
+            )
+            loaded_path = legacy_path
+        elif log is not None:
+            # Belum ada snapshot, seluruh isi corpus ada di log
+            store, meta = CorpusStore(rerank_k=self.quantize_rerank_k), {'format_version': CORPUS_FORMAT_VERSION}
+            loaded_path = corpus_dir
+        else:
+            return None
+        snapshot_size = len(store)
+        replayed = 0
+        log_cleared = False
+        if log is not None:
+            same_generation = meta.get('log_generation') == log.generation
+            for record in log.replay(meta.get('log_offset') if same_generation else None):
+                if record['op'] == 'clear':
+                    store.clear()
+                    log.segments = 0
+                    log_cleared = True
+                else:
+                    log.segments += apply_append_record(store, record)
+                replayed += 1
+            if replayed:
+                logger.info(f"Replayed {replayed} corpus log records ({len(store) - snapshot_size:+d} segments)")
+        return store, meta, loaded_path, snapshot_size, replayed, log_cleared
+
+    def _close_corpus_logs(self):
+        for log in {id(x): x for x in (self.corpus_log, self._replayed_log) if x is not None}.values():
+            log.close()
+        self.corpus_log = None
+        self._replayed_log = None
 
     def load_corpus(self, path: str) -> Dict[str, any]:
-        """Muat corpus lokal dari file pickle."""
-        import pickle, time
-        if not os.path.exists(path):
-            logger.warning(f"Corpus file not found: {path}")
-            return {'success': False, 'segments': 0, 'path': path, 'message': 'File not found'}
-        start = time.time()
-        with open(path, 'rb') as f:
-            data = pickle.load(f)
-        fmt = data.get('format_version', 0)
-        segments_raw = data.get('segments', [])
-        reconstructed = []
-        for seg in segments_raw:
-            emb_list = seg.get('embedding', [])
-            try:
-                emb_tensor = torch.tensor(emb_list, device=self.device)
-            except Exception:
-                emb_tensor = self._encode_text_cached(seg['text'])
-            reconstructed.append({
-                'source_id': seg['source_id'],
-                'segment_id': seg['segment_id'],
-                'text': seg['text'],
-                'embedding': emb_tensor
-            })
-        self.local_corpus = reconstructed
-        dur = round(time.time() - start, 2)
-        logger.info(f"Loaded corpus ({len(self.local_corpus)} segments) from {path} in {dur}s (format v{fmt})")
-        return {'success': True, 'segments': len(self.local_corpus), 'path': path, 'format_version': fmt, 'time_sec': dur}
+        """Muat corpus lokal: format v2 via mmap (zero-copy), atau pickle v1 lama sebagai fallback.
+
+        Jika direktori corpus berisi log append-only, record setelah snapshot
+        di-replay di atasnya sehingga penambahan sebelum restart tidak hilang.
+        """
+        with self._corpus_lock:
+            corpus_dir = self._resolve_corpus_dir(path)
+            start = time.time()
+            log = CorpusSegmentLog(corpus_dir) if os.path.isfile(os.path.join(corpus_dir, LOG_FILE_NAME)) else None
+            if log is not None:
+                # Snapshot + replay di bawah lock log: compaction proses lain tidak bisa menyisip di antaranya
+                with log.locked():
+                    loaded = self._read_corpus(path, corpus_dir, log)
+            else:
+                loaded = self._read_corpus(path, corpus_dir, None)
+            if loaded is None:
+                logger.warning(f"Corpus file not found: {path}")
+                return {'success': False, 'segments': 0, 'path': path, 'message': 'File not found'}
+            store, meta, loaded_path, snapshot_size, replayed, log_cleared = loaded
+            fmt = meta.get('format_version', 0)
+            if meta.get('model_name') and meta['model_name'] != self.model_name:
+                logger.warning(f"Corpus embeddings dibuat dengan model '{meta['model_name']}', model aktif '{self.model_name}'")
+            self._close_corpus_logs()
+            # Log yang sudah ada selalu di-replay, tetapi hanya ditulisi jika corpus_log_enabled
+            if self.corpus_log_enabled:
+                self.corpus_log = log or CorpusSegmentLog(corpus_dir)
+                self._replayed_log = None
+            else:
+                self.corpus_log = None
+                self._replayed_log = log
+            self.local_corpus.clear()
+            self.local_corpus = store
+            if self.query_planner is not None:
+                self.query_planner.reset_vocabulary()
+            self._reset_dedup_index()
+            self._apply_corpus_storage()
+            self.ann_index = None
+            ann_path = self._ann_index_path(corpus_dir)
+            if self.index_type != "exact" and loaded_path == corpus_dir and replayed == 0 and os.path.exists(ann_path):
+                try:
+                    index = load_ann_index(ann_path)
+                    if index.size == len(store) and not index.needs_rebuild(store):
+                        self.ann_index = index
+                except Exception as e:
+                    logger.warning(f"Gagal memuat ANN index {ann_path}: {e}")
+            if self.ann_index is None:
+                self._update_ann_index(range(0, len(store)))
+            self.source_index = None
+            self._update_source_index(range(0, len(store)))
+            if self.lexical_index is not None:
+                # Signature snapshot dipakai ulang jika masih sejajar; baris hasil replay dihitung ulang
+                self.lexical_index.clear()
+                minhash_path = self._minhash_path(corpus_dir)
+                if loaded_path == corpus_dir and os.path.exists(minhash_path):
+                    try:
+                        cached = MinHashLSH.load(minhash_path)
+                        same_params = (cached.num_perm, cached.bands) == (self.lexical_index.num_perm, self.lexical_index.bands)
+                        if same_params and len(cached) == snapshot_size and not log_cleared:
+                            self.lexical_index = cached
+                    except Exception as e:
+                        logger.warning(f"Gagal memuat MinHash index {minhash_path}: {e}")
+                self._sync_lexical_index()
+            if self.cascade_screener is not None:
+                # Embedding screening snapshot dipakai ulang jika model & baris cocok; baris replay di-encode
+                self.cascade_screener.clear()
+                if loaded_path == corpus_dir and meta.get('screen_model') == self.cascade_screener.model_name and not log_cleared:
+                    try:
+                        self.cascade_screener.load(corpus_dir, snapshot_size)
+                    except Exception as e:
+                        logger.warning(f"Gagal memuat screening embeddings: {e}")
+            dur = round(time.time() - start, 2)
+            logger.info(f"Loaded corpus ({len(self.local_corpus)} segments) from {loaded_path} in {dur}s (format v{fmt})")
+            result = {'success': True, 'segments': len(self.local_corpus), 'path': loaded_path, 'format_version': fmt, 'log_records_replayed': replayed, 'time_sec': dur}
+        # Baris replay / corpus tanpa snapshot screening di-encode model screening di luar lock
+        self._sync_screening_index()
+        return result
+
+    def get_cache_stats(self) -> Dict[str, any]:
+        """Statistik cache embedding (LRU in-memory dan persisten)."""
+        return {
+            'backend': {'requested': self.inference_backend, 'active': self.active_backend, 'model': self.active_model_name},
+            'encoder': self.batch_encoder.stats() if self.batch_encoder is not None else None,
+            'scheduler': self.encode_scheduler.stats() if self.encode_scheduler is not None else None,
+            'cascade': self.cascade_screener.stats() if self.cascade_screener is not None else None,
+            'span': self.span_encoder.stats() if self.span_encoder is not None else None,
+            'search': self.search_service.stats() if self.search_service is not None else None,
+            'query_planner': self.query_planner.stats() if self.query_planner is not None else None,
+            'memory': self.memory_cache.stats(),
+            'persistent': self.embedding_cache.stats() if self.embedding_cache is not None else None
+        }
 
     def get_corpus_info(self) -> Dict[str, any]:
         """Get informasi tentang corpus saat ini."""
-        if not self.local_corpus:
-            return {
-                'size': 0,
-                'sources': [],
-                'empty': True
-            }
+        with self._corpus_lock:
+            if not self.local_corpus:
+                return {
+                    'size': 0,
+                    'sources': [],
+                    'empty': True
+                }
         
-        # Hitung source yang unik
-        sources = {}
-        for item in self.local_corpus:
-            source_id = item['source_id']
-            sources[source_id] = sources.get(source_id, 0) + 1
+            # Hitung source yang unik (bincount atas array source_idx)
+            sources = self.local_corpus.source_counts()
         
+            return {
+                'size': len(self.local_corpus),
+                'sources': [{'source_id': k, 'segments': v} for k, v in sources.items()],
+                'embedding_dim': self.local_corpus.dim,
+                'memory_bytes': self.local_corpus.memory_bytes(),
+                'duplicate_segments': self.local_corpus.extra_owner_count,
+                'storage': self.local_corpus.memory_report(),
+                'log': self.corpus_log.stats() if self.corpus_log is not None else None,
+                'shards': self.shard_client.stats() if self.shard_client is not None else None,
+                'ann_index': self.ann_index.stats() if self.ann_index is not None and self._ann_enabled() else None,
+                'lexical_index': self.lexical_index.stats() if self.lexical_index is not None else None,
+                'source_index': self.source_index.stats() if self.source_index is not None and self._hierarchical_enabled() else None,
+                'empty': False
+            }
+
+    def _local_match_dict(self, row: int, score: float) -> Dict[str, any]:
+        """Bentuk dict match (format sama dengan hasil Google) dari baris corpus."""
+        return {
+            'snippet': self.local_corpus.get_text(row),
+            'similarity': float(score),
+            'url': None,
+            'title': f"LOCAL:{self.local_corpus.get_source(row)}",
+            'source': 'local_corpus',
+            # Semua source yang memuat segmen ini (segmen duplikat disimpan sekali)
+            'sources': list(dict.fromkeys(o['source_id'] for o in self.local_corpus.owners(row)))
+        }
+
+    def attach_shards(self, urls: List[str], timeout: float = 5.0) -> List[Dict[str, any]]:
+        """Aktifkan pencarian scatter-gather ke shard server. Return status health tiap shard."""
+        if self.shard_client is not None:
+            self.shard_client.close()
+        self.shard_client = ShardedCorpusClient(urls, timeout=timeout) if urls else None
+        if self.shard_client is None:
+            return []
+        health = self.shard_client.health()
+        for shard in health:
+            if shard['status'] == 'up' and shard.get('model_name') not in (None, self.model_name):
+                logger.warning(f"Shard {shard['url']} dibuat dengan model '{shard['model_name']}', model aktif '{self.model_name}'")
+        logger.info(f"Attached {len(urls)} corpus shards ({sum(h['status'] == 'up' for h in health)} up)")
+        return health
+
+    def close(self):
+        """Lepas resource background (micro-batcher, thread pool shard & search, file lock corpus log)."""
+        if self.batch_encoder is not None:
+            self.batch_encoder.close()
+        if self.shard_client is not None:
+            self.shard_client.close()
+        if self.search_service is not None:
+            self.search_service.close()
+        # Flush last_access & counter cache embedding yang masih tertunda di memori
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+        screen_cache = self.cascade_screener.encoder.embedding_cache if self.cascade_screener is not None else None
+        if screen_cache is not None and screen_cache is not self.embedding_cache:
+            screen_cache.close()
+        self._close_corpus_logs()
+
+    def match_local_corpus_batch(
+        self,
+        embeddings,
+        top_k: Optional[int] = None,
+        segment_texts: Optional[List[str]] = None,
+        stats: Optional[Dict[str, any]] = None
+    ) -> List[List[Dict[str, any]]]:
+        """
+        Matching seluruh segmen dokumen terhadap local corpus dalam satu pass.
+
+        Similarity segments x corpus dihitung dengan matmul ber-blok (tiled per
+        ``corpus_block_size`` baris corpus) sehingga memori puncak tetap terbatas.
+        Jika index ANN aktif, hanya cluster terdekat (``ann_nprobe``) yang di-scan.
+        Jika ``hierarchical_top_sources`` > 0, seluruh segmen submission lebih dulu
+        memilih M source terdekat (centroid dokumen), lalu matching segmen exact
+        hanya dilakukan pada baris milik source tersebut.
+        Jika ``segment_texts`` diberikan dan prefilter leksikal aktif, segmen dengan
+        kandidat LSH ber-Jaccard >= ``lexical_resolve_jaccard`` (copy hampir
+        verbatim) cukup di-skor terhadap kandidat tersebut tanpa scan corpus;
+        kandidat LSH segmen lain digabung ke shortlist ANN.
+        Jika shard server terpasang, embedding dikirim paralel ke semua shard dan
+        hasilnya di-merge dengan hasil corpus lokal.
+
+        Args:
+            embeddings: Embedding semua segmen (tensor / ndarray, shape (Q, dim))
+            top_k: Jumlah hit per segmen (default: ``local_top_k``)
+            segment_texts: Teks segmen (untuk prefilter MinHash/LSH, opsional)
+            stats: Dict milik pemanggil yang diisi statistik matching request ini
+                (strategi, segmen ter-resolve LSH / di-scan, laporan shard di ``'shards'``);
+                per panggilan, bukan state detector
+
+        Returns:
+            List (per segmen) berisi list match urut menurun similarity
+        """
+        k = top_k or self.local_top_k
+        n_queries = len(embeddings)
+        if not self.local_corpus and self.shard_client is None:
+            return [[] for _ in range(n_queries)]
+        queries = self._to_numpy(embeddings)
+        matches: List[List[Dict[str, any]]] = [[] for _ in range(n_queries)]
+        local_stats = {'segments': n_queries, 'lexical_resolved': 0, 'scanned': 0}
+        self._prepare_local_search()
+        with self._corpus_lock.shared():
+            if self.local_corpus:
+                hits, local_stats = self._search_local_rows(queries, k, segment_texts)
+                matches = [
+                    [self._local_match_dict(r, sc) for r, sc in zip(row_hits, score_hits) if r >= 0]
+                    for row_hits, score_hits in hits
+                ]
+        if self.shard_client is not None:
+            remote, local_stats['shards'] = self.shard_client.search(queries, top_k=k)
+            for local_hits, remote_hits in zip(matches, remote):
+                local_hits.extend(remote_hits)
+                local_hits.sort(key=lambda m: m['similarity'], reverse=True)
+                del local_hits[k:]
+        if stats is not None:
+            stats.update(local_stats)
+        return matches
+
+    def _search_local_rows(
+        self,
+        queries: np.ndarray,
+        k: int,
+        segment_texts: Optional[List[str]] = None,
+        top_sources: Optional[int] = None,
+        source_index: Optional[SourceCentroidIndex] = None
+    ) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], Dict[str, any]]:
+        """
+        Top-k baris local corpus per segmen dengan strategi aktif (LSH, hierarki source, ANN, atau exact).
+
+        ``top_sources`` / ``source_index`` mengganti M dan index source hanya untuk panggilan ini
+        (dipakai ``evaluate_corpus_recall``); konfigurasi detector tidak berubah.
+        """
+        n_queries = queries.shape[0]
+        top_m = self.hierarchical_top_sources if top_sources is None else top_sources
+        source_index = source_index or self.source_index
+        lexical = None
+        if self.lexical_index is not None and segment_texts is not None and len(segment_texts) == n_queries:
+            lexical = self._lexical_candidates(segment_texts)
+        resolved = [
+            lexical is not None and lexical[qi][1].size > 0 and lexical[qi][1][0] >= self.lexical_resolve_jaccard
+            for qi in range(n_queries)
+        ]
+        pending = [qi for qi in range(n_queries) if not resolved[qi]]
+        strategy = 'exact'
+        if source_index is not None and self._hierarchical_enabled(top_m):
+            strategy = 'hierarchical'
+        elif self.ann_index is not None and self._ann_enabled():
+            strategy = 'ann'
+        hits: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        shortlist = None
+        if pending:
+            if strategy == 'hierarchical':
+                # Shortlist source memakai seluruh segmen submission, bukan hanya yang pending
+                rows, scores, shortlist = source_index.search(self.local_corpus, queries, top_k=k, top_m=top_m)
+                rows, scores = rows[pending], scores[pending]
+            elif strategy == 'ann':
+                rows, scores = self.ann_index.search(self.local_corpus, queries[pending], top_k=k)
+            else:
+                rows, scores = self.local_corpus.search_batch(
+                    queries[pending], top_k=k, block_size=self.corpus_block_size
+                )
+            hits = {qi: (rows[i], scores[i]) for i, qi in enumerate(pending)}
+        normalized = l2_normalize(queries) if lexical is not None else None
+        results = []
+        for qi in range(n_queries):
+            # Exact scan sudah mencakup kandidat LSH; selain itu skor kandidat LSH (+ shortlist ANN / source)
+            candidates = lexical[qi][0] if lexical is not None and (resolved[qi] or strategy != 'exact') else None
+            if candidates is not None and candidates.size:
+                if qi in hits:
+                    candidates = np.union1d(candidates, hits[qi][0][hits[qi][0] >= 0])
+                hits[qi] = self.local_corpus.score_candidates(normalized[qi], candidates, k)
+            results.append(hits.get(qi, (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))))
+        stats = {
+            'segments': n_queries,
+            'strategy': strategy,
+            'lexical_resolved': n_queries - len(pending),
+            'scanned': len(pending)
+        }
+        if shortlist is not None:
+            stats['source_shortlist'] = shortlist
+        return results, stats
+
+    def evaluate_corpus_recall(self, text: str, top_k: int = 1, top_sources: Optional[int] = None) -> Dict[str, any]:
+        """
+        Bandingkan strategi matching aktif (LSH / hierarki source / ANN) dengan flat scan exact.
+
+        Args:
+            text: Teks uji
+            top_k: Jumlah hit per segmen yang dibandingkan
+            top_sources: M source untuk shortlist hanya pada pengecekan ini (0 = tanpa shortlist);
+                index source sementara dibangun bila index aktif tidak ada / tertinggal
+
+        Returns:
+            recall@k (fraksi baris top-k flat yang juga ditemukan), kecocokan top-1,
+            dan waktu kedua strategi
+        """
+        segment_texts = [s['segment_text'] for s in self.segment_text(text)]
+        if not segment_texts or not self.local_corpus:
+            return {'success': False, 'message': 'Teks kosong atau corpus kosong'}
+        queries = self._encode_batch(segment_texts)
+        self._prepare_local_search()
+        with self._corpus_lock.shared():
+            source_index = None
+            if top_sources and (
+                self.source_index is None or self.source_index.size != len(self.local_corpus)
+                or self.hierarchical_top_sources <= 0
+            ):
+                source_index = SourceCentroidIndex(centroids_per_source=self.source_centroids)
+                source_index.build(self.local_corpus)
+            start = time.time()
+            flat_rows, _ = self.local_corpus.search_batch(queries, top_k=top_k, block_size=self.corpus_block_size)
+            flat_time = time.time() - start
+            start = time.time()
+            hits, stats = self._search_local_rows(queries, top_k, segment_texts, top_sources=top_sources, source_index=source_index)
+            active_time = time.time() - start
+        found = total = top1 = 0
+        for (rows, _), expected in zip(hits, flat_rows):
+            expected = expected[expected >= 0]
+            found += int(np.isin(expected, rows).sum())
+            total += expected.size
+            top1 += bool(len(rows)) and expected.size > 0 and rows[0] == expected[0]
         return {
-            'size': len(self.local_corpus),
-            'sources': [{'source_id': k, 'segments': v} for k, v in sources.items()],
-            'empty': False
+            'success': True,
+            'segments': len(segment_texts),
+            'top_k': top_k,
+            'strategy': stats['strategy'],
+            'recall_at_k': round(float(found) / total, 4) if total else 1.0,
+            'top1_agreement': round(float(top1) / len(segment_texts), 4),
+            'flat_time_sec': round(flat_time, 4),
+            'active_time_sec': round(active_time, 4),
+            'stats': stats
         }
 
+    def evaluate_span_encoding(self, text: str, span_chunk_tokens: Optional[int] = None) -> Dict[str, any]:
+        """
+        Bandingkan embedding window mode 'span' dengan encode per window (referensi).
+
+        Args:
+            text: Teks dokumen uji
+            span_chunk_tokens: Panjang chunk (default: encoder span aktif, atau 256)
+
+        Returns:
+            Cosine span vs per window (mean / min / p05), waktu & token kedua mode, dan
+            jika corpus tidak kosong: kecocokan top-1 local corpus serta label di ``similarity_threshold``
+        """
+        segments = self.segment_text(text)
+        if len(segments) < 2:
+            return {'success': False, 'message': 'Teks terlalu pendek (minimal 2 window)'}
+        encoder = self.span_encoder
+        try:
+            if encoder is None or (span_chunk_tokens and span_chunk_tokens != encoder.max_tokens):
+                encoder = SpanPoolingEncoder(
+                    self.model, max_tokens=span_chunk_tokens or 256,
+                    max_batch_tokens=self.encode_scheduler.max_tokens if self.encode_scheduler is not None else 8192,
+                    device=self.device
+                )
+        except Exception as e:
+            return {'success': False, 'message': str(e)}
+        words = self.preprocess_text(text).split()
+        windows = [(s['start_word'], s['end_word']) for s in segments]
+        start = time.perf_counter()
+        reference = self._model_encode([s['segment_text'] for s in segments])
+        window_time = time.perf_counter() - start
+        before = encoder.stats()
+        start = time.perf_counter()
+        span = encoder.encode(words, windows)
+        span_time = time.perf_counter() - start
+        after = encoder.stats()
+        cosine = np.sum(l2_normalize(reference) * l2_normalize(span), axis=1)
+        result = {
+            'success': True,
+            'windows': len(segments),
+            'chunks': after['chunks'] - before['chunks'],
+            'chunk_tokens': after['chunk_tokens'] - before['chunk_tokens'],
+            'window_tokens': after['window_tokens'] - before['window_tokens'],
+            'mean_cosine': round(float(cosine.mean()), 5),
+            'min_cosine': round(float(cosine.min()), 5),
+            'p05_cosine': round(float(np.percentile(cosine, 5)), 5),
+            'window_time_sec': round(window_time, 4),
+            'span_time_sec': round(span_time, 4)
+        }
+        with self._corpus_lock.shared():
+            corpus_rows = len(self.local_corpus)
+            if corpus_rows:
+                ref_rows, ref_scores = self.local_corpus.search_batch(reference, top_k=1, block_size=self.corpus_block_size)
+                span_rows, span_scores = self.local_corpus.search_batch(span, top_k=1, block_size=self.corpus_block_size)
+        if corpus_rows:
+            result.update({
+                'top1_agreement': round(float((ref_rows[:, 0] == span_rows[:, 0]).mean()), 4),
+                'label_agreement': round(float(
+                    ((ref_scores[:, 0] >= self.similarity_threshold) == (span_scores[:, 0] >= self.similarity_threshold)).mean()
+                ), 4),
+                'max_score_diff': round(float(np.abs(ref_scores[:, 0] - span_scores[:, 0]).max()), 4)
+            })
+        return result
+
     def _match_local_corpus(self, segment_text: str, segment_embedding: torch.Tensor) -> Optional[Dict[str, any]]:
-        """Cari best match di local corpus menggunakan cosine similarity batch."""
-        if not self.local_corpus:
+        """Cari best match di local corpus (dot product terhadap matriks ter-normalisasi)."""
+        if not self.local_corpus and self.shard_client is None:
             return None
         try:
-            corpus_embeddings = torch.stack([item['embedding'] for item in self.local_corpus])
-            # Expand segment embedding
-            scores = util.cos_sim(segment_embedding, corpus_embeddings)[0]  # shape (N,)
-            best_idx = int(torch.argmax(scores).item())
-            best_score = float(scores[best_idx].item())
-            best_item = self.local_corpus[best_idx]
-            return {
-                'snippet': best_item['text'],
-                'similarity': best_score,
-                'url': None,
-                'title': f"LOCAL:{best_item['source_id']}",
-                'source': 'local_corpus'
-            }
+            matches = self.match_local_corpus_batch(self._to_numpy(segment_embedding).reshape(1, -1), top_k=1)[0]
+            return matches[0] if matches else None
         except Exception as e:
             logger.error(f"Gagal match local corpus: {e}")
             return None
     
+    def _cascade_applicable(self, use_search: bool, use_local_corpus: bool) -> bool:
+        """
+        Cascade hanya berlaku untuk matching local corpus: pencarian web tetap butuh
+        embedding model utama untuk setiap snippet, dan shard remote tidak punya
+        embedding model screening.
+        """
+        return (
+            self.cascade_screener is not None and use_local_corpus and bool(self.local_corpus)
+            and self.shard_client is None and not (use_search and self.search_service)
+        )
+
+    def _screen_segments(self, segment_texts: List[str], threshold: float) -> Optional[Dict[str, any]]:
+        """
+        Screening seluruh segmen dengan model kecil. Return hasil ``CascadeScreener.screen`` + durasi.
+
+        Segmen submission dan baris corpus baru di-encode model screening di luar
+        ``_corpus_lock``; lock shared hanya dipegang selama scan matriks screening.
+        Return None (semua segmen memakai model utama) jika matriks screening tidak
+        bisa disejajarkan dengan corpus, mis. ingest paralel terus menambah baris.
+        """
+        start = time.perf_counter()
+        screener = self.cascade_screener
+        embeddings = screener.encode(segment_texts)
+        # Threshold request yang lebih rendah dari suspicion threshold ikut menurunkan batas escalate
+        threshold = min(screener.suspicion_threshold, threshold)
+        screening = None
+        for _ in range(3):
+            self._sync_screening_index()
+            with self._corpus_lock.shared():
+                if len(screener) == len(self.local_corpus):
+                    screening = screener.screen(segment_texts, threshold, embeddings=embeddings)
+                    break
+        if screening is None:
+            logger.warning("Screening index cascade belum sejajar dengan local corpus, semua segmen memakai model utama")
+            return None
+        screening['seconds'] = time.perf_counter() - start
+        logger.info(
+            f"Cascade screening: {int(screening['escalate'].sum())}/{len(segment_texts)} segmen di-escalate "
+            f"ke {self.active_model_name} (suspicion >= {screening['threshold']})"
+        )
+        return screening
+
+    def _screened_matches(self, screening: Dict[str, any]) -> List[List[Dict[str, any]]]:
+        """
+        Match terbaik model screening per segmen (untuk segmen yang tidak di-escalate).
+
+        Cosine model screening berbeda skala dengan model utama, jadi tidak dipakai
+        sebagai ``similarity`` (0.0 = tidak dikonfirmasi, tidak ikut menaikkan
+        ``avg_similarity``) dan hanya dilaporkan di ``screen_similarity``.
+        """
+        with self._corpus_lock.shared():
+            matches = []
+            for row, score in zip(screening['rows'], screening['scores']):
+                if row < 0:
+                    matches.append([])
+                    continue
+                match = self._local_match_dict(int(row), 0.0)
+                match['screen_similarity'] = float(score)
+                matches.append([match])
+            return matches
+
     def preprocess_text(self, text: str) -> str:
         """
         Preprocessing teks: cleaning dan normalisasi
@@ -406,7 +1642,7 @@ class PlagiarismDetector:
     
     def search_google(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
         """
-        Mencari referensi di Google menggunakan Custom Search Engine
+        Mencari referensi lewat search provider aktif (Google CSE atau BM25 offline)
         
         Args:
             query: Query pencarian
@@ -418,36 +1654,95 @@ class PlagiarismDetector:
         if not self.search_service:
             logger.warning("Google Search service not available")
             return []
-        
-        try:
-            # Batasi panjang query (max 128 chars untuk CSE)
-            query = query[:128]
-            
-            # Execute search
-            result = self.search_service.cse().list(
-                q=query,
-                cx=self.google_cse_id,
-                num=num_results
-            ).execute()
-            
-            # Extract snippets and URLs
-            search_results = []
-            if 'items' in result:
-                for item in result['items']:
-                    search_results.append({
-                        'title': item.get('title', ''),
-                        'snippet': item.get('snippet', ''),
-                        'url': item.get('link', ''),
-                        'source': item.get('displayLink', '')
-                    })
-            
-            logger.info(f"Found {len(search_results)} results for query: {query[:50]}...")
-            return search_results
-            
-        except Exception as e:
-            logger.error(f"Error searching Google: {e}")
-            return []
+        self._sync_search_index()
+        return self.search_service.search(query, num_results)
+
+    def search_google_batch(self, queries: List[str], num_results: int = 5) -> List[List[Dict[str, str]]]:
+        """
+        Cari banyak query sekaligus (paralel, dibatasi konkurensi & rate limit client).
+
+        Returns:
+            List hasil per query, urutan sama dengan ``queries``
+        """
+        if not self.search_service:
+            logger.warning("Google Search service not available")
+            return [[] for _ in queries]
+        self._sync_search_index()
+        return self.search_service.search_many(queries, num_results)
+
+    def _sync_search_index(self):
+        """Index BM25 offline mengikuti local corpus (inkremental, hanya baris baru)."""
+        with self._corpus_lock:
+            if isinstance(self.search_service, BM25SearchProvider):
+                self.search_service.sync(self.local_corpus)
     
+    def _search_segments(
+        self,
+        segments: List[Dict[str, any]],
+        local_matches: Optional[List[List[Dict[str, any]]]],
+        threshold: float
+    ) -> Tuple[List[List[Dict[str, str]]], Dict[str, any]]:
+        """
+        Hasil pencarian web per segmen (urut segmen) beserta statistik query.
+
+        Dengan query planner, segmen yang sudah >= threshold di local corpus tidak
+        dicari, segmen bertetangga bisa berbagi satu query (sub-span kata langka)
+        dan jumlah query dibatasi budget per dokumen; segmen tanpa query memakai
+        hasil local corpus.
+        """
+        if self.query_planner is None:
+            results = self.search_google_batch([s['segment_text'] for s in segments])
+            return results, {'queries': len(segments), 'segments': len(segments), 'segments_covered': len(segments)}
+        with self._corpus_lock:
+            if self.local_corpus:
+                self.query_planner.update_vocabulary(self.local_corpus)
+        local_scores = None
+        if local_matches is not None:
+            local_scores = [matches[0]['similarity'] if matches else 0.0 for matches in local_matches]
+        plan = self.query_planner.plan(segments, local_scores, threshold)
+        query_results = self.search_google_batch(plan['queries']) if plan['queries'] else []
+        results = [query_results[q] if q is not None else [] for q in plan['assignment']]
+        stats = {k: v for k, v in plan.items() if k not in ('queries', 'groups', 'assignment')}
+        stats['queries'] = len(plan['queries'])
+        return results, stats
+
+    def _score_snippets(
+        self,
+        segment_texts: List[str],
+        all_search_results: List[List[Dict[str, str]]],
+        embeddings: Dict[int, torch.Tensor]
+    ) -> Tuple[Dict[int, List[float]], Dict[str, int]]:
+        """
+        Skor semua snippet hasil pencarian satu dokumen sekaligus.
+
+        Snippet dari semua segmen dikumpulkan dan di-dedup (segmen yang berbagi
+        query berbagi snippet), di-encode dalam satu batch, lalu dibandingkan
+        dengan embedding segmen lewat satu perkalian matriks.
+
+        Returns:
+            (cosine per snippet untuk setiap index segmen yang punya hasil, statistik snippet)
+        """
+        searched = [i for i, results in enumerate(all_search_results) if results]
+        snippets = [r['snippet'] for i in searched for r in all_search_results[i]]
+        unique = list(dict.fromkeys(snippets))
+        stats = {'snippets': len(snippets), 'unique_snippets': len(unique)}
+        if not searched:
+            return {}, stats
+        position = {snippet: j for j, snippet in enumerate(unique)}
+        missing = [i for i in searched if i not in embeddings]
+        if missing:
+            encoded = self._encode_batch([segment_texts[i] for i in missing])
+            embeddings = {**embeddings, **{i: torch.from_numpy(v.copy()).to(self.device) for i, v in zip(missing, encoded)}}
+        segment_matrix = torch.stack([embeddings[i] for i in searched])
+        snippet_matrix = torch.from_numpy(self._encode_batch(unique)).to(self.device)
+        # (segmen, snippet unik) dalam satu operasi
+        similarities = util.cos_sim(segment_matrix, snippet_matrix).cpu().numpy()
+        scores = {
+            i: [float(similarities[row, position[r['snippet']]]) for r in all_search_results[i]]
+            for row, i in enumerate(searched)
+        }
+        return scores, stats
+
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """
         Menghitung semantic similarity antara dua teks menggunakan SBERT
@@ -478,7 +1773,10 @@ class PlagiarismDetector:
         segment: Dict[str, any],
         search_results: List[Dict[str, str]],
         precomputed_embedding: Optional[torch.Tensor] = None,
-        use_local_corpus: bool = True
+        use_local_corpus: bool = True,
+        local_matches: Optional[List[Dict[str, any]]] = None,
+        threshold: Optional[float] = None,
+        snippet_similarities: Optional[List[float]] = None
     ) -> Dict[str, any]:
         """
         Mendeteksi plagiarisme untuk satu segment
@@ -486,20 +1784,30 @@ class PlagiarismDetector:
         Args:
             segment: Dictionary segment teks
             search_results: List hasil pencarian Google
+            local_matches: Hasil match local corpus yang sudah dihitung batch (opsional)
+            snippet_similarities: Cosine segmen vs setiap snippet ``search_results`` yang sudah dihitung batch (opsional)
+            threshold: Threshold khusus request ini (default: ``similarity_threshold``)
             
         Returns:
             Dictionary hasil deteksi untuk segment
         """
         segment_text = segment['segment_text']
+        threshold = self.similarity_threshold if threshold is None else threshold
         
-        # Precomputed embedding (batch) atau ambil dari cache
-        segment_embedding = precomputed_embedding if precomputed_embedding is not None else self._get_segment_embedding(segment_text)
+        # Precomputed embedding (batch) atau ambil dari cache (hanya jika benar-benar dibutuhkan)
+        def segment_embedding_or_encode() -> torch.Tensor:
+            return precomputed_embedding if precomputed_embedding is not None else self._get_segment_embedding(segment_text)
 
         # Jika tidak ada hasil pencarian Google, coba local corpus
         if not search_results:
-            local_match = self._match_local_corpus(segment_text, segment_embedding) if use_local_corpus else None
+            if not use_local_corpus:
+                local_matches = []
+            elif local_matches is None:
+                single = self._match_local_corpus(segment_text, segment_embedding_or_encode())
+                local_matches = [single] if single else []
+            local_match = local_matches[0] if local_matches else None
             similarity_score = local_match['similarity'] if local_match else 0.0
-            label = 'Plagiat' if local_match and similarity_score >= self.similarity_threshold else 'Original'
+            label = 'Plagiat' if local_match and similarity_score >= threshold else 'Original'
             return {
                 'segment_id': segment['segment_id'],
                 'segment_text': segment_text,
@@ -510,27 +1818,30 @@ class PlagiarismDetector:
                 'source_url': None,
                 'source_title': local_match['title'] if local_match else None,
                 'source_domain': local_match['source'] if local_match else None,
-                'all_matches': [local_match] if local_match else []
+                'all_matches': local_matches[:3]
             }
         
-        # Hitung similarity dengan semua snippets
-        # segment_embedding sudah disiapkan
-        matches = []
-        for result in search_results:
-            snippet = result['snippet']
+        # Hitung similarity dengan semua snippets (skor batch per dokumen, atau satu batch encode per segmen)
+        if snippet_similarities is not None:
+            similarities = snippet_similarities
+        else:
+            segment_embedding = segment_embedding_or_encode()
             try:
-                snippet_embedding = self._encode_text_cached(snippet)
-                similarity = util.cos_sim(segment_embedding, snippet_embedding).item()
+                snippet_embeddings = torch.from_numpy(self._encode_batch([r['snippet'] for r in search_results])).to(self.device)
+                similarities = util.cos_sim(segment_embedding, snippet_embeddings)[0].tolist()
             except Exception as e:
                 logger.error(f"Gagal hitung similarity snippet: {e}")
-                similarity = 0.0
-            matches.append({
-                'snippet': snippet,
+                similarities = [0.0] * len(search_results)
+        matches = [
+            {
+                'snippet': result['snippet'],
                 'similarity': similarity,
                 'url': result['url'],
                 'title': result['title'],
                 'source': result['source']
-            })
+            }
+            for result, similarity in zip(search_results, similarities)
+        ]
         
         # Sort by similarity (descending)
         matches.sort(key=lambda x: x['similarity'], reverse=True)
@@ -539,7 +1850,7 @@ class PlagiarismDetector:
         best_match = matches[0] if matches else None
         
         # Klasifikasi
-        if best_match and best_match['similarity'] >= self.similarity_threshold:
+        if best_match and best_match['similarity'] >= threshold:
             label = 'Plagiat'
         else:
             label = 'Original'
@@ -557,13 +1868,22 @@ class PlagiarismDetector:
             'all_matches': matches[:3]  # Top 3 matches
         }
     
-    def detect_plagiarism(self, text: str, use_search: bool = True, use_local_corpus: bool = True, add_to_corpus: bool = False, corpus_source_id: Optional[str] = None) -> Dict[str, any]:
+    def detect_plagiarism(
+        self,
+        text: str,
+        use_search: bool = True,
+        use_local_corpus: bool = True,
+        add_to_corpus: bool = False,
+        corpus_source_id: Optional[str] = None,
+        threshold: Optional[float] = None
+    ) -> Dict[str, any]:
         """
         Deteksi plagiarisme untuk seluruh teks
         
         Args:
             text: Teks yang akan dianalisis
             use_search: Apakah menggunakan Google search
+            threshold: Threshold khusus request ini (aman untuk request paralel; default: ``similarity_threshold``)
             
         Returns:
             Dictionary hasil deteksi lengkap
@@ -572,14 +1892,84 @@ class PlagiarismDetector:
         
         # Segmentasi teks
         segments = self.segment_text(text)
-        
-        # Batch embedding untuk semua segmen (optimasi)
         segment_texts = [s['segment_text'] for s in segments]
+        threshold_used = self.similarity_threshold if threshold is None else threshold
+
+        # Cascade: screening model kecil, hanya segmen mencurigakan yang di-encode model utama
+        screening = None
+        if self._cascade_applicable(use_search, use_local_corpus) and segment_texts:
+            try:
+                screening = self._screen_segments(segment_texts, threshold_used)
+            except Exception as e:
+                logger.error(f"Gagal screening cascade: {e}. Semua segmen memakai model utama.")
+        confirm = list(range(len(segments))) if screening is None else np.flatnonzero(screening['escalate']).tolist()
+        confirm_start = time.perf_counter()
+
+        # Batch embedding untuk semua segmen yang dikonfirmasi model utama (optimasi)
+        confirm_texts = [segment_texts[i] for i in confirm]
         try:
-            batch_embeddings = self.model.encode(segment_texts, convert_to_tensor=True, device=self.device)
+            if screening is None and confirm_texts:
+                batch_embeddings = torch.from_numpy(self._encode_segments(text, segments)).to(self.device)
+            else:
+                batch_embeddings = torch.from_numpy(self._encode_batch(confirm_texts)).to(self.device) if confirm_texts else []
         except Exception as e:
             logger.error(f"Gagal batch encode segmen: {e}. Fallback per-segment.")
-            batch_embeddings = [self._get_segment_embedding(t) for t in segment_texts]
+            batch_embeddings = [self._get_segment_embedding(t) for t in confirm_texts]
+        embeddings = dict(zip(confirm, batch_embeddings))
+
+        # Matching local corpus untuk seluruh dokumen sekaligus (satu pass matmul ber-blok)
+        all_local_matches = None
+        match_stats: Dict[str, any] = {}
+        if use_local_corpus and (self.local_corpus or self.shard_client is not None) and len(segment_texts) > 0:
+            try:
+                if confirm_texts:
+                    confirmed = self.match_local_corpus_batch(batch_embeddings, segment_texts=confirm_texts, stats=match_stats)
+                else:
+                    confirmed = []
+                    match_stats = {'segments': 0, 'strategy': 'cascade', 'lexical_resolved': 0, 'scanned': 0}
+                if screening is None:
+                    all_local_matches = confirmed
+                else:
+                    all_local_matches = self._screened_matches(screening)
+                    for i, matches in zip(confirm, confirmed):
+                        all_local_matches[i] = matches
+            except Exception as e:
+                logger.error(f"Gagal batch match local corpus: {e}. Fallback per-segment.")
+        cascade_stats = None
+        if screening is not None:
+            confirm_seconds = time.perf_counter() - confirm_start
+            self.cascade_screener.record(len(segments), len(confirm), screening['seconds'], confirm_seconds)
+            cascade_stats = {
+                'screen_model': self.cascade_screener.model_name,
+                'suspicion_threshold': screening['threshold'],
+                'segments': len(segments),
+                'escalated': len(confirm),
+                'screened_out': len(segments) - len(confirm),
+                'screen_seconds': round(screening['seconds'], 4),
+                'confirm_seconds': round(confirm_seconds, 4)
+            }
+
+        # Search Google untuk semua segmen sekaligus (paralel, hasil urut per segmen)
+        all_search_results = None
+        search_stats = None
+        if use_search and self.search_service and segment_texts:
+            search_start = time.perf_counter()
+            all_search_results, search_stats = self._search_segments(segments, all_local_matches, threshold_used)
+            search_stats['provider'] = self.search_service.kind
+            search_stats['seconds'] = round(time.perf_counter() - search_start, 4)
+            logger.info(
+                f"Search ({self.search_service.kind}): {search_stats['queries']} query untuk {search_stats['segments_covered']}/"
+                f"{len(segments)} segmen dalam {search_stats['seconds']:.2f}s"
+            )
+
+        # Skor snippet semua segmen sekaligus (dedup, satu batch encode, satu matmul)
+        snippet_scores: Dict[int, List[float]] = {}
+        if all_search_results is not None:
+            try:
+                snippet_scores, snippet_stats = self._score_snippets(segment_texts, all_search_results, embeddings)
+                search_stats.update(snippet_stats)
+            except Exception as e:
+                logger.error(f"Gagal batch skor snippet: {e}. Fallback per-segment.")
 
         # Deteksi per segment
         detection_results = []
@@ -588,17 +1978,21 @@ class PlagiarismDetector:
         
         for idx, segment in enumerate(segments, 1):
             logger.info(f"Processing segment {idx}/{len(segments)}")
-            
-            # Search Google jika enabled
-            if use_search and self.search_service:
-                search_results = self.search_google(segment['segment_text'])
-            else:
-                search_results = []
+            search_results = all_search_results[idx - 1] if all_search_results is not None else []
             
             # Detect plagiarism
-            # Ambil embedding batch
-            embedding = batch_embeddings[idx-1] if isinstance(batch_embeddings, torch.Tensor) else batch_embeddings[idx-1]
-            result = self.detect_segment_plagiarism(segment, search_results, precomputed_embedding=embedding, use_local_corpus=use_local_corpus)
+            # Ambil embedding batch (segmen yang lolos screening cascade tidak punya embedding model utama)
+            result = self.detect_segment_plagiarism(
+                segment,
+                search_results,
+                precomputed_embedding=embeddings.get(idx - 1),
+                use_local_corpus=use_local_corpus,
+                local_matches=all_local_matches[idx-1] if all_local_matches is not None else None,
+                threshold=threshold,
+                snippet_similarities=snippet_scores.get(idx - 1)
+            )
+            if screening is not None:
+                result['cascade_stage'] = 'confirm' if screening['escalate'][idx - 1] else 'screen'
             detection_results.append(result)
             
             # Statistics
@@ -625,9 +2019,18 @@ class PlagiarismDetector:
             'original_segments': total_segments - plagiarized_count,
             'plagiarism_percentage': round(plagiarism_percentage, 2),
             'avg_similarity': round(avg_similarity, 4),
-            'threshold_used': self.similarity_threshold,
+            'threshold_used': threshold_used,
             'details': detection_results
         }
+        if cascade_stats is not None:
+            final_result['cascade'] = cascade_stats
+        if search_stats is not None:
+            final_result['search'] = search_stats
+        if self.shard_client is not None and all_local_matches is not None:
+            # Laporkan shard yang gagal agar hasil parsial bisa dikenali
+            final_result['corpus_shards'] = match_stats.pop('shards', None)
+        if all_local_matches is not None and self.local_corpus:
+            final_result['local_match_stats'] = match_stats
         
         logger.info(f"Detection completed. Plagiarism: {plagiarism_percentage:.2f}%")
         return final_result
@@ -0,0 +1,276 @@
+"""
+Quantization Embedding Corpus
+Kompresi vektor corpus (int8 per-vector scale / product quantization / proyeksi dimensi rendah)
+untuk mengurangi memori resident
+"""
+
+import numpy as np
+from typing import Dict, Optional
+
+
+class Int8Quantizer:
+    """
+    Scalar quantization int8 dengan scale per vektor: x ~= codes * scale.
+
+    Skor aproksimasi = (codes @ q) * scale. Kompresi ~4x (1 byte/dim + 4 byte scale).
+    """
+
+    kind = "int8"
+
+    def train(self, data: np.ndarray):
+        """Tidak perlu training (scale dihitung per vektor)."""
+        return self
+
+    def encode(self, data: np.ndarray) -> Dict[str, np.ndarray]:
+        data = np.asarray(data, dtype=np.float32)
+        scales = np.abs(data).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(data / scales[:, None]), -127, 127).astype(np.int8)
+        return {'codes': codes, 'scales': scales.astype(np.float32)}
+
+    def decode(self, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        return codes['codes'].astype(np.float32) * codes['scales'][:, None]
+
+    def prepare(self, queries: np.ndarray) -> np.ndarray:
+        return np.asarray(queries, dtype=np.float32)
+
+    def scores(self, prepared: np.ndarray, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        """Skor (Q, B) antara query ter-normalisasi dan blok kode."""
+        return (prepared @ codes['codes'].T.astype(np.float32)) * codes['scales'][None, :]
+
+    def code_bytes_per_vector(self, dim: int) -> int:
+        return dim + 4
+
+    def params(self) -> Dict[str, any]:
+        return {}
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "Int8Quantizer":
+        return cls()
+
+
+class ProductQuantizer:
+    """
+    Product Quantization: vektor dibagi ``n_subvectors`` sub-ruang, tiap sub-ruang
+    di-kuantisasi ke salah satu ``n_centroids`` centroid (kode uint8).
+
+    Skor dihitung dengan Asymmetric Distance Computation (ADC): query tetap float,
+    tabel inner product (m, ksub) dihitung sekali per query lalu di-lookup per kode.
+    """
+
+    kind = "pq"
+
+    def __init__(self, n_subvectors: int = 16, n_centroids: int = 256, n_iter: int = 15, train_sample: int = 50000, seed: int = 42):
+        if n_centroids > 256:
+            raise ValueError("n_centroids maksimum 256 (kode uint8)")
+        self.n_subvectors = n_subvectors
+        self.n_centroids = n_centroids
+        self.n_iter = n_iter
+        self.train_sample = train_sample
+        self.seed = seed
+        self.codebooks: Optional[np.ndarray] = None  # (m, ksub, dsub)
+
+    def _split(self, data: np.ndarray) -> np.ndarray:
+        n, dim = data.shape
+        if dim % self.n_subvectors != 0:
+            raise ValueError(f"Dimensi {dim} tidak habis dibagi n_subvectors={self.n_subvectors}")
+        return data.reshape(n, self.n_subvectors, dim // self.n_subvectors)
+
+    def train(self, data: np.ndarray):
+        rng = np.random.default_rng(self.seed)
+        data = np.asarray(data, dtype=np.float32)
+        if data.shape[0] > self.train_sample:
+            data = data[rng.choice(data.shape[0], self.train_sample, replace=False)]
+        ksub = min(self.n_centroids, data.shape[0])
+        sub = self._split(data)
+        codebooks = []
+        for j in range(self.n_subvectors):
+            x = sub[:, j, :]
+            centroids = x[rng.choice(x.shape[0], ksub, replace=False)].copy()
+            for _ in range(self.n_iter):
+                assign = self._nearest(x, centroids)
+                counts = np.bincount(assign, minlength=ksub)
+                sums = np.zeros_like(centroids)
+                order = np.argsort(assign, kind='stable')
+                nonempty = np.flatnonzero(counts)
+                starts = np.concatenate([[0], np.cumsum(counts)])[nonempty]
+                sums[nonempty] = np.add.reduceat(x[order], starts, axis=0)
+                centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+            codebooks.append(centroids)
+        self.codebooks = np.stack(codebooks).astype(np.float32)
+        return self
+
+    @staticmethod
+    def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||x - c||^2 = argmax (x.c - ||c||^2 / 2)
+        return np.argmax(x @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1)[None, :], axis=1)
+
+    def encode(self, data: np.ndarray) -> Dict[str, np.ndarray]:
+        sub = self._split(np.asarray(data, dtype=np.float32))
+        codes = np.empty((sub.shape[0], self.n_subvectors), dtype=np.uint8)
+        for j in range(self.n_subvectors):
+            codes[:, j] = self._nearest(sub[:, j, :], self.codebooks[j])
+        return {'codes': codes}
+
+    def decode(self, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        c = codes['codes']
+        parts = [self.codebooks[j][c[:, j]] for j in range(self.n_subvectors)]
+        return np.concatenate(parts, axis=1)
+
+    def prepare(self, queries: np.ndarray) -> np.ndarray:
+        """Tabel ADC (Q, m, ksub): inner product sub-query dengan setiap centroid."""
+        sub = self._split(np.asarray(queries, dtype=np.float32))
+        return np.einsum('qmd,mkd->qmk', sub, self.codebooks)
+
+    def scores(self, prepared: np.ndarray, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        c = codes['codes']
+        out = np.zeros((prepared.shape[0], c.shape[0]), dtype=np.float32)
+        for j in range(self.n_subvectors):
+            out += prepared[:, j, :][:, c[:, j]]
+        return out
+
+    def code_bytes_per_vector(self, dim: int) -> int:
+        return self.n_subvectors
+
+    def params(self) -> Dict[str, any]:
+        return {'n_subvectors': self.n_subvectors, 'n_centroids': self.n_centroids}
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {'codebooks': self.codebooks}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "ProductQuantizer":
+        codebooks = state['codebooks']
+        pq = cls(n_subvectors=codebooks.shape[0], n_centroids=codebooks.shape[1])
+        pq.codebooks = codebooks
+        return pq
+
+
+class PCAProjector:
+    """
+    Proyeksi linear ke ``dims`` arah utama corpus untuk pencarian tahap pertama.
+
+    Komponen = eigenvector teratas matriks momen kedua X^T X (tanpa centering),
+    yaitu proyeksi rank-``dims`` yang paling menjaga inner product x.q untuk
+    vektor ter-normalisasi. Kode disimpan float16 (2 byte/dim, mis. 128 dim =
+    256 byte vs 3072 byte float32 768 dim); kandidat teratas di-skor ulang
+    dengan vektor penuh oleh ``CorpusStore``.
+    """
+
+    kind = "pca"
+
+    def __init__(self, dims: int = 128, train_sample: int = 100000, seed: int = 42):
+        self.dims = dims
+        self.train_sample = train_sample
+        self.seed = seed
+        self.components: Optional[np.ndarray] = None  # (dims, dim)
+        self.explained_variance: Optional[float] = None
+
+    def train(self, data: np.ndarray):
+        rng = np.random.default_rng(self.seed)
+        data = np.asarray(data, dtype=np.float32)
+        if data.shape[0] > self.train_sample:
+            data = data[rng.choice(data.shape[0], self.train_sample, replace=False)]
+        if self.dims >= data.shape[1]:
+            raise ValueError(f"dims={self.dims} harus lebih kecil dari dimensi embedding ({data.shape[1]})")
+        second_moment = (data.T.astype(np.float64) @ data) / max(data.shape[0], 1)
+        eigvals, eigvecs = np.linalg.eigh(second_moment)
+        top = np.argsort(eigvals)[::-1][:self.dims]
+        self.components = np.ascontiguousarray(eigvecs[:, top].T, dtype=np.float32)
+        self.explained_variance = float(eigvals[top].sum() / max(eigvals.sum(), 1e-12))
+        return self
+
+    def encode(self, data: np.ndarray) -> Dict[str, np.ndarray]:
+        return {'codes': (np.asarray(data, dtype=np.float32) @ self.components.T).astype(np.float16)}
+
+    def decode(self, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        return codes['codes'].astype(np.float32) @ self.components
+
+    def prepare(self, queries: np.ndarray) -> np.ndarray:
+        return np.asarray(queries, dtype=np.float32) @ self.components.T
+
+    def scores(self, prepared: np.ndarray, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        return prepared @ codes['codes'].T.astype(np.float32)
+
+    def code_bytes_per_vector(self, dim: int) -> int:
+        return self.dims * 2
+
+    def params(self) -> Dict[str, any]:
+        return {'dims': self.dims}
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {'components': self.components}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "PCAProjector":
+        projector = cls(dims=state['components'].shape[0])
+        projector.components = state['components']
+        return projector
+
+
+class TruncationProjector:
+    """
+    Pemotongan dimensi ala Matryoshka: ambil ``dims`` dimensi pertama lalu normalisasi ulang.
+
+    Hanya akurat untuk model yang dilatih Matryoshka (informasi terkonsentrasi di
+    dimensi awal); untuk model SBERT biasa gunakan ``PCAProjector``.
+    """
+
+    kind = "truncate"
+
+    def __init__(self, dims: int = 128):
+        self.dims = dims
+
+    def train(self, data: np.ndarray):
+        if self.dims >= np.asarray(data).shape[1]:
+            raise ValueError(f"dims={self.dims} harus lebih kecil dari dimensi embedding")
+        return self
+
+    def _truncate(self, data: np.ndarray) -> np.ndarray:
+        head = np.asarray(data, dtype=np.float32)[:, :self.dims]
+        norms = np.linalg.norm(head, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return head / norms
+
+    def encode(self, data: np.ndarray) -> Dict[str, np.ndarray]:
+        return {'codes': self._truncate(data).astype(np.float16)}
+
+    def decode(self, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        return codes['codes'].astype(np.float32)
+
+    def prepare(self, queries: np.ndarray) -> np.ndarray:
+        return self._truncate(queries)
+
+    def scores(self, prepared: np.ndarray, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        return prepared @ codes['codes'].T.astype(np.float32)
+
+    def code_bytes_per_vector(self, dim: int) -> int:
+        return self.dims * 2
+
+    def params(self) -> Dict[str, any]:
+        return {'dims': self.dims}
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {'dims': np.array([self.dims])}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "TruncationProjector":
+        return cls(dims=int(state['dims'][0]))
+
+
+QUANTIZERS = {
+    Int8Quantizer.kind: Int8Quantizer,
+    ProductQuantizer.kind: ProductQuantizer,
+    PCAProjector.kind: PCAProjector,
+    TruncationProjector.kind: TruncationProjector,
+}
+
+
+def create_quantizer(kind: str, **params):
+    """Factory quantizer berdasarkan nama ('int8', 'pq', 'pca' atau 'truncate')."""
+    if kind not in QUANTIZERS:
+        raise ValueError(f"Unknown quantizer: {kind} (available: {list(QUANTIZERS)})")
+    return QUANTIZERS[kind](**params)
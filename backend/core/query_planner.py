@@ -0,0 +1,246 @@
+"""
+Search Query Planner
+Menyusun query web per dokumen: lewati segmen yang sudah cocok di local corpus, pilih sub-span kata langka,
+gabungkan segmen bertetangga dan batasi jumlah query per dokumen
+"""
+
+import re
+import math
+import threading
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional
+from loguru import logger
+
+from .search_cache import MAX_QUERY_CHARS
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Kata fungsi Indonesia/Inggris yang tidak membedakan dokumen (dipakai jika belum ada statistik corpus)
+STOPWORDS = frozenset("""
+yang dan di ke dari untuk pada dengan dalam ini itu adalah sebagai oleh atau juga akan tidak karena
+bahwa dapat telah sudah ada serta secara lebih agar hal tersebut yaitu antara setiap bagi para maka
+namun sehingga kepada masih harus saat jika bisa belum hanya suatu sebuah tentang terhadap melalui
+the of and to in a is that for on with as by are be this it from or an at which was were been has
+have not can their its these such into also than other more between
+""".split())
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+class SearchQueryPlanner:
+    """
+    Perencana query Google CSE untuk satu dokumen.
+
+    Bobot kata = IDF dari statistik document frequency local corpus (sampel baris,
+    diperbarui saat corpus bertambah); tanpa corpus dipakai bobot dasar (stopword
+    dan kata pendek = 0). Setiap unit query (satu segmen, atau beberapa segmen
+    bertetangga yang digabung) dicari dengan sub-span ``query_words`` kata dengan
+    total bobot tertinggi, bukan 128 karakter pertama segmen.
+    """
+
+    def __init__(
+        self,
+        query_words: int = 16,
+        max_queries: int = 0,
+        skip_local_matches: bool = True,
+        merge_adjacent: bool = True,
+        max_group_segments: int = 4,
+        vocabulary_sample_rows: int = 200000
+    ):
+        self.query_words = query_words
+        self.max_queries = max_queries
+        self.skip_local_matches = skip_local_matches
+        self.merge_adjacent = merge_adjacent
+        self.max_group_segments = max(1, max_group_segments)
+        self.vocabulary_sample_rows = vocabulary_sample_rows
+        self._lock = threading.Lock()
+        self._document_frequency: Counter = Counter()
+        self._vocabulary_rows = 0
+        self._sampled_rows = 0
+        self.documents = 0
+        self.segments = 0
+        self.queries = 0
+        self.skipped_local = 0
+        self.over_budget = 0
+
+    # ------------------------------------------------------------------
+    # Statistik kata (document frequency local corpus)
+    # ------------------------------------------------------------------
+    def update_vocabulary(self, corpus) -> int:
+        """
+        Tambahkan baris corpus baru ke statistik document frequency (sampel ber-stride).
+
+        Return jumlah baris yang dihitung. Corpus yang mengecil (clear) mereset statistik.
+        """
+        with self._lock:
+            if len(corpus) < self._vocabulary_rows:
+                self._document_frequency = Counter()
+                self._vocabulary_rows = 0
+                self._sampled_rows = 0
+            start = self._vocabulary_rows
+            if len(corpus) == start:
+                return 0
+            stride = max(1, math.ceil(len(corpus) / self.vocabulary_sample_rows))
+            rows = range(start, len(corpus), stride)
+            for row in rows:
+                self._document_frequency.update(set(_tokens(corpus.get_text(row))))
+            self._vocabulary_rows = len(corpus)
+            self._sampled_rows += len(rows)
+        logger.debug(f"Query planner vocabulary: {len(rows)} baris baru, {len(self._document_frequency)} kata")
+        return len(rows)
+
+    def reset_vocabulary(self):
+        with self._lock:
+            self._document_frequency = Counter()
+            self._vocabulary_rows = 0
+            self._sampled_rows = 0
+
+    def word_weights(self, words: List[str]) -> np.ndarray:
+        """Bobot kelangkaan per kata (0 untuk stopword, angka murni dan kata < 3 huruf)."""
+        n = self._sampled_rows
+        weights = np.zeros(len(words), dtype=np.float64)
+        for i, word in enumerate(words):
+            tokens = _tokens(word)
+            if not tokens:
+                continue
+            token = max(tokens, key=len)
+            if len(token) < 3 or token in STOPWORDS or token.isdigit():
+                continue
+            if n:
+                weights[i] = math.log((n + 1) / (self._document_frequency.get(token, 0) + 1)) + 1.0
+            else:
+                weights[i] = 1.0 + min(len(token), 12) / 12
+        return weights
+
+    def select_span(self, words: List[str]) -> Dict[str, any]:
+        """Sub-span ``query_words`` kata dengan total bobot tertinggi (dipotong agar <= 128 karakter)."""
+        weights = self.word_weights(words)
+        width = min(self.query_words, len(words))
+        if width == 0:
+            return {'query': '', 'score': 0.0, 'start': 0}
+        window = np.convolve(weights, np.ones(width), mode='valid')
+        start = int(np.argmax(window))
+        span = words[start:start + width]
+        while len(span) > 1 and len(" ".join(span)) > MAX_QUERY_CHARS:
+            # Buang kata ujung dengan bobot terkecil sampai muat batas panjang query CSE
+            if weights[start] <= weights[start + len(span) - 1]:
+                span = span[1:]
+                start += 1
+            else:
+                span = span[:-1]
+        return {'query': " ".join(span), 'score': float(window.max()) / width, 'start': start}
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _group_words(segments: List[Dict[str, any]]) -> List[str]:
+        """Kata gabungan segmen bertetangga (overlap sliding window dihitung sekali)."""
+        words = segments[0]['segment_text'].split()
+        end = segments[0]['end_word']
+        for segment in segments[1:]:
+            seg_words = segment['segment_text'].split()
+            words.extend(seg_words[max(0, end - segment['start_word']):])
+            end = segment['end_word']
+        return words
+
+    def _groups(self, segments: List[Dict[str, any]], needed: List[int]) -> List[List[int]]:
+        """Kelompokkan index segmen yang perlu dicari menjadi unit query (segmen bertetangga digabung)."""
+        runs: List[List[int]] = []
+        for i in needed:
+            if runs and runs[-1][-1] == i - 1:
+                runs[-1].append(i)
+            else:
+                runs.append([i])
+        if not self.merge_adjacent:
+            return [[i] for i in needed]
+        per_group = 1
+        if self.max_queries and len(needed) > self.max_queries:
+            per_group = min(self.max_group_segments, math.ceil(len(needed) / self.max_queries))
+        groups: List[List[int]] = []
+        for run in runs:
+            for start in range(0, len(run), per_group):
+                group = run[start:start + per_group]
+                # Segmen pendek (ekor dokumen) digabung ke tetangga sebelumnya dalam run yang sama
+                if groups and start > 0 and groups[-1][-1] == group[0] - 1 and \
+                        sum(segments[i]['word_count'] for i in group) < self.query_words:
+                    groups[-1].extend(group)
+                else:
+                    groups.append(group)
+        return groups
+
+    def plan(
+        self,
+        segments: List[Dict[str, any]],
+        local_scores: Optional[List[float]] = None,
+        threshold: float = 0.75
+    ) -> Dict[str, any]:
+        """
+        Susun query web untuk segmen dokumen.
+
+        Args:
+            segments: Segmen dari ``segment_text`` (urut)
+            local_scores: Skor match local corpus terbaik per segmen (None = tidak ada local corpus)
+            threshold: Threshold plagiat request ini
+
+        Returns:
+            Dict berisi ``queries`` (teks query), ``groups`` (index segmen per query),
+            ``assignment`` (index query per segmen atau None) dan statistik planning
+        """
+        skipped_local = []
+        needed = []
+        for i in range(len(segments)):
+            if self.skip_local_matches and local_scores is not None and local_scores[i] >= threshold:
+                skipped_local.append(i)
+            else:
+                needed.append(i)
+        groups = self._groups(segments, needed) if needed else []
+        spans = [self.select_span(self._group_words([segments[i] for i in group])) for group in groups]
+        keep = [g for g in range(len(groups)) if spans[g]['query']]
+        if self.max_queries and len(keep) > self.max_queries:
+            # Budget habis: pertahankan unit dengan kepadatan kata langka tertinggi
+            keep = sorted(sorted(keep, key=lambda g: -spans[g]['score'])[:self.max_queries])
+        assignment: List[Optional[int]] = [None] * len(segments)
+        queries = []
+        planned_groups = []
+        for q, g in enumerate(keep):
+            queries.append(spans[g]['query'])
+            planned_groups.append(groups[g])
+            for i in groups[g]:
+                assignment[i] = q
+        covered = sum(a is not None for a in assignment)
+        over_budget = len(needed) - covered
+        with self._lock:
+            self.documents += 1
+            self.segments += len(segments)
+            self.queries += len(queries)
+            self.skipped_local += len(skipped_local)
+            self.over_budget += over_budget
+        return {
+            'queries': queries,
+            'groups': planned_groups,
+            'assignment': assignment,
+            'segments': len(segments),
+            'segments_covered': covered,
+            'skipped_local': len(skipped_local),
+            'merged_segments': covered - len(queries),
+            'over_budget': over_budget
+        }
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            return {
+                'query_words': self.query_words,
+                'max_queries': self.max_queries,
+                'vocabulary_words': len(self._document_frequency),
+                'vocabulary_rows': self._sampled_rows,
+                'documents': self.documents,
+                'segments': self.segments,
+                'queries': self.queries,
+                'skipped_local': self.skipped_local,
+                'over_budget': self.over_budget,
+                'queries_per_segment': round(self.queries / self.segments, 4) if self.segments else 0.0
+            }
@@ -0,0 +1,79 @@
+"""
+Readiness Tracker
+Status startup bertahap (model, warm-up, corpus) untuk endpoint /ready dan gating request API
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from loguru import logger
+
+
+class ReadinessTracker:
+    """
+    Mencatat langkah-langkah loading di background beserta durasinya.
+
+    Status keseluruhan: ``loading`` -> ``ready`` (semua langkah selesai) atau
+    ``failed`` (langkah wajib gagal). Langkah opsional (mis. corpus) yang gagal
+    tetap tercatat sebagai ``failed`` tetapi tidak menggagalkan service.
+    """
+
+    def __init__(self, steps=("model", "warmup", "corpus")):
+        self.started_at = time.time()
+        self.status = "loading"
+        self.error: Optional[str] = None
+        self.ready_at: Optional[float] = None
+        self.steps: Dict[str, Dict[str, any]] = {name: {'status': 'pending', 'seconds': None} for name in steps}
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    @contextmanager
+    def step(self, name: str, required: bool = True):
+        """Context manager satu langkah loading; info tambahan bisa diisi lewat dict yang di-yield."""
+        info: Dict[str, any] = {}
+        with self._lock:
+            self.steps[name] = {'status': 'loading', 'seconds': None}
+        start = time.perf_counter()
+        try:
+            yield info
+        except Exception as e:
+            with self._lock:
+                self.steps[name] = {**info, 'status': 'failed', 'seconds': round(time.perf_counter() - start, 2), 'error': str(e)}
+            logger.error(f"Startup step '{name}' gagal: {e}")
+            if required:
+                self.fail(f"{name}: {e}")
+                raise
+            return
+        with self._lock:
+            self.steps[name] = {**info, 'status': 'done', 'seconds': round(time.perf_counter() - start, 2)}
+        logger.info(f"Startup step '{name}' selesai dalam {self.steps[name]['seconds']}s")
+
+    def mark_ready(self):
+        with self._lock:
+            self.status = "ready"
+            self.ready_at = time.time()
+        self._event.set()
+
+    def fail(self, error: str):
+        with self._lock:
+            self.status = "failed"
+            self.error = error
+
+    def snapshot(self) -> Dict[str, any]:
+        with self._lock:
+            end = self.ready_at or time.time()
+            return {
+                'status': self.status,
+                'ready': self._event.is_set(),
+                'error': self.error,
+                'elapsed_seconds': round(end - self.started_at, 2),
+                'steps': {name: dict(info) for name, info in self.steps.items()}
+            }
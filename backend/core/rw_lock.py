@@ -0,0 +1,83 @@
+"""
+Read-Write Lock
+Lock baca/tulis reentrant untuk state corpus yang dibaca paralel oleh banyak request deteksi
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    Lock baca/tulis reentrant.
+
+    ``with lock:`` mengambil lock eksklusif (reentrant untuk thread pemilik,
+    pemakaian sama dengan ``threading.RLock``); ``with lock.shared():``
+    mengizinkan banyak pembaca sekaligus. Penulis yang sedang menunggu
+    didahulukan atas pembaca baru agar ingest tidak kelaparan. Pemilik lock
+    eksklusif boleh masuk ``shared()``; upgrade shared -> eksklusif tidak
+    didukung (RuntimeError, karena dua pembaca yang sama-sama upgrade akan deadlock).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    def _read_depth(self) -> int:
+        return getattr(self._local, 'depth', 0)
+
+    def acquire(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return True
+            if self._read_depth():
+                raise RuntimeError("Upgrade lock shared ke eksklusif tidak didukung")
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+            return True
+
+    def release(self):
+        with self._cond:
+            if self._writer != threading.get_ident():
+                raise RuntimeError("Lock eksklusif dilepas oleh thread yang bukan pemiliknya")
+            self._writer_depth -= 1
+            if self._writer_depth == 0:
+                self._writer = None
+                self._cond.notify_all()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+    @contextmanager
+    def shared(self):
+        """Lock baca: berjalan bersamaan dengan pembaca lain, menunggu penulis aktif / antre."""
+        depth = self._read_depth()
+        with self._cond:
+            if self._writer != threading.get_ident() and depth == 0:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+            self._readers += 1
+        self._local.depth = depth + 1
+        try:
+            yield self
+        finally:
+            self._local.depth = depth
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
@@ -0,0 +1,310 @@
+"""
+Search Result Cache
+Cache persisten (SQLite) hasil Google CSE per query ter-normalisasi, dengan TTL, batas ukuran dan negative caching
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from loguru import logger
+
+from .embedding_cache import normalize_cache_text
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    query TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    empty INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_last_access ON results(last_access);
+CREATE INDEX IF NOT EXISTS idx_results_expires_at ON results(expires_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+# Batas parameter per query IN (...) (SQLite default 999)
+_CHUNK = 500
+# Panjang query maksimum Google CSE (query lebih panjang dipotong)
+MAX_QUERY_CHARS = 128
+
+
+def normalize_query(query: str) -> str:
+    """Query yang benar-benar dikirim ke CSE: whitespace dinormalisasi lalu dipotong 128 karakter."""
+    return normalize_cache_text(query)[:MAX_QUERY_CHARS]
+
+
+class SearchResultCache:
+    """
+    Cache hasil pencarian web di file SQLite (mode WAL), dipakai bersama API dan script batch.
+
+    Key = hash(namespace, query ter-normalisasi, jumlah hasil); ``namespace``
+    biasanya CSE ID agar engine berbeda tidak berbagi hasil. Hasil berisi item
+    kedaluwarsa setelah ``ttl_seconds``; hasil kosong juga disimpan (negative
+    caching) dengan TTL lebih pendek ``negative_ttl_seconds``. Error request
+    tidak pernah di-cache. Ukuran dibatasi ``max_bytes`` (entri kedaluwarsa
+    dihapus dulu, lalu ``last_access`` terlama).
+
+    Pembacaan tidak membuka transaksi tulis: ``last_access`` dan counter
+    ditampung di memori lalu ditulis sekaligus (``flush``) setiap
+    ``flush_interval`` detik / ``flush_batch`` key, ikut transaksi ``put_many``,
+    atau sebelum eviction / stats.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str = "",
+        ttl_seconds: float = 7 * 24 * 3600,
+        negative_ttl_seconds: float = 24 * 3600,
+        max_bytes: int = 64 * 1024 * 1024,
+        evict_every: int = 256,
+        timeout: float = 30.0,
+        flush_interval: float = 5.0,
+        flush_batch: int = 1024
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        # last_access & counter yang belum ditulis ke SQLite
+        self._pending_access: Dict[bytes, float] = {}
+        self._pending_counters: Dict[str, int] = {}
+        self._last_flush = time.monotonic()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.writes = 0
+        self.evictions = 0
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+        logger.info(
+            f"Search cache: {path} (TTL {ttl_seconds / 3600:.0f}h, negatif {negative_ttl_seconds / 3600:.0f}h, "
+            f"max {max_bytes // (1024 * 1024)} MB)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def key(self, query: str, num_results: int) -> bytes:
+        payload = f"{self.namespace}\x00{num_results}\x00{normalize_query(query).lower()}".encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def get_many(self, queries: List[str], num_results: int = 5) -> List[Optional[List[Dict[str, str]]]]:
+        """Hasil tersimpan per query (list, bisa kosong), atau None jika belum ada / kedaluwarsa."""
+        if not queries:
+            return []
+        keys = [self.key(q, num_results) for q in queries]
+        now = time.time()
+        found: Dict[bytes, List[Dict[str, str]]] = {}
+        stale = set()
+        conn = self._conn()
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), _CHUNK):
+            chunk = unique[start:start + _CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for key, payload, expires_at in conn.execute(
+                f"SELECT key, payload, expires_at FROM results WHERE key IN ({placeholders})", chunk
+            ):
+                if expires_at <= now:
+                    stale.add(key)
+                else:
+                    found[key] = json.loads(payload)
+        results = [found.get(k) for k in keys]
+        hits = sum(r is not None for r in results)
+        negative = sum(r is not None and not r for r in results)
+        expired = sum(k in stale for k in keys)
+        misses = len(results) - hits
+        with self._lock:
+            self.hits += hits
+            self.negative_hits += negative
+            self.misses += misses
+            self.expired += expired
+            for key in found:
+                self._pending_access[key] = now
+            for name, value in (('hits', hits), ('negative_hits', negative), ('misses', misses), ('expired', expired)):
+                self._pending_counters[name] = self._pending_counters.get(name, 0) + value
+            due = len(self._pending_access) >= self.flush_batch or time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+        return results
+
+    def _take_pending(self):
+        with self._lock:
+            access, counters = self._pending_access, self._pending_counters
+            self._pending_access, self._pending_counters = {}, {}
+            self._last_flush = time.monotonic()
+        return access, counters
+
+    def _write_pending(self, conn: sqlite3.Connection, access: Dict[bytes, float], counters: Dict[str, int]):
+        if access:
+            conn.executemany(
+                "UPDATE results SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(t, k) for k, t in access.items()]
+            )
+        self._bump(conn, counters)
+
+    def _restore_pending(self, access: Dict[bytes, float], counters: Dict[str, int]):
+        with self._lock:
+            for key, t in access.items():
+                self._pending_access[key] = max(t, self._pending_access.get(key, t))
+            for name, value in counters.items():
+                self._pending_counters[name] = self._pending_counters.get(name, 0) + value
+
+    def flush(self):
+        """Tulis last_access & counter yang tertunda dalam satu transaksi."""
+        access, counters = self._take_pending()
+        if not access and not any(counters.values()):
+            return
+        try:
+            with self._conn() as conn:
+                self._write_pending(conn, access, counters)
+        except sqlite3.Error as e:
+            # Database sibuk (proses lain menulis): coba lagi pada flush berikutnya
+            self._restore_pending(access, counters)
+            logger.warning(f"Search cache flush tertunda: {e}")
+
+    def put_many(self, queries: List[str], results: List[List[Dict[str, str]]], num_results: int = 5):
+        """Simpan hasil sukses (list kosong = negative entry dengan TTL pendek)."""
+        if not queries:
+            return
+        now = time.time()
+        rows = [
+            (
+                self.key(q, num_results),
+                normalize_query(q),
+                json.dumps(r, ensure_ascii=False),
+                int(not r),
+                now + (self.ttl_seconds if r else self.negative_ttl_seconds),
+                now
+            )
+            for q, r in zip(queries, results)
+        ]
+        conn = self._conn()
+        access, counters = self._take_pending()
+        try:
+            with conn:
+                # Akses tertunda ikut transaksi tulis ini (tanpa transaksi tambahan)
+                self._write_pending(conn, access, counters)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO results (key, query, payload, empty, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._bump(conn, {'writes': len(rows)})
+        except sqlite3.Error:
+            self._restore_pending(access, counters)
+            raise
+        with self._lock:
+            self.writes += len(rows)
+            self._writes_since_evict += len(rows)
+            due = self._writes_since_evict >= self.evict_every
+            if due:
+                self._writes_since_evict = 0
+        if due:
+            self.evict()
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, deltas: Dict[str, int]):
+        conn.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [(name, value) for name, value in deltas.items() if value]
+        )
+
+    def _size_bytes(self, conn: sqlite3.Connection) -> int:
+        return int(conn.execute("SELECT COALESCE(SUM(LENGTH(payload) + LENGTH(query)), 0) FROM results").fetchone()[0])
+
+    def purge_expired(self) -> int:
+        """Hapus semua entri kedaluwarsa. Return jumlah entri dihapus."""
+        conn = self._conn()
+        with conn:
+            removed = conn.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),)).rowcount
+        return removed
+
+    def evict(self) -> int:
+        """Hapus entri kedaluwarsa, lalu entri terlama hingga ukuran <= ``max_bytes``. Return jumlah entri dihapus."""
+        self.flush()
+        removed = self.purge_expired()
+        conn = self._conn()
+        with conn:
+            total = self._size_bytes(conn)
+            n_delete = 0
+            if total > self.max_bytes:
+                count, = conn.execute("SELECT COUNT(*) FROM results").fetchone()
+                avg = total / max(count, 1)
+                # Sisakan ~10% ruang agar eviction tidak terjadi di setiap batch berikutnya
+                n_delete = int((total - 0.9 * self.max_bytes) / avg) + 1
+                conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_access LIMIT ?)",
+                    (n_delete,)
+                )
+            self._bump(conn, {'evictions': removed + n_delete})
+        with self._lock:
+            self.evictions += removed + n_delete
+        if removed + n_delete:
+            logger.info(f"Search cache eviction: {removed} expired + {n_delete} oldest entries removed")
+        return removed + n_delete
+
+    def clear(self):
+        self._take_pending()
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM results")
+            conn.execute("DELETE FROM counters")
+
+    def close(self):
+        self.flush()
+
+    def stats(self) -> Dict[str, any]:
+        self.flush()
+        conn = self._conn()
+        entries, negative = conn.execute("SELECT COUNT(*), COALESCE(SUM(empty), 0) FROM results").fetchone()
+        totals = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        lookups = self.hits + self.misses
+        global_lookups = int(totals.get('hits', 0)) + int(totals.get('misses', 0))
+        return {
+            'path': self.path,
+            'entries': int(entries),
+            'negative_entries': int(negative),
+            'bytes': self._size_bytes(conn),
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'negative_ttl_seconds': self.negative_ttl_seconds,
+            'process': {
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            },
+            'global': {
+                **{name: int(totals.get(name, 0)) for name in ('hits', 'negative_hits', 'misses', 'expired', 'writes', 'evictions')},
+                'hit_rate': round(int(totals.get('hits', 0)) / global_lookups, 4) if global_lookups else 0.0
+            }
+        }
@@ -0,0 +1,31 @@
+"""
+Search Provider
+Interface sumber pencarian referensi (Google CSE, BM25 offline) yang dipakai detect_plagiarism
+"""
+
+from typing import Dict, List
+
+
+class SearchProvider:
+    """
+    Interface provider pencarian.
+
+    Setiap hasil berbentuk ``{'title', 'snippet', 'url', 'source'}`` seperti
+    hasil Google CSE, sehingga skor snippet dan labelling di
+    ``PlagiarismDetector`` tidak bergantung pada provider.
+    """
+
+    kind = "base"
+
+    def search(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+    def search_many(self, queries: List[str], num_results: int = 5) -> List[List[Dict[str, str]]]:
+        """Hasil per query, urutan sama dengan ``queries``."""
+        return [self.search(q, num_results) for q in queries]
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict[str, any]:
+        return {'kind': self.kind}
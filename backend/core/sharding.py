@@ -0,0 +1,216 @@
+"""
+Sharded Corpus Search
+Pembagian local corpus ke beberapa shard server dan pencarian scatter-gather top-k
+"""
+
+import os
+import base64
+import threading
+import time
+import zlib
+import numpy as np
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Optional, Tuple
+from loguru import logger
+
+from .corpus_store import CorpusStore
+from .ann_index import create_ann_index
+
+ANN_FILE_NAME = "ann.npz"
+
+
+def encode_matrix(matrix: np.ndarray) -> Dict[str, any]:
+    """Serialisasi matriks float32 untuk transport JSON (base64, jauh lebih ringkas dari list float)."""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    return {'shape': list(matrix.shape), 'data': base64.b64encode(matrix.tobytes()).decode('ascii')}
+
+
+def decode_matrix(payload: Dict[str, any]) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload['data']), dtype=np.float32).reshape(payload['shape'])
+
+
+def shard_of(source_id: str, n_shards: int) -> int:
+    """Shard tujuan sebuah source (stabil antar proses; semua segmen satu source di shard yang sama)."""
+    return zlib.crc32(source_id.encode('utf-8')) % n_shards
+
+
+def split_corpus_store(store: CorpusStore, n_shards: int) -> List[CorpusStore]:
+    """Bagi corpus per source_id ke ``n_shards`` store baru (hash source_id)."""
+    shards = [CorpusStore(dim=store.dim) for _ in range(n_shards)]
+    source_idx = store.source_idx
+    for src_i, source_id in enumerate(store.sources):
+        rows = np.flatnonzero(source_idx == src_i)
+        if rows.size == 0:
+            continue
+        shard = shards[shard_of(source_id, n_shards)]
+        new_rows = shard.append(
+            store.embeddings[rows],
+            texts=[store.get_text(r) for r in rows],
+            segment_ids=store.segment_ids[rows].tolist(),
+            source_id=source_id
+        )
+        # Owner tambahan (segmen duplikat) ikut ke shard pemilik utama baris
+        for row, new_row in zip(rows, new_rows):
+            for owner in store.owners(row)[1:]:
+                shard.add_owner(new_row, owner['source_id'], owner['segment_id'])
+    return shards
+
+
+def save_shards(
+    shards: List[CorpusStore],
+    output_dir: str,
+    model_name: Optional[str] = None,
+    index_type: str = "exact",
+    min_index_size: int = 0,
+    **ann_params
+) -> List[Dict[str, any]]:
+    """
+    Simpan shard ke ``output_dir/shard_<i>`` (format v2).
+
+    Jika ``index_type`` bukan "exact", index ANN per shard dibangun dan disimpan
+    sebagai ``ann.npz`` sehingga shard server langsung memakainya saat load
+    (shard dengan segmen < ``min_index_size`` tetap exact search).
+    """
+    saved = []
+    for i, shard in enumerate(shards):
+        out_dir = os.path.join(output_dir, f"shard_{i}")
+        shard.save(out_dir, model_name=model_name, extra_meta={'shard': i, 'n_shards': len(shards)})
+        ann_path = os.path.join(out_dir, ANN_FILE_NAME)
+        ann = None
+        if index_type != "exact" and len(shard) > 0 and len(shard) >= min_index_size:
+            index = create_ann_index(index_type, **ann_params)
+            index.build(shard)
+            index.save(ann_path)
+            ann = index.stats()
+        elif os.path.exists(ann_path):
+            os.remove(ann_path)
+        saved.append({'path': out_dir, 'segments': len(shard), 'sources': len(shard.source_counts()), 'ann_index': ann})
+    return saved
+
+
+class ShardedCorpusClient:
+    """
+    Client scatter-gather ke beberapa shard server (``shard_server.py``).
+
+    Setiap pencarian mengirim embedding seluruh segmen dokumen ke semua shard
+    yang sehat secara paralel, lalu top-k per segmen di-merge berdasarkan skor.
+    Shard yang gagal / timeout ditandai down dan dilewati selama ``retry_after``
+    detik; hasil tetap dikembalikan dari shard yang merespons.
+    """
+
+    def __init__(self, urls: List[str], timeout: float = 5.0, retry_after: float = 30.0, max_workers: Optional[int] = None):
+        self.urls = [u.rstrip('/') for u in urls]
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or max(1, len(self.urls)), thread_name_prefix="shard")
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._lock = threading.Lock()
+        self._down_until: Dict[str, float] = {}
+        self._last_error: Dict[str, str] = {}
+
+    def _session(self) -> requests.Session:
+        # Session per thread (connection pooling tanpa berbagi state antar thread)
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def _mark(self, url: str, error: Optional[str]):
+        with self._lock:
+            if error is None:
+                self._down_until.pop(url, None)
+                self._last_error.pop(url, None)
+            else:
+                self._down_until[url] = time.time() + self.retry_after
+                self._last_error[url] = error
+
+    def _available(self) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [u for u in self.urls if self._down_until.get(u, 0) <= now]
+
+    def _query_shard(self, url: str, payload: Dict[str, any]) -> List[List[Dict[str, any]]]:
+        response = self._session().post(f"{url}/search", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()['results']
+
+    def search(self, queries: np.ndarray, top_k: int = 3) -> Tuple[List[List[Dict[str, any]]], Dict[str, any]]:
+        """
+        Top-k gabungan dari semua shard untuk setiap query.
+
+        Returns:
+            (list per query berisi match dict {snippet, similarity, source_id, segment_id, shard},
+            laporan shard pencarian ini: queried / failed / skipped / time_sec)
+        """
+        n_queries = queries.shape[0]
+        merged: List[List[Dict[str, any]]] = [[] for _ in range(n_queries)]
+        targets = self._available()
+        start = time.time()
+        failed: List[str] = []
+        if targets:
+            payload = {'queries': encode_matrix(queries), 'top_k': top_k}
+            futures = {self._executor.submit(self._query_shard, url, payload): url for url in targets}
+            done, not_done = wait(futures, timeout=self.timeout + 1.0)
+            for future in not_done:
+                url = futures[future]
+                failed.append(url)
+                self._mark(url, "timeout")
+            for future in done:
+                url = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    failed.append(url)
+                    self._mark(url, str(e))
+                    logger.warning(f"Shard {url} gagal: {e}")
+                    continue
+                self._mark(url, None)
+                for qi, hits in enumerate(results[:n_queries]):
+                    for hit in hits:
+                        hit['shard'] = url
+                    merged[qi].extend(hits)
+        for qi in range(n_queries):
+            merged[qi].sort(key=lambda m: m['similarity'], reverse=True)
+            del merged[qi][top_k:]
+        report = {
+            'shards_queried': len(targets),
+            'shards_failed': failed,
+            'shards_skipped': len(self.urls) - len(targets),
+            'time_sec': round(time.time() - start, 3)
+        }
+        if failed:
+            logger.warning(f"Scatter-gather parsial: {len(failed)}/{len(targets)} shard gagal")
+        return merged, report
+
+    def health(self) -> List[Dict[str, any]]:
+        """Cek /health setiap shard (paralel) dan perbarui status up/down."""
+        def check(url: str) -> Dict[str, any]:
+            try:
+                response = self._session().get(f"{url}/health", timeout=self.timeout)
+                response.raise_for_status()
+                self._mark(url, None)
+                return {'url': url, 'status': 'up', **response.json()}
+            except Exception as e:
+                self._mark(url, str(e))
+                return {'url': url, 'status': 'down', 'error': str(e)}
+        return list(self._executor.map(check, self.urls))
+
+    def close(self):
+        """Hentikan thread pool dan tutup koneksi ke shard (request yang belum jalan dibatalkan)."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+
+    def stats(self) -> Dict[str, any]:
+        now = time.time()
+        with self._lock:
+            down = {u: round(t - now, 1) for u, t in self._down_until.items() if t > now}
+            errors = dict(self._last_error)
+        return {'shards': self.urls, 'down': down, 'last_errors': errors}
@@ -0,0 +1,153 @@
+"""
+Source Centroid Index
+Index dua tingkat: shortlist dokumen sumber per submission, lalu matching segmen exact di dalamnya
+"""
+
+import numpy as np
+from typing import Dict, Tuple
+from loguru import logger
+
+from .corpus_store import CorpusStore, l2_normalize
+from .ann_index import spherical_kmeans
+
+
+class SourceCentroidIndex:
+    """
+    Embedding tingkat dokumen per source_id (centroid segmen-segmennya).
+
+    Tingkat 1: seluruh segmen submission dibandingkan dengan centroid semua
+    source; skor source = similarity tertinggi dari segmen mana pun (plagiarisme
+    sebagian tetap terangkat), lalu diambil ``top_m`` source teratas.
+    Tingkat 2: matching segmen exact hanya pada baris milik source terpilih.
+
+    Dengan ``centroids_per_source=1`` centroid = mean ter-normalisasi (di-update
+    incremental dari jumlah vektor); nilai > 1 memakai k-means kecil per source
+    sehingga dokumen panjang dengan banyak topik terwakili lebih baik.
+    """
+
+    kind = "source_centroid"
+
+    def __init__(self, centroids_per_source: int = 1, kmeans_iter: int = 10, seed: int = 42):
+        self.centroids_per_source = max(1, centroids_per_source)
+        self.kmeans_iter = kmeans_iter
+        self.seed = seed
+        self._size = 0
+        self._sums = np.empty((0, 0), dtype=np.float64)
+        self._counts = np.empty(0, dtype=np.int64)
+        self._centroids = np.empty((0, 0), dtype=np.float32)
+        self._centroid_source = np.empty(0, dtype=np.int32)
+        self._source_centroids: Dict[int, np.ndarray] = {}
+        self._dirty = False
+
+    @property
+    def size(self) -> int:
+        """Jumlah baris corpus yang sudah ter-index."""
+        return self._size
+
+    def build(self, store: CorpusStore):
+        dim = store.dim or 0
+        n_sources = len(store.sources)
+        self._sums = np.zeros((n_sources, dim), dtype=np.float64)
+        self._counts = np.zeros(n_sources, dtype=np.int64)
+        self._source_centroids = {}
+        self._size = 0
+        if len(store):
+            source_idx = store.source_idx
+            order = np.argsort(source_idx, kind='stable')
+            counts = np.bincount(source_idx, minlength=n_sources)
+            nonempty = np.flatnonzero(counts)
+            starts = np.concatenate([[0], np.cumsum(counts)])[nonempty]
+            self._sums[nonempty] = np.add.reduceat(store.embeddings[order].astype(np.float64), starts, axis=0)
+            self._counts = counts.astype(np.int64)
+            if self.centroids_per_source > 1:
+                for src_i in nonempty:
+                    self._fit_source(store, int(src_i))
+            self._size = len(store)
+        self._dirty = True
+        logger.info(f"Source centroid index built: {int((self._counts > 0).sum())} sources, {self._size} segments")
+
+    def add(self, store: CorpusStore, rows: range):
+        """Update incremental setelah append (satu batch = satu source)."""
+        if len(rows) == 0:
+            return
+        n_sources = len(store.sources)
+        if n_sources > self._sums.shape[0]:
+            grow = n_sources - self._sums.shape[0]
+            self._sums = np.vstack([self._sums.reshape(-1, store.dim), np.zeros((grow, store.dim))])
+            self._counts = np.concatenate([self._counts, np.zeros(grow, dtype=np.int64)])
+        source_idx = store.source_idx[rows.start:rows.stop]
+        for src_i in np.unique(source_idx):
+            batch = rows.start + np.flatnonzero(source_idx == src_i)
+            self._sums[src_i] += store.embeddings[batch].astype(np.float64).sum(axis=0)
+            self._counts[src_i] += batch.size
+            if self.centroids_per_source > 1:
+                self._fit_source(store, int(src_i))
+        self._size = rows.stop
+        self._dirty = True
+
+    def _fit_source(self, store: CorpusStore, src_i: int):
+        rows = np.flatnonzero(store.source_idx == src_i)
+        if rows.size <= self.centroids_per_source:
+            self._source_centroids[src_i] = l2_normalize(store.embeddings[rows])
+        else:
+            self._source_centroids[src_i] = spherical_kmeans(
+                np.asarray(store.embeddings[rows], dtype=np.float32), self.centroids_per_source,
+                n_iter=self.kmeans_iter, seed=self.seed
+            )
+
+    def _centroid_matrix(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._dirty:
+            if self.centroids_per_source > 1:
+                items = sorted(self._source_centroids.items())
+                self._centroids = np.vstack([c for _, c in items]) if items else np.empty((0, self._sums.shape[1]), np.float32)
+                self._centroid_source = np.concatenate(
+                    [np.full(len(c), src_i, dtype=np.int32) for src_i, c in items]
+                ) if items else np.empty(0, dtype=np.int32)
+            else:
+                nonempty = np.flatnonzero(self._counts)
+                self._centroids = l2_normalize(self._sums[nonempty])
+                self._centroid_source = nonempty.astype(np.int32)
+            self._dirty = False
+        return self._centroids, self._centroid_source
+
+    def prepare(self):
+        """Bentuk matriks centroid sekarang agar ``search`` tidak memutasi index di thread pembaca."""
+        self._centroid_matrix()
+
+    def shortlist(self, queries: np.ndarray, top_m: int) -> Tuple[np.ndarray, Dict[str, any]]:
+        """
+        ``top_m`` source (index source) terdekat dengan submission (skor = max atas semua segmen).
+
+        Return (index source, laporan shortlist {sources, min_score}).
+        """
+        centroids, centroid_source = self._centroid_matrix()
+        if centroids.shape[0] == 0:
+            return np.empty(0, dtype=np.int32), {'sources': 0, 'min_score': None}
+        per_centroid = (l2_normalize(queries) @ centroids.T).max(axis=0)  # (C,)
+        source_scores = np.full(self._counts.shape[0], -np.inf, dtype=np.float32)
+        np.maximum.at(source_scores, centroid_source, per_centroid)
+        candidates = np.flatnonzero(np.isfinite(source_scores))
+        m = min(top_m, candidates.size)
+        top = candidates[np.argpartition(-source_scores[candidates], m - 1)[:m]]
+        top = top[np.argsort(-source_scores[top])]
+        report = {'sources': int(m), 'min_score': float(source_scores[top[-1]]) if m else None}
+        return top.astype(np.int32), report
+
+    def search(
+        self, store: CorpusStore, queries: np.ndarray, top_k: int = 1, top_m: int = 20
+    ) -> Tuple[np.ndarray, np.ndarray, Dict[str, any]]:
+        """Top-k per segmen, hanya di dalam baris ``top_m`` source hasil shortlist. Return (rows, scores, laporan shortlist)."""
+        sources, report = self.shortlist(queries, top_m)
+        rows = store.rows_of_sources(sources)
+        report['candidate_segments'] = int(rows.size)
+        return (*store.search_rows(queries, rows, top_k=top_k), report)
+
+    def stats(self) -> Dict[str, any]:
+        centroids, _ = self._centroid_matrix()
+        return {
+            'kind': self.kind,
+            'sources': int((self._counts > 0).sum()),
+            'centroids': int(centroids.shape[0]),
+            'centroids_per_source': self.centroids_per_source,
+            'indexed_segments': self._size
+        }
@@ -0,0 +1,186 @@
+"""
+Span Pooling Encoder
+Encode dokumen per chunk kontigu sekali jalan, embedding tiap sliding window = mean token embedding pada rentang katanya
+"""
+
+import threading
+import numpy as np
+from typing import Dict, List, Tuple
+from loguru import logger
+
+from .onnx_backend import _pooling_mode
+
+def _modules(model) -> list:
+    return list(getattr(model, '_modules', {}).values())
+
+
+def is_mean_pooling(model) -> bool:
+    """Span pooling hanya setara dengan pooling model jika model memakai mean pooling."""
+    if hasattr(model, 'pooling'):  # OnnxSentenceEncoder
+        return model.pooling == 'mean'
+    for module in _modules(model):
+        if type(module).__name__ == 'Pooling':
+            try:
+                return _pooling_mode(module.get_config_dict()) == 'mean'
+            except ValueError:
+                return False
+    return False
+
+
+class SpanPoolingEncoder:
+    """
+    Encoder sliding window berbasis token embedding bersama.
+
+    Window ``segment_text`` saling overlap ``overlap`` kata sehingga encode per
+    window memproses sebagian besar token dua kali (ditambah token spesial dan
+    padding per window). Encoder ini membagi dokumen menjadi chunk kontigu
+    berisi beberapa window utuh (maksimal ``max_tokens`` token), menjalankan
+    transformer sekali per chunk, lalu embedding tiap window = rata-rata token
+    embedding kata-kata di rentang window tersebut (mean pooling, sama seperti
+    pooling model). Token di dalam chunk melihat konteks yang lebih panjang
+    daripada window tunggal, sehingga embedding tidak identik dengan encode
+    per window — ukur dengan ``PlagiarismDetector.evaluate_span_encoding``.
+    """
+
+    def __init__(self, model, max_tokens: int = 256, max_batch_tokens: int = 8192, device: str = "cpu"):
+        tokenizer = getattr(model, 'tokenizer', None)
+        if tokenizer is None or not getattr(tokenizer, 'is_fast', False):
+            raise ValueError("Span pooling membutuhkan fast tokenizer (word_ids)")
+        if not is_mean_pooling(model):
+            raise ValueError("Span pooling hanya untuk model dengan mean pooling")
+        limit = getattr(tokenizer, 'model_max_length', None)
+        if limit and limit < 100000:
+            max_tokens = min(max_tokens, int(limit))
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.max_batch_tokens = max_batch_tokens
+        self.device = device
+        self.window_max_tokens = getattr(model, 'max_seq_length', None) or max_tokens
+        self.do_lower_case = bool(getattr(model, 'do_lower_case', False)) or any(
+            getattr(module, 'do_lower_case', False) for module in _modules(model)
+        )
+        # Jumlah token spesial di depan / total per sequence (mis. [CLS] ... [SEP] atau <s> ... </s>)
+        marker = tokenizer(["x"], is_split_into_words=True, add_special_tokens=True)
+        marker_words = marker.word_ids()
+        n_prefix = next(i for i, w in enumerate(marker_words) if w is not None)
+        n_suffix = len(marker_words) - 1 - max(i for i, w in enumerate(marker_words) if w is not None)
+        self._special_prefix = list(marker['input_ids'][:n_prefix])
+        self._special_suffix = list(marker['input_ids'][len(marker_words) - n_suffix:])
+        self._n_prefix = n_prefix
+        self._n_special = n_prefix + n_suffix
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.windows = 0
+        self.chunks = 0
+        self.chunk_tokens = 0
+        self.window_tokens = 0
+
+    def tokenize_words(self, words: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Tokenisasi seluruh dokumen sekali (tanpa token spesial). Return (token ids, index kata per token)."""
+        if not words:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        encoded = self.tokenizer(words, is_split_into_words=True, add_special_tokens=False, verbose=False)
+        word_ids = np.array([-1 if w is None else w for w in encoded.word_ids()], dtype=np.int64)
+        return np.asarray(encoded['input_ids'], dtype=np.int64), word_ids
+
+    def plan(self, prefix: np.ndarray, windows: List[Tuple[int, int]]) -> List[Tuple[int, int, List[int]]]:
+        """
+        Kelompokkan window (urut posisi) ke chunk kontigu ``(start_word, end_word, [index window])``.
+
+        Chunk dimulai di awal window pertama yang belum tercakup dan diperpanjang
+        selama window berikutnya masih muat dalam ``max_tokens`` (dikurangi token spesial).
+        Window yang sendirian melebihi budget tetap menjadi satu chunk (terpotong seperti encode biasa).
+        """
+        budget = self.max_tokens - self._n_special
+        chunks = []
+        i = 0
+        while i < len(windows):
+            start = windows[i][0]
+            members = [i]
+            j = i + 1
+            while j < len(windows) and windows[j][0] >= start and prefix[windows[j][1]] - prefix[start] <= budget:
+                members.append(j)
+                j += 1
+            chunks.append((start, max(windows[m][1] for m in members), members))
+            i = j
+        return chunks
+
+    def _forward(self, chunk_ids: List[np.ndarray]) -> np.ndarray:
+        """Forward pass satu batch chunk (token ids tanpa token spesial). Return token embeddings (B, T, dim)."""
+        rows = [self._special_prefix + ids.tolist() + self._special_suffix for ids in chunk_ids]
+        length = max(len(r) for r in rows)
+        input_ids = np.full((len(rows), length), self.tokenizer.pad_token_id or 0, dtype=np.int64)
+        attention_mask = np.zeros((len(rows), length), dtype=np.int64)
+        for b, row in enumerate(rows):
+            input_ids[b, :len(row)] = row
+            attention_mask[b, :len(row)] = 1
+        inputs = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.tokenizer.model_input_names:
+            inputs['token_type_ids'] = np.zeros_like(input_ids)
+        if hasattr(self.model, 'token_embeddings'):  # OnnxSentenceEncoder
+            return np.asarray(self.model.token_embeddings(inputs), dtype=np.float32)
+        import torch
+        features = {name: torch.from_numpy(arr).to(self.device) for name, arr in inputs.items()}
+        with torch.no_grad():
+            return self.model.forward(features)['token_embeddings'].float().cpu().numpy()
+
+    def encode(self, words: List[str], windows: List[Tuple[int, int]]) -> np.ndarray:
+        """
+        Embedding setiap window ``(start_word, end_word)`` atas list kata dokumen.
+
+        Returns:
+            (N, dim) float32, urutan sama dengan ``windows``
+        """
+        if self.do_lower_case:
+            words = [w.lower() for w in words]
+        token_ids, token_words = self.tokenize_words(words)
+        # prefix[w] = posisi token pertama kata ke-w (word_ids menaik)
+        prefix = np.concatenate([[0], np.cumsum(np.bincount(token_words[token_words >= 0], minlength=len(words)))])
+        chunks = self.plan(prefix, windows)
+        budget = self.max_tokens - self._n_special
+        spans = [(int(prefix[start]), min(int(prefix[end]), int(prefix[start]) + budget)) for start, end, _ in chunks]
+        lengths = np.array([hi - lo + self._n_special for lo, hi in spans])
+        result = np.zeros((len(windows), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        # Batch chunk per budget token (chunk terpanjang dulu agar padding kecil)
+        order = np.argsort(-lengths, kind='stable')
+        i = 0
+        while i < order.size:
+            per_batch = max(1, self.max_batch_tokens // max(int(lengths[order[i]]), 1))
+            batch = order[i:i + per_batch]
+            i += per_batch
+            tokens = self._forward([token_ids[spans[c][0]:spans[c][1]] for c in batch])
+            for b, c in enumerate(batch):
+                lo_token, hi_token = spans[c]
+                members = chunks[c][2]
+                # Prefix sum token embedding chunk -> rata-rata tiap window dalam O(1)
+                chunk_tokens = tokens[b, self._n_prefix:self._n_prefix + hi_token - lo_token].astype(np.float64)
+                cumulative = np.vstack([np.zeros((1, chunk_tokens.shape[1])), np.cumsum(chunk_tokens, axis=0)])
+                lo = np.clip([prefix[windows[m][0]] - lo_token for m in members], 0, hi_token - lo_token)
+                hi = np.clip([prefix[windows[m][1]] - lo_token for m in members], 0, hi_token - lo_token)
+                n_tokens = (hi - lo)[:, None]
+                # Window tanpa token tersisa (terpotong): pakai rata-rata seluruh chunk
+                fallback = cumulative[-1] / max(chunk_tokens.shape[0], 1)
+                result[members] = np.where(n_tokens > 0, (cumulative[hi] - cumulative[lo]) / np.maximum(n_tokens, 1), fallback)
+        with self._lock:
+            self.documents += 1
+            self.windows += len(windows)
+            self.chunks += len(chunks)
+            self.chunk_tokens += int(lengths.sum())
+            self.window_tokens += int(sum(
+                min(prefix[end] - prefix[start] + self._n_special, self.window_max_tokens) for start, end in windows
+            ))
+        logger.debug(f"Span encoding: {len(windows)} window -> {len(chunks)} chunk, {int(lengths.sum())} token")
+        return result
+
+    def stats(self) -> Dict[str, any]:
+        with self._lock:
+            return {
+                'max_tokens': self.max_tokens,
+                'documents': self.documents,
+                'windows': self.windows,
+                'chunks': self.chunks,
+                'chunk_tokens': self.chunk_tokens,
+                'window_tokens': self.window_tokens,
+                'token_savings': round(1 - self.chunk_tokens / self.window_tokens, 4) if self.window_tokens else 0.0
+            }
@@ -0,0 +1,150 @@
+"""
+Script fit proyeksi dimensi rendah (PCA / truncation) untuk pencarian tahap pertama corpus.
+
+Proyeksi dilatih dari embedding corpus, dievaluasi terhadap pencarian exact
+(recall top-k setelah re-rank full-dimension), lalu disimpan bersama corpus
+(``quantizer.npz`` + versi di ``meta.json``) sehingga API memakainya ulang
+saat CORPUS_STORAGE=pca / truncate tanpa training ulang.
+
+Usage:
+    python fit_projection.py --corpus data/corpus --kind pca --dims 128
+    python fit_projection.py --corpus data/corpus --kind truncate --dims 256 --dry-run
+"""
+
+import argparse
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.corpus_store import CorpusStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit & simpan proyeksi dimensi rendah untuk corpus')
+    parser.add_argument(
+        '--corpus',
+        type=str,
+        default=os.getenv('CORPUS_PATH', 'data/corpus'),
+        help='Direktori corpus format v2 (default: data/corpus / env CORPUS_PATH)'
+    )
+    parser.add_argument(
+        '--kind',
+        type=str,
+        default='pca',
+        choices=['pca', 'truncate'],
+        help="Jenis proyeksi: 'pca' (dilatih dari corpus) atau 'truncate' (model Matryoshka)"
+    )
+    parser.add_argument(
+        '--dims',
+        type=int,
+        default=int(os.getenv('CORPUS_PROJECTION_DIMS', '128')),
+        help='Dimensi pencarian tahap pertama (default: 128 / env CORPUS_PROJECTION_DIMS)'
+    )
+    parser.add_argument(
+        '--queries',
+        type=int,
+        default=500,
+        help='Jumlah segmen corpus yang dipakai sebagai query evaluasi (default: 500)'
+    )
+    parser.add_argument(
+        '--top-k',
+        type=int,
+        default=5,
+        help='Recall dihitung pada top-k tetangga (default: 5)'
+    )
+    parser.add_argument(
+        '--rerank-k',
+        type=int,
+        default=int(os.getenv('QUANTIZE_RERANK_K', '32')),
+        help='Kandidat tahap pertama yang di-skor ulang full-dimension (default: 32)'
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.75,
+        help='Similarity threshold untuk cek konsistensi keputusan (default: 0.75)'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Hanya evaluasi, jangan simpan proyeksi ke direktori corpus'
+    )
+    args = parser.parse_args()
+
+    if CorpusStore.read_meta(args.corpus) is None:
+        print(f"❌ Error: Corpus v2 tidak ditemukan di {args.corpus}")
+        return 1
+
+    store, meta = CorpusStore.load(args.corpus, mmap=True, rerank_k=args.rerank_k)
+    print(f"📦 Corpus: {len(store)} segments, dim {store.dim} (model: {meta.get('model_name')})")
+    if meta.get('quantizer'):
+        saved = meta['quantizer']
+        print(f"   ℹ️  Proyeksi tersimpan: {saved['kind']} {saved.get('params')} v{saved.get('version')}")
+    if len(store) < 2:
+        print("❌ Error: Corpus terlalu kecil untuk evaluasi")
+        return 1
+
+    # Query evaluasi = segmen corpus sendiri; baris query dikecualikan dari hasil
+    rng = np.random.default_rng(42)
+    n_queries = min(args.queries, len(store))
+    query_rows = np.sort(rng.choice(len(store), n_queries, replace=False))
+    queries = np.asarray(store.embeddings[query_rows], dtype=np.float32)
+    k = min(args.top_k, len(store) - 1)
+
+    def neighbours(rows: np.ndarray, scores: np.ndarray):
+        keep = rows != query_rows[:, None]
+        return [r[m][:k] for r, m in zip(rows, keep)], [s[m][:k] for s, m in zip(scores, keep)]
+
+    start = time.time()
+    exact_rows, exact_scores = neighbours(*store.search_batch(queries, top_k=k + 1))
+    exact_time = time.time() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"🧮 Fitting {args.kind} ({args.dims} dims) ...")
+        start = time.time()
+        try:
+            report = store.quantize(args.kind, os.path.join(tmp, "spill.f32"), dims=args.dims)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return 1
+        info = store.quantizer_info
+        print(f"   ✅ Fitted in {time.time() - start:.2f}s, version {info['version']}")
+        explained = getattr(store._quantizer, 'explained_variance', None)
+        if explained is not None:
+            print(f"   📈 Explained variance: {explained:.2%}")
+
+        start = time.time()
+        approx_rows, approx_scores = neighbours(*store.search_batch(queries, top_k=k + 1))
+        approx_time = time.time() - start
+
+        recall = np.mean([np.isin(a, e).mean() for a, e in zip(approx_rows, exact_rows) if e.size])
+        top1 = np.mean([a.size > 0 and a[0] == e[0] for a, e in zip(approx_rows, exact_rows) if e.size])
+        decisions = np.mean([
+            (e[0] >= args.threshold) == (a.size > 0 and a[0] >= args.threshold)
+            for a, e in zip(approx_scores, exact_scores) if e.size
+        ])
+        print(f"\n📊 Evaluasi ({n_queries} query, top-{k}, rerank_k={args.rerank_k}):")
+        print(f"   Recall@{k}: {recall:.4f}")
+        print(f"   Top-1 sama: {top1:.4f}")
+        print(f"   Keputusan threshold {args.threshold} sama: {decisions:.4f}")
+        print(f"   Waktu search: exact {exact_time:.3f}s, proyeksi+rerank {approx_time:.3f}s")
+        print(f"   Memori vektor resident: {report['float32_bytes']} -> {report['resident_vector_bytes']} bytes "
+              f"({report['compression_ratio']}x)")
+
+        if args.dry_run:
+            print("\n🔎 Dry run: proyeksi tidak disimpan")
+            return 0
+        saved = store.save_quantizer(args.corpus)
+        print(f"\n💾 Proyeksi disimpan ke {os.path.join(args.corpus, 'quantizer.npz')} "
+              f"({saved['kind']} {saved['params']}, v{saved['version']})")
+        print(f"   Aktifkan dengan CORPUS_STORAGE={args.kind} CORPUS_PROJECTION_DIMS={args.dims}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,14 +3,18 @@ FastAPI Main Application
 API Server untuk Sistem Deteksi Plagiarisme Semantik
 """
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import Optional, List
 import os
+import time
 import shutil
 import uuid
+import asyncio
+import threading
 from datetime import datetime
 from loguru import logger
 import pandas as pd
@@ -20,7 +24,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from core.plagiarism_detector import PlagiarismDetector
+from core.google_search import GoogleSearchClient
 from core.pdf_processor_full import PDFProcessor
+from core.readiness import ReadinessTracker
 
 # Configure logger
 logger.add(
@@ -39,6 +45,23 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Gating request API selama model / corpus masih dimuat (didaftarkan sebelum CORS agar
+# response 503 tetap membawa header CORS)
+@app.middleware("http")
+async def readiness_gate(request: Request, call_next):
+    if request.url.path.startswith("/api/") and not readiness.ready:
+        deadline = time.monotonic() + STARTUP_WAIT_SECONDS
+        while not readiness.ready and readiness.status != "failed" and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if not readiness.ready:
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Service sedang memuat model / corpus, coba lagi", "readiness": readiness.snapshot()},
+                headers={"Retry-After": "5"}
+            )
+    return await call_next(request)
+
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -56,11 +79,60 @@ os.makedirs("data", exist_ok=True)
 
 # Initialize processors
 pdf_processor = PDFProcessor(use_pdfplumber=True)
-plagiarism_detector = PlagiarismDetector(
-    similarity_threshold=0.75,
-    segment_size=25,
-    overlap=5
-)
+# Detector dibuat di background saat startup (lihat load_services) agar uvicorn langsung bind;
+# request /api/* selama warm-up menunggu hingga STARTUP_WAIT_SECONDS lalu ditolak 503.
+plagiarism_detector: Optional[PlagiarismDetector] = None
+readiness = ReadinessTracker()
+STARTUP_WAIT_SECONDS = float(os.getenv("STARTUP_WAIT_SECONDS", "30"))
+
+
+def create_detector() -> PlagiarismDetector:
+    """Bangun PlagiarismDetector dari environment (memuat model SBERT)."""
+    detector = PlagiarismDetector(
+        similarity_threshold=0.75,
+        segment_size=25,
+        overlap=5,
+        index_type=os.getenv("CORPUS_INDEX_TYPE", "exact"),
+        ann_min_corpus_size=int(os.getenv("CORPUS_ANN_MIN_SIZE", "20000")),
+        ann_nprobe=int(os.getenv("CORPUS_ANN_NPROBE", "8")),
+        corpus_storage=os.getenv("CORPUS_STORAGE", "float32"),
+        projection_dims=int(os.getenv("CORPUS_PROJECTION_DIMS", "128")),
+        hierarchical_top_sources=int(os.getenv("CORPUS_TOP_SOURCES", "0")),
+        memory_cache_mb=float(os.getenv("MEMORY_CACHE_MB", "64")),
+        embedding_cache_path=os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite") or None,
+        embedding_cache_max_mb=int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512")),
+        micro_batching=os.getenv("ENCODER_MICRO_BATCH", "true").lower() == "true",
+        micro_batch_size=int(os.getenv("ENCODER_MAX_BATCH", "64")),
+        micro_batch_wait_ms=float(os.getenv("ENCODER_MAX_WAIT_MS", "5")),
+        inference_backend=os.getenv("INFERENCE_BACKEND", "torch"),
+        onnx_cache_dir=os.getenv("ONNX_CACHE_DIR", "data/onnx"),
+        inference_threads=int(os.getenv("INFERENCE_THREADS", "0")) or None,
+        length_bucketing=os.getenv("ENCODE_LENGTH_BUCKETING", "true").lower() == "true",
+        encode_max_tokens=int(os.getenv("ENCODE_MAX_TOKENS", "8192")),
+        segment_encoding=os.getenv("SEGMENT_ENCODING", "window"),
+        span_chunk_tokens=int(os.getenv("SPAN_CHUNK_TOKENS", "256")),
+        cascade=os.getenv("CASCADE_ENABLED", "false").lower() == "true",
+        cascade_model_name=os.getenv("CASCADE_MODEL") or None,
+        cascade_threshold=float(os.getenv("CASCADE_THRESHOLD", "0.55")),
+        search_max_concurrency=int(os.getenv("GOOGLE_SEARCH_CONCURRENCY", "4")),
+        search_rate_limit=float(os.getenv("GOOGLE_SEARCH_QPS", "5")),
+        search_cache_path=os.getenv("SEARCH_CACHE_PATH", "data/search_cache.sqlite") or None,
+        search_cache_ttl_hours=float(os.getenv("SEARCH_CACHE_TTL_HOURS", "168")),
+        search_cache_negative_ttl_hours=float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL_HOURS", "24")),
+        search_cache_max_mb=int(os.getenv("SEARCH_CACHE_MAX_MB", "64")),
+        search_planning=os.getenv("SEARCH_QUERY_PLANNING", "true").lower() == "true",
+        search_query_words=int(os.getenv("SEARCH_QUERY_WORDS", "16")),
+        search_query_budget=int(os.getenv("SEARCH_QUERY_BUDGET", "0")),
+        search_provider=os.getenv("SEARCH_PROVIDER", "google"),
+        search_snapshot_dir=os.getenv("SEARCH_SNAPSHOT_DIR") or None,
+        corpus_log_enabled=os.getenv("CORPUS_LOG_ENABLED", "false").lower() == "true"
+    )
+    if os.getenv("CORPUS_SHARDS"):
+        detector.attach_shards(
+            [u.strip() for u in os.getenv("CORPUS_SHARDS").split(",") if u.strip()],
+            timeout=float(os.getenv("CORPUS_SHARD_TIMEOUT", "5"))
+        )
+    return detector
 
 
 # Pydantic Models
@@ -113,22 +185,61 @@ async def root():
 
 @app.get("/health", response_model=HealthResponse, tags=["General"])
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness; status model mengikuti proses loading di background)"""
     
+    model_step = readiness.steps["model"]['status']
     # Check services
     services = {
         "api": "running",
-        "sbert_model": "loaded" if plagiarism_detector.model else "not loaded",
-        "google_cse": "available" if plagiarism_detector.search_service else "not configured"
+        "sbert_model": {"done": "loaded", "failed": "failed"}.get(model_step, "loading"),
+        "corpus": readiness.steps["corpus"]['status'],
+        "google_cse": (
+            "available" if plagiarism_detector and isinstance(plagiarism_detector.search_service, GoogleSearchClient)
+            else "not configured" if plagiarism_detector else "unknown"
+        ),
+        "search_provider": (
+            plagiarism_detector.search_service.kind if plagiarism_detector and plagiarism_detector.search_service
+            else "none" if plagiarism_detector else "unknown"
+        )
     }
     
     return {
-        "status": "healthy",
+        "status": {"ready": "healthy", "failed": "unhealthy"}.get(readiness.status, "starting"),
         "timestamp": datetime.now().isoformat(),
         "services": services
     }
 
 
+@app.get("/ready", tags=["General"])
+async def readiness_check():
+    """
+    Readiness endpoint: 200 jika model, warm-up dan corpus selesai dimuat, 503 selama loading / gagal.
+    
+    Returns:
+        Status per langkah (model, warmup, corpus) beserta durasi loading
+    """
+    snapshot = readiness.snapshot()
+    if plagiarism_detector is not None:
+        snapshot["model"] = {
+            "name": plagiarism_detector.active_model_name,
+            "backend": plagiarism_detector.active_backend
+        }
+        snapshot["corpus_segments"] = len(plagiarism_detector.local_corpus)
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=snapshot)
+
+
+@app.get("/api/cache/stats", tags=["General"])
+async def cache_stats():
+    """
+    Statistik cache embedding (hit/miss/eviction, ukuran), cache hasil Google CSE (``search.cache``) dan micro-batch encoder.
+    
+    Returns:
+        Statistik LRU in-memory (per worker), cache persisten (per proses dan akumulasi global),
+        serta ukuran batch / latensi encoder
+    """
+    return {**plagiarism_detector.get_cache_stats(), "timestamp": datetime.now().isoformat()}
+
+
 @app.post("/api/detect", tags=["Detection"])
 async def detect_plagiarism(
     file: UploadFile = File(..., description="PDF file to analyze"),
@@ -211,17 +322,18 @@ async def detect_plagiarism(
         
         logger.info(f"Text extracted: {len(text)} characters")
         
-        # Update detector threshold
-        plagiarism_detector.similarity_threshold = threshold
-        
         # Detect plagiarism (TEMP: force use_search=False for debugging)
         # Honor client toggle: allow Google CSE if credentials tersedia; fallback ke korpus lokal jika dimatikan
-        result = plagiarism_detector.detect_plagiarism(
+        # Dijalankan di threadpool agar request paralel bisa berbagi micro-batch encoder;
+        # threshold dikirim per request (bukan mengubah state detector bersama)
+        result = await run_in_threadpool(
+            plagiarism_detector.detect_plagiarism,
             text,
             use_search=use_search,
             use_local_corpus=use_local_corpus,
             add_to_corpus=add_to_corpus,
-            corpus_source_id=task_id
+            corpus_source_id=task_id,
+            threshold=threshold
         )
 
         # Normalisasi label (Indonesia -> English for consistency)
@@ -344,16 +456,15 @@ async def detect_text(
         raise HTTPException(status_code=400, detail="Text too short (minimum 50 characters)")
     
     try:
-        # Update threshold
-        plagiarism_detector.similarity_threshold = threshold
-        
-        # Detect
-        result = plagiarism_detector.detect_plagiarism(
+        # Detect (threadpool + threshold per request, lihat /api/detect)
+        result = await run_in_threadpool(
+            plagiarism_detector.detect_plagiarism,
             text,
             use_search=use_search,
             use_local_corpus=use_local_corpus,
             add_to_corpus=add_to_corpus,
-            corpus_source_id=task_id
+            corpus_source_id=task_id,
+            threshold=threshold
         )
 
         # Normalisasi label
@@ -493,7 +604,8 @@ async def delete_task(task_id: str):
 async def build_corpus(
     folder_path: str = Form("uploads/corpus_skripsi", description="Path ke folder berisi PDF/TXT corpus"),
     file_extension: str = Form(".pdf", description="Extension file (.pdf atau .txt)"),
-    clear_existing: bool = Form(False, description="Hapus corpus yang ada sebelum build")
+    clear_existing: bool = Form(False, description="Hapus corpus yang ada sebelum build"),
+    workers: int = Form(int(os.getenv("CORPUS_BUILD_WORKERS", "0")), description="Jumlah proses encode paralel (0 = satu proses)")
 ):
     """
     Build local corpus dari folder berisi file skripsi lama (PDF/TXT).
@@ -503,6 +615,7 @@ async def build_corpus(
         folder_path: Path folder berisi file corpus
         file_extension: .pdf atau .txt
         clear_existing: Hapus corpus lama sebelum build baru
+        workers: Jumlah proses encode paralel (masing-masing dengan model sendiri)
         
     Returns:
         Result build corpus
@@ -514,7 +627,9 @@ async def build_corpus(
             logger.info(f"Cleared {cleared} existing corpus segments")
         
         # Build corpus dari folder
-        result = plagiarism_detector.build_corpus_from_folder(folder_path, file_extension)
+        result = await run_in_threadpool(
+            plagiarism_detector.build_corpus_from_folder, folder_path, file_extension, workers=workers
+        )
         
         return {
             "success": result['success'],
@@ -523,6 +638,9 @@ async def build_corpus(
             "total_segments": result['total_segments'],
             "corpus_size": result['corpus_size'],
             "errors": result['errors'],
+            "segments_per_sec": result['segments_per_sec'],
+            "elapsed_seconds": result['elapsed_seconds'],
+            "encode_pool": result['encode_pool'],
             "timestamp": datetime.now().isoformat()
         }
         
@@ -545,6 +663,9 @@ async def get_corpus_info():
             "corpus_size": info['size'],
             "sources": info['sources'],
             "is_empty": info['empty'],
+            "ann_index": info.get('ann_index'),
+            "storage": info.get('storage'),
+            "log": info.get('log'),
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -552,6 +673,93 @@ async def get_corpus_info():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/corpus/shards", tags=["Corpus Management"])
+async def corpus_shards_health():
+    """
+    Status shard server corpus (health check paralel ke semua shard).
+    
+    Returns:
+        Status up/down per shard dan statistik scatter-gather terakhir
+    """
+    client = plagiarism_detector.shard_client
+    if client is None:
+        return {"shards": [], "enabled": False, "timestamp": datetime.now().isoformat()}
+    return {
+        "enabled": True,
+        "shards": client.health(),
+        "stats": client.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.post("/api/corpus/index", tags=["Corpus Management"])
+async def build_corpus_index(
+    index_type: str = Form("ivf", description="Tipe index ANN ('ivf') atau 'exact' untuk menonaktifkan"),
+    nprobe: int = Form(8, ge=1, description="Jumlah cluster yang di-scan per query (recall vs speed)"),
+    min_corpus_size: int = Form(20000, ge=0, description="Di bawah ukuran ini tetap exact search")
+):
+    """
+    Bangun ulang index ANN untuk local corpus.
+    
+    Returns:
+        Statistik index (jumlah cluster, nprobe, waktu build)
+    """
+    try:
+        result = await run_in_threadpool(
+            plagiarism_detector.build_ann_index, index_type, nprobe=nprobe, min_corpus_size=min_corpus_size
+        )
+        return {**result, "timestamp": datetime.now().isoformat()}
+    except Exception as e:
+        logger.error(f"Error building corpus index: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/corpus/quantize", tags=["Corpus Management"])
+async def quantize_corpus(
+    mode: str = Form("int8", description="Mode storage vektor: 'float32', 'int8', 'pq', 'pca' atau 'truncate'"),
+    dims: Optional[int] = Form(None, description="Dimensi pencarian tahap pertama untuk 'pca' / 'truncate'"),
+    refit: bool = Form(False, description="Latih ulang quantizer walaupun ada yang tersimpan bersama corpus")
+):
+    """
+    Ubah mode storage vektor corpus untuk mengurangi memori resident / biaya scan.
+    
+    Returns:
+        Laporan memori (float32 vs terkompresi) dan versi quantizer
+    """
+    if mode not in ("float32", "int8", "pq", "pca", "truncate"):
+        raise HTTPException(status_code=400, detail="mode harus 'float32', 'int8', 'pq', 'pca' atau 'truncate'")
+    try:
+        if dims:
+            plagiarism_detector.projection_dims = dims
+        report = await run_in_threadpool(plagiarism_detector.quantize_corpus, mode, refit=refit or bool(dims))
+        return {**report, "timestamp": datetime.now().isoformat()}
+    except Exception as e:
+        logger.error(f"Error quantizing corpus: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/corpus/recall", tags=["Corpus Management"])
+async def corpus_recall_check(
+    text: str = Form(..., description="Teks uji (mis. potongan skripsi yang diketahui ada di corpus)"),
+    top_k: int = Form(1, ge=1, le=20),
+    top_sources: Optional[int] = Form(None, ge=0, description="Override M source untuk shortlist (0 = flat)")
+):
+    """
+    Cek recall strategi matching aktif (LSH / shortlist source / ANN) terhadap flat scan exact.
+    
+    Returns:
+        recall@k, kecocokan top-1 dan perbandingan waktu
+    """
+    try:
+        result = await run_in_threadpool(
+            plagiarism_detector.evaluate_corpus_recall, text, top_k=top_k, top_sources=top_sources
+        )
+        return {**result, "timestamp": datetime.now().isoformat()}
+    except Exception as e:
+        logger.error(f"Error checking corpus recall: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.delete("/api/corpus/clear", tags=["Corpus Management"])
 async def clear_corpus():
     """
@@ -574,14 +782,15 @@ async def clear_corpus():
 
 
 @app.post("/api/corpus/save", tags=["Corpus Management"])
-async def save_corpus(path: str = Form("data/corpus.pkl")):
-    """Simpan corpus lokal ke file pickle."""
+async def save_corpus(path: str = Form("data/corpus")):
+    """Simpan corpus lokal ke direktori format v2 (memory-mapped)."""
     try:
         info = plagiarism_detector.save_corpus(path)
         return {
             'success': info['success'],
             'segments': info['segments'],
             'path': info['path'],
+            'format_version': info['format_version'],
             'time_sec': info['time_sec'],
             'timestamp': datetime.now().isoformat()
         }
@@ -591,8 +800,8 @@ async def save_corpus(path: str = Form("data/corpus.pkl")):
 
 
 @app.post("/api/corpus/load", tags=["Corpus Management"])
-async def load_corpus(path: str = Form("data/corpus.pkl")):
-    """Muat corpus lokal dari file pickle."""
+async def load_corpus(path: str = Form("data/corpus")):
+    """Muat corpus lokal (format v2 via mmap, atau pickle v1 lama)."""
     try:
         info = plagiarism_detector.load_corpus(path)
         if not info['success']:
@@ -650,23 +859,47 @@ def save_results_to_csv(details: List[dict], csv_path: str, filename: str):
 
 
 # Startup event
+def load_services():
+    """Muat model, warm-up encode dan corpus di background thread; update ``readiness`` per langkah."""
+    global plagiarism_detector
+    try:
+        with readiness.step("model") as info:
+            detector = create_detector()
+            info.update(name=detector.active_model_name, backend=detector.active_backend)
+        with readiness.step("warmup"):
+            # Forward pass pertama (alokasi / graph init) tidak dibebankan ke request pertama
+            detector._model_encode(["Warm-up encode model deteksi plagiarisme.", "Kalimat kedua untuk batch warm-up."])
+            if detector.cascade_screener is not None:
+                detector.cascade_screener.encode(["Warm-up encode model screening."], remember=False)
+        with readiness.step("corpus", required=False) as info:
+            default_corpus_path = os.getenv("CORPUS_PATH") or os.getenv("CORPUS_PKL_PATH", "data/corpus")
+            if os.path.exists(default_corpus_path) or os.path.exists(default_corpus_path + ".pkl"):
+                loaded = detector.load_corpus(default_corpus_path)
+                logger.info(f"Auto-loaded corpus: {loaded['segments']} segments from {default_corpus_path}")
+            if detector.corpus_log_enabled and detector.corpus_log is None:
+                # Belum ada corpus tersimpan: tetap catat penambahan agar durable sejak request pertama
+                try:
+                    detector.attach_corpus_log(default_corpus_path)
+                except Exception as e:
+                    logger.error(f"Failed to attach corpus log: {e}")
+            info.update(path=default_corpus_path, segments=len(detector.local_corpus))
+    except Exception as e:
+        logger.error(f"Startup gagal: {e}")
+        return
+    plagiarism_detector = detector
+    readiness.mark_ready()
+    logger.info(f"Search provider: {detector.search_service.kind if detector.search_service else 'Not Configured'}")
+    logger.info(f"API Ready! ({readiness.snapshot()['elapsed_seconds']}s)")
+
+
 @app.on_event("startup")
 async def startup_event():
     """Actions on startup"""
     logger.info("=" * 50)
     logger.info("Plagiarism Detection API Starting...")
     logger.info("=" * 50)
-    logger.info(f"SBERT Model: Loaded")
-    logger.info(f"Google CSE: {'Configured' if plagiarism_detector.search_service else 'Not Configured'}")
-    logger.info("API Ready!")
-    # Auto load corpus if exists
-    default_corpus_path = os.getenv("CORPUS_PKL_PATH", "data/corpus.pkl")
-    if os.path.exists(default_corpus_path):
-        try:
-            info = plagiarism_detector.load_corpus(default_corpus_path)
-            logger.info(f"Auto-loaded corpus: {info['segments']} segments from {default_corpus_path}")
-        except Exception as e:
-            logger.error(f"Failed auto-load corpus: {e}")
+    # Model & corpus dimuat di background; server sudah menerima request (/health, /ready)
+    threading.Thread(target=load_services, name="service-loader", daemon=True).start()
 
 
 # Shutdown event
@@ -674,6 +907,8 @@ async def startup_event():
 async def shutdown_event():
     """Actions on shutdown"""
     logger.info("API Shutting down...")
+    if plagiarism_detector is not None:
+        plagiarism_detector.close()
 
 
 if __name__ == "__main__":
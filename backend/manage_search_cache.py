@@ -0,0 +1,57 @@
+"""
+Kelola cache hasil Google CSE (SQLite) yang dipakai bersama API dan script batch.
+
+Usage:
+    python manage_search_cache.py                       # statistik
+    python manage_search_cache.py --purge-expired
+    python manage_search_cache.py --clear
+"""
+
+import argparse
+import sys
+import os
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.search_cache import SearchResultCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Statistik & pemeliharaan cache hasil Google CSE')
+    parser.add_argument(
+        '--path',
+        type=str,
+        default=os.getenv('SEARCH_CACHE_PATH', 'data/search_cache.sqlite'),
+        help='File SQLite cache hasil pencarian (default: env SEARCH_CACHE_PATH)'
+    )
+    parser.add_argument('--purge-expired', action='store_true', help='Hapus entri yang sudah kedaluwarsa')
+    parser.add_argument('--clear', action='store_true', help='Hapus semua entri dan counter')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"❌ Error: Cache tidak ditemukan: {args.path}")
+        return 1
+
+    cache = SearchResultCache(args.path, max_bytes=int(os.getenv('SEARCH_CACHE_MAX_MB', '64')) * 1024 * 1024)
+    if args.clear:
+        cache.clear()
+        print("🗑️  Cache dikosongkan")
+    elif args.purge_expired:
+        print(f"🧹 {cache.purge_expired()} entri kedaluwarsa dihapus")
+
+    stats = cache.stats()
+    totals = stats['global']
+    print("\n" + "="*60)
+    print("🔎 SEARCH RESULT CACHE")
+    print("="*60)
+    print(f"📁 File: {stats['path']}")
+    print(f"📦 Entri: {stats['entries']} ({stats['negative_entries']} hasil kosong), {stats['bytes'] / 1024:.1f} KB")
+    print(f"🎯 Hit: {totals['hits']} ({totals['negative_hits']} negatif), miss: {totals['misses']} "
+          f"(kedaluwarsa: {totals['expired']}), hit rate: {totals['hit_rate']:.1%}")
+    print(f"✍️  Ditulis: {totals['writes']}, eviction: {totals['evictions']}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Shard server untuk local corpus terdistribusi.
+
+Setiap shard memegang sebagian corpus (format v2) dan hanya melakukan pencarian
+vektor; encoding SBERT tetap di API utama, yang mengirim embedding segmen ke
+semua shard lalu me-merge top-k (lihat core/sharding.py).
+
+Usage:
+    python shard_server.py split --corpus data/corpus --shards 4 --output data/shards --index-type ivf
+    python shard_server.py serve --corpus data/shards/shard_0 --port 8101
+    CORPUS_SHARDS=http://localhost:8101,http://localhost:8102 python main.py
+"""
+
+import argparse
+import sys
+import os
+import time
+from loguru import logger
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.corpus_store import CorpusStore
+from core.ann_index import load_ann_index
+from core.sharding import ANN_FILE_NAME, decode_matrix, save_shards, split_corpus_store
+
+
+def create_app(corpus_dir: str, nprobe: int = 8):
+    """Bangun FastAPI app untuk satu shard."""
+    from fastapi import FastAPI, HTTPException
+    from pydantic import BaseModel
+
+    store, meta = CorpusStore.load(corpus_dir, mmap=True)
+    ann_index = None
+    ann_path = os.path.join(corpus_dir, ANN_FILE_NAME)
+    if os.path.exists(ann_path):
+        ann_index = load_ann_index(ann_path)
+        if ann_index.size != len(store):
+            logger.warning(f"ANN index {ann_path} tidak sinkron dengan corpus, pakai exact search")
+            ann_index = None
+        else:
+            ann_index.nprobe = nprobe
+    logger.info(f"Shard loaded: {len(store)} segments from {corpus_dir} (ann={'yes' if ann_index else 'no'})")
+
+    app = FastAPI(title="Plagiarism Corpus Shard", version="1.0.0")
+    started = time.time()
+
+    class SearchRequest(BaseModel):
+        queries: dict
+        top_k: int = 3
+
+    @app.get("/health")
+    def health():
+        return {
+            'segments': len(store),
+            'dim': store.dim,
+            'model_name': meta.get('model_name'),
+            'ann_index': ann_index.stats() if ann_index else None,
+            'uptime_sec': round(time.time() - started, 1)
+        }
+
+    @app.post("/search")
+    def search(request: SearchRequest):
+        queries = decode_matrix(request.queries)
+        if store.dim is not None and queries.shape[1] != store.dim:
+            raise HTTPException(status_code=400, detail=f"Dimensi query {queries.shape[1]} != shard ({store.dim})")
+        if ann_index is not None:
+            rows, scores = ann_index.search(store, queries, top_k=request.top_k)
+        else:
+            rows, scores = store.search_batch(queries, top_k=request.top_k)
+        results = [
+            [
+                {
+                    'snippet': store.get_text(r),
+                    'similarity': float(sc),
+                    'url': None,
+                    'title': f"LOCAL:{store.get_source(r)}",
+                    'source': 'local_corpus',
+                    'source_id': store.get_source(r),
+                    'segment_id': store.get_segment_id(r),
+                    'sources': list(dict.fromkeys(o['source_id'] for o in store.owners(r)))
+                }
+                for r, sc in zip(row_hits, score_hits) if r >= 0
+            ]
+            for row_hits, score_hits in zip(rows, scores)
+        ]
+        return {'results': results}
+
+    return app
+
+
+def split(args) -> int:
+    store, meta = CorpusStore.load(args.corpus, mmap=True)
+    shards = split_corpus_store(store, args.shards)
+    ann_params = {'n_lists': args.n_lists} if args.n_lists else {}
+    saved = save_shards(
+        shards, args.output,
+        model_name=meta.get('model_name'),
+        index_type=args.index_type,
+        min_index_size=args.ann_min_size,
+        **ann_params
+    )
+    for info in saved:
+        ann = f", ann={info['ann_index']['kind']} ({info['ann_index'].get('n_lists')} lists)" if info['ann_index'] else ""
+        print(f"   ✅ {info['path']}: {info['segments']} segments, {info['sources']} sources{ann}")
+    return 0
+
+
+def serve(args) -> int:
+    import uvicorn
+    app = create_app(args.corpus, nprobe=args.nprobe)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="info")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shard server local corpus')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_split = sub.add_parser('split', help='Bagi corpus v2 menjadi beberapa shard (per source_id)')
+    p_split.add_argument('--corpus', type=str, default='data/corpus', help='Direktori corpus v2 sumber')
+    p_split.add_argument('--shards', type=int, required=True, help='Jumlah shard')
+    p_split.add_argument('--output', type=str, default='data/shards', help='Direktori output shard')
+    p_split.add_argument('--index-type', type=str, default='exact', help="Index ANN per shard ('exact' = tanpa index, 'ivf')")
+    p_split.add_argument('--n-lists', type=int, default=None, help='Jumlah cluster IVF per shard (default: ~4*sqrt(N))')
+    p_split.add_argument('--ann-min-size', type=int, default=0, help='Shard lebih kecil dari ini tetap exact search')
+
+    p_serve = sub.add_parser('serve', help='Jalankan shard server HTTP')
+    p_serve.add_argument('--corpus', type=str, required=True, help='Direktori corpus shard (format v2)')
+    p_serve.add_argument('--host', type=str, default='127.0.0.1')
+    p_serve.add_argument('--port', type=int, default=8101)
+    p_serve.add_argument('--nprobe', type=int, default=8, help='nprobe IVF jika shard punya ann.npz')
+
+    args = parser.parse_args()
+    return split(args) if args.command == 'split' else serve(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import time
+import threading
+import numpy as np
+from core.batch_encoder import MicroBatchEncoder
+
+
+def test_concurrent_requests_share_forward_pass_and_keep_order():
+    """Request paralel harus digabung ke sedikit forward pass dan tiap pemanggil menerima vektornya sendiri."""
+    calls = []
+
+    def encode_fn(texts):
+        calls.append(len(texts))
+        return np.array([[float(t.split("-")[1])] for t in texts], dtype=np.float32)
+
+    encoder = MicroBatchEncoder(encode_fn, max_batch_size=64, max_wait_ms=50)
+    results = {}
+    threads = [
+        threading.Thread(target=lambda i=i: results.__setitem__(i, encoder.encode([f"t-{i * 10 + j}" for j in range(4)])))
+        for i in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    encoder.close()
+    assert sum(calls) == 32
+    assert len(calls) < 8, f"Encode harus di-batch lintas request, dapat {calls}"
+    for i in range(8):
+        assert results[i][:, 0].tolist() == [i * 10 + j for j in range(4)]
+    assert encoder.stats()['requests'] == 8
+
+
+def test_close_while_encoding_never_hangs():
+    """Request yang berpacu dengan close() harus selesai: diproses worker atau di-encode langsung, tidak menggantung."""
+    def encode_fn(texts):
+        time.sleep(0.001)
+        return np.array([[float(t.split("-")[1])] for t in texts], dtype=np.float32)
+
+    for _ in range(20):
+        encoder = MicroBatchEncoder(encode_fn, max_batch_size=8, max_wait_ms=1)
+        results = {}
+        threads = [
+            threading.Thread(target=lambda i=i: results.__setitem__(i, encoder.encode([f"t-{i}"])), daemon=True)
+            for i in range(16)
+        ]
+        for t in threads:
+            t.start()
+        encoder.close()
+        for t in threads:
+            t.join(timeout=5)
+        assert not any(t.is_alive() for t in threads), "Request setelah sentinel tidak boleh menunggu selamanya"
+        assert all(results[i][0, 0] == i for i in range(16))
+        assert not encoder._thread.is_alive()
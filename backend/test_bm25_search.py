@@ -0,0 +1,62 @@
+import json
+import math
+from collections import Counter
+import numpy as np
+from core.bm25_search import BM25Index, BM25SearchProvider
+from core.corpus_store import CorpusStore
+
+
+def _brute_bm25(docs, query, k1=1.2, b=0.75):
+    tokenized = [d.lower().split() for d in docs]
+    avg = sum(map(len, tokenized)) / len(tokenized)
+    scores = []
+    for tokens in tokenized:
+        tf = Counter(tokens)
+        score = 0.0
+        for term in set(query.lower().split()):
+            df = sum(term in t for t in tokenized)
+            if tf[term]:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * len(tokens) / avg))
+        scores.append(score)
+    return scores
+
+
+def test_index_matches_brute_force_across_blocks():
+    """Skor BM25 index inkremental (beberapa blok + merge) sama dengan perhitungan langsung."""
+    rng = np.random.default_rng(0)
+    vocab = [f"kata{i}" for i in range(40)]
+    docs = [" ".join(rng.choice(vocab, size=rng.integers(5, 30))) for _ in range(60)]
+    index = BM25Index(max_blocks=3)
+    for start in range(0, len(docs), 7):
+        index.add(docs[start:start + 7])
+    query = "kata3 kata17 kata29"
+    expected = _brute_bm25(docs, query)
+    ids, scores = index.search(query, top_k=5)
+    assert np.allclose(scores, sorted(expected, reverse=True)[:5], rtol=1e-5), "Top-k harus sama dengan skor tertinggi"
+    assert np.allclose(scores, [expected[i] for i in ids], rtol=1e-5)
+
+
+def test_provider_returns_cse_shaped_results(tmp_path):
+    """Provider BM25 mencari di corpus dan snapshot web dengan bentuk hasil sama seperti Google CSE."""
+    snapshots = tmp_path / "snapshots"
+    snapshots.mkdir()
+    (snapshots / "artikel.html").write_text(
+        "<html><head><title>Jaringan Saraf Tiruan</title><script>var x;</script></head>"
+        "<body><p>Jaringan saraf tiruan dilatih dengan algoritma backpropagation pada data citra.</p></body></html>"
+    )
+    (snapshots / "snapshots.json").write_text(json.dumps({"artikel.html": {"url": "https://contoh.ac.id/jst"}}))
+    store = CorpusStore()
+    texts = ["Sistem informasi akademik berbasis web untuk pengelolaan nilai mahasiswa.",
+             "Klasifikasi citra daun menggunakan convolutional neural network."]
+    store.append(np.ones((2, 4)), texts=texts, segment_ids=[1, 2], source_id="skripsi_a")
+    provider = BM25SearchProvider(snapshot_dir=str(snapshots))
+    assert provider.sync(store) == 2 and provider.sync(store) == 0
+
+    web = provider.search("algoritma backpropagation jaringan saraf")
+    assert web[0] == {'title': "Jaringan Saraf Tiruan", 'url': "https://contoh.ac.id/jst", 'source': "contoh.ac.id",
+                      'snippet': "Jaringan saraf tiruan dilatih dengan algoritma backpropagation pada data citra."}
+    local = provider.search("klasifikasi citra daun", num_results=1)
+    assert local == [{'title': "skripsi_a (segmen 2)", 'snippet': texts[1],
+                      'url': "corpus://skripsi_a#segment-2", 'source': "skripsi_a"}]
+    assert provider.search_many(["tidak ada", "nilai mahasiswa"])[0] == []
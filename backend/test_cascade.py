@@ -0,0 +1,62 @@
+import zlib
+import numpy as np
+from core.cascade import CascadeScreener
+from core.corpus_store import CorpusStore
+
+
+class HashModel:
+    """Model palsu: bag-of-words ter-hash (kalimat dengan kata sama -> cosine tinggi)."""
+
+    def __init__(self, dim=64):
+        self.dim = dim
+        self.calls = 0
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                out[i, zlib.crc32(word.encode()) % self.dim] += 1.0
+        return out
+
+
+def _corpus(rng, n=200):
+    store = CorpusStore()
+    texts = [" ".join(f"w{w}" for w in rng.integers(0, 5000, 20)) for _ in range(n)]
+    store.append(rng.normal(size=(n, 8)), texts=texts, segment_ids=list(range(1, n + 1)), source_id="src")
+    return store, texts
+
+
+def test_screen_escalates_only_suspicious_segments(tmp_path):
+    """Segmen yang mirip corpus di-escalate, segmen asing tidak; embedding screening tersimpan sejajar baris corpus."""
+    rng = np.random.default_rng(0)
+    store, texts = _corpus(rng)
+    screener = CascadeScreener(HashModel(), "hash-small", suspicion_threshold=0.6)
+    assert screener.sync(store) == len(store) and screener.sync(store) == 0, "Baris yang sudah di-index tidak di-encode ulang"
+    queries = [texts[5], " ".join(texts[9].split()[:18]), "kalimat asing yang sama sekali tidak ada di corpus"]
+    result = screener.screen(queries)
+    assert result['escalate'].tolist() == [True, True, False]
+    assert result['rows'][:2].tolist() == [5, 9]
+
+    screener.save(str(tmp_path))
+    loaded = CascadeScreener(HashModel(), "hash-small")
+    assert loaded.load(str(tmp_path), len(store))
+    assert not loaded.load(str(tmp_path), len(store) + 1), "Jumlah baris berbeda harus ditolak"
+    assert (loaded.screen(queries)['rows'] == result['rows']).all()
+
+
+def test_append_discards_snapshot_after_clear():
+    """Hasil encode dari snapshot sebelum clear/load tidak boleh di-append (baris tidak sejajar lagi)."""
+    rng = np.random.default_rng(1)
+    store, _ = _corpus(rng, n=50)
+    screener = CascadeScreener(HashModel(), "hash-small")
+    start, generation, texts = screener.pending(store, batch_size=20)
+    vectors = screener.encode(texts)
+    screener.clear()
+    assert not screener.append(vectors, start, generation) and len(screener) == 0
+    start, generation, texts = screener.pending(store, batch_size=20)
+    assert screener.append(screener.encode(texts), start, generation) and len(screener) == 20
+    assert not screener.append(screener.encode(texts), start, generation), "Snapshot yang sama tidak boleh di-append dua kali"
@@ -0,0 +1,280 @@
+import numpy as np
+import pytest
+from core.corpus_store import CorpusStore
+from core.corpus_log import CorpusSegmentLog, apply_append_record
+from core.ann_index import IVFIndex
+from core.minhash import MinHashLSH
+from core.source_index import SourceCentroidIndex
+
+
+def _clustered_corpus(n_sources=5, per_source=400, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(100, dim))
+    store = CorpusStore(initial_capacity=16)
+    for i in range(n_sources):
+        vectors = centers[rng.integers(0, 100, per_source)] + 0.3 * rng.normal(size=(per_source, dim))
+        store.append(vectors, texts=[f"s{i}-{j}" for j in range(per_source)], segment_ids=list(range(1, per_source + 1)), source_id=f"src{i}")
+    queries = centers[rng.integers(0, 100, 40)] + 0.3 * rng.normal(size=(40, dim))
+    return store, queries
+
+
+def _brute_force_top(store, queries, k):
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.argsort(-(q @ store.embeddings.T), axis=1)[:, :k]
+
+
+def test_append_grows_and_keeps_parallel_arrays():
+    """Append berulang harus menjaga teks, source dan segment_id tetap sejajar dengan baris matriks."""
+    store, _ = _clustered_corpus()
+    assert len(store) == 2000
+    assert store[401]['source_id'] == "src1"
+    assert store[401]['text'] == "s1-1"
+    assert store.get_segment_id(401) == 2
+    assert np.allclose(np.linalg.norm(store.embeddings, axis=1), 1.0, atol=1e-5), "Embedding harus ter-normalisasi L2"
+    assert store.source_counts() == {f"src{i}": 400 for i in range(5)}
+
+
+def test_search_batch_matches_brute_force_across_blocks():
+    """Top-k ber-blok harus identik dengan brute-force penuh walau corpus di-tile kecil."""
+    store, queries = _clustered_corpus()
+    rows, scores = store.search_batch(queries, top_k=5, block_size=333)
+    assert (rows == _brute_force_top(store, queries, 5)).all()
+    assert (np.diff(scores, axis=1) <= 1e-6).all(), "Skor harus urut menurun"
+
+
+def test_ivf_index_recall():
+    """IVF dengan nprobe wajar harus menemukan top-1 yang sama untuk hampir semua query."""
+    store, queries = _clustered_corpus()
+    index = IVFIndex(nprobe=16)
+    index.build(store)
+    rows, _ = index.search(store, queries, top_k=1)
+    recall = (rows[:, 0] == _brute_force_top(store, queries, 1)[:, 0]).mean()
+    assert recall >= 0.9, f"Recall IVF terlalu rendah: {recall}"
+
+
+
+def test_ivf_incremental_add_merges_inverted_lists(tmp_path):
+    """Add inkremental me-merge inverted list (tanpa argsort ulang) dan hasilnya sama dengan build dari assignment penuh."""
+    store, queries = _clustered_corpus()
+    base = CorpusStore()
+    base.append(store.embeddings[:500], texts=[store.get_text(r) for r in range(500)], segment_ids=list(range(500)), source_id="a")
+    index = IVFIndex(nprobe=16)
+    index.build(base)
+    index.search(base, queries, top_k=1)
+    for start in range(500, len(store), 300):
+        end = min(start + 300, len(store))
+        base.append(store.embeddings[start:end], texts=[store.get_text(r) for r in range(start, end)], segment_ids=list(range(start, end)), source_id="b")
+        index.add(base, range(start, end))
+    merged_rows, merged_offsets = index._inverted_lists()
+    assert (merged_rows == np.argsort(index.assignments, kind='stable')).all(), "Merge harus identik dengan CSR dari nol"
+    assert merged_offsets[-1] == len(store)
+    path = str(tmp_path / "ann.npz")
+    index.save(path)
+    loaded = IVFIndex.load(path)
+    assert (loaded.search(base, queries, top_k=3)[0] == index.search(base, queries, top_k=3)[0]).all()
+
+
+@pytest.mark.parametrize("kind,params", [("int8", {}), ("pq", {"n_subvectors": 8}), ("pca", {"dims": 16})])
+def test_quantized_storage_reranks_exactly(kind, params, tmp_path):
+    """Storage terkompresi harus menghemat memori dan skor top-1 tetap exact setelah re-ranking."""
+    store, queries = _clustered_corpus()
+    exact_rows, exact_scores = store.search_batch(queries, top_k=1)
+    report = store.quantize(kind, str(tmp_path / "vectors.f32"), **params)
+    assert report['saved_bytes'] > 0
+    rows, scores = store.search_batch(queries, top_k=1)
+    hit = rows[:, 0] == exact_rows[:, 0]
+    assert hit.mean() >= 0.9
+    assert np.allclose(scores[hit, 0], exact_scores[hit, 0], atol=1e-5), "Skor hasil re-rank harus skor float exact"
+
+
+def test_save_and_mmap_load_roundtrip(tmp_path):
+    """Format v2 harus bisa di-load via mmap tanpa copy, lalu tetap bisa di-append."""
+    store, queries = _clustered_corpus(n_sources=2, per_source=50)
+    store.save(str(tmp_path / "corpus"), model_name="dummy-model")
+    loaded, meta = CorpusStore.load(str(tmp_path / "corpus"), mmap=True)
+    assert meta['format_version'] == 2 and meta['model_name'] == "dummy-model"
+    assert isinstance(loaded.embeddings, np.memmap), "Embedding harus memory-mapped"
+    assert len(loaded) == len(store) and loaded[77]['text'] == store[77]['text']
+    assert (loaded.search_batch(queries, top_k=3)[0] == store.search_batch(queries, top_k=3)[0]).all()
+    loaded.append(queries[:2], texts=["baru-1", "baru-2"], segment_ids=[1, 2], source_id="baru")
+    assert loaded.get_text(len(loaded) - 1) == "baru-2"
+    assert loaded.source_counts()["baru"] == 2
+
+
+def test_projection_persists_with_corpus(tmp_path):
+    """Proyeksi PCA harus tersimpan bersama corpus dengan versi yang sama dan dipakai ulang tanpa training."""
+    store, queries = _clustered_corpus(n_sources=2, per_source=300)
+    store.quantize("pca", str(tmp_path / "vectors.f32"), dims=16)
+    version = store.quantizer_info['version']
+    store.save(str(tmp_path / "corpus"))
+    loaded, meta = CorpusStore.load(str(tmp_path / "corpus"), mmap=True)
+    assert meta['quantizer']['version'] == version and loaded.saved_quantizer_info['fitted_rows'] == 600
+    loaded.quantize("pca", str(tmp_path / "loaded.f32"), quantizer=loaded.saved_quantizer)
+    assert loaded.quantizer_info['version'] == version, "Versi harus sama saat quantizer dipakai ulang"
+    assert (loaded.search_batch(queries, top_k=1)[0] == store.search_batch(queries, top_k=1)[0]).all()
+
+
+def test_minhash_lsh_finds_near_verbatim_copy():
+    """Segmen hasil copy dengan sedikit editan harus muncul sebagai kandidat LSH dengan Jaccard tinggi."""
+    rng = np.random.default_rng(1)
+    vocab = [f"kata{i}" for i in range(2000)]
+    corpus = [" ".join(rng.choice(vocab, 25)) for _ in range(500)]
+    index = MinHashLSH()
+    index.add(corpus)
+    words = corpus[123].split()
+    words[20] = "diubah"
+    signatures = index.signatures([" ".join(words), " ".join(rng.choice(vocab, 25))])
+    copied, novel = index.query(signatures)
+    assert 123 in copied, "Segmen sumber harus menjadi kandidat"
+    assert index.jaccard(signatures[0], np.array([123]))[0] >= 0.5
+    assert novel.size == 0 or index.jaccard(signatures[1], novel).max() < 0.5, "Teks acak tidak boleh mirip leksikal"
+
+
+def test_minhash_incremental_adds_match_single_build(tmp_path):
+    """Add bertahap (tail + run terurut bertingkat) harus memberi kandidat sama dengan build sekaligus."""
+    rng = np.random.default_rng(3)
+    signatures = rng.integers(0, 40, size=(5000, 64)).astype(np.uint32)
+    full = MinHashLSH()
+    full.add_signatures(signatures)
+    incremental = MinHashLSH(tail_size=256)
+    for start in range(0, len(signatures), 37):
+        incremental.add_signatures(signatures[start:start + 37])
+    assert incremental.stats()['sorted_runs'] <= 6, "Run terurut harus digabung bertingkat (log N)"
+    queries = signatures[rng.integers(0, 5000, 40)]
+    for a, b in zip(full.query(queries, max_candidates=10 ** 6), incremental.query(queries, max_candidates=10 ** 6)):
+        assert np.array_equal(a, b)
+    incremental.save(str(tmp_path / "minhash.npz"))
+    assert len(MinHashLSH.load(str(tmp_path / "minhash.npz"))) == 5000
+
+
+def test_duplicate_owners_survive_save_and_load(tmp_path):
+    """Owner tambahan segmen duplikat harus ikut tersimpan dan terhitung per source."""
+    store, _ = _clustered_corpus(n_sources=2, per_source=50)
+    store.add_owner(3, "src-duplikat", 7)
+    store.add_owner(3, "src1", 12)
+    store.save(str(tmp_path / "corpus"))
+    loaded, meta = CorpusStore.load(str(tmp_path / "corpus"))
+    assert meta['extra_owners'] == 2
+    assert [o['source_id'] for o in loaded.owners(3)] == ["src0", "src-duplikat", "src1"]
+    assert loaded.source_counts() == {"src0": 50, "src1": 51, "src-duplikat": 1}
+
+
+def test_source_centroid_shortlist_recall():
+    """Shortlist source (centroid dokumen) harus mempertahankan top-1 flat scan untuk query yang mirip sumbernya."""
+    rng = np.random.default_rng(2)
+    topics = rng.normal(size=(30, 64))
+    store = CorpusStore()
+    for i in range(30):
+        vectors = topics[i] + 0.5 * rng.normal(size=(80, 64))
+        store.append(vectors, texts=[f"s{i}-{j}" for j in range(80)], segment_ids=list(range(80)), source_id=f"src{i}")
+    queries = store.embeddings[[5, 900, 1700]] + 0.05 * rng.normal(size=(3, 64))
+    index = SourceCentroidIndex()
+    index.build(store)
+    rows, _, report = index.search(store, queries, top_k=1, top_m=5)
+    assert (rows[:, 0] == store.search_batch(queries, top_k=1)[0][:, 0]).all()
+    assert report['sources'] == 5 and report['candidate_segments'] <= 5 * 80, "Hanya baris source terpilih yang di-scan"
+
+
+def _log_batch(log, source_id, n, seed=0, duplicates=None):
+    vectors = np.random.default_rng(seed).normal(size=(n, 8)).astype(np.float32)
+    log.append(vectors, texts=[f"{source_id}-{i}" for i in range(n)], segment_ids=list(range(1, n + 1)), source_id=source_id, duplicates=duplicates)
+    return vectors
+
+
+def test_corpus_log_replays_appends_and_clear(tmp_path):
+    """Replay harus mengembalikan record append (vektor, teks, duplikat) dan clear sesuai urutan tulis."""
+    log = CorpusSegmentLog(str(tmp_path / "corpus"), fsync=False)
+    first = _log_batch(log, "a", 3)
+    log.append_clear()
+    _log_batch(log, "b", 2, seed=1, duplicates=[(9, "b", 1)])
+    records = list(CorpusSegmentLog(str(tmp_path / "corpus")).replay())
+    assert [r['op'] for r in records] == ['append', 'clear', 'append']
+    assert np.array_equal(records[0]['embeddings'], first) and records[0]['texts'] == ["a-0", "a-1", "a-2"]
+    assert records[2]['source_id'] == "b" and records[2]['duplicates'] == [[9, "b", 1]]
+    assert log.segments == 6
+
+
+def test_corpus_log_truncates_torn_tail(tmp_path):
+    """Record terakhir yang terpotong (crash saat menulis) dibuang dan file dipotong ke record valid terakhir."""
+    log = CorpusSegmentLog(str(tmp_path / "corpus"), fsync=False)
+    _log_batch(log, "a", 2)
+    valid_size = log.size
+    _log_batch(log, "b", 2)
+    with open(log.path, 'r+b') as f:
+        f.truncate(log.size - 5)
+    reopened = CorpusSegmentLog(str(tmp_path / "corpus"))
+    assert [r['source_id'] for r in reopened.replay()] == ["a"]
+    assert reopened.size == valid_size, "Ekor record terpotong harus di-truncate"
+    _log_batch(reopened, "c", 1)
+    assert [r['source_id'] for r in reopened.replay()] == ["a", "c"], "Append setelah truncate harus terbaca"
+
+
+def test_corpus_log_stops_at_crc_mismatch(tmp_path):
+    """Record dengan crc tidak cocok (byte payload rusak) dan record sesudahnya tidak di-replay."""
+    log = CorpusSegmentLog(str(tmp_path / "corpus"), fsync=False)
+    _log_batch(log, "a", 2)
+    corrupt_at = log.size - 3
+    _log_batch(log, "b", 2)
+    with open(log.path, 'r+b') as f:
+        f.seek(corrupt_at)
+        f.write(b"\xff\xff")
+    reopened = CorpusSegmentLog(str(tmp_path / "corpus"))
+    assert [r['source_id'] for r in reopened.replay()] == []
+    assert reopened.size == reopened.header_size
+
+
+def test_corpus_log_replay_skips_records_in_snapshot(tmp_path):
+    """Setelah save_corpus, replay dari log_offset snapshot hanya membaca record baru; generation baru dibaca dari awal."""
+    corpus_dir = str(tmp_path / "corpus")
+    log = CorpusSegmentLog(corpus_dir, fsync=False)
+    store = CorpusStore()
+    store.append(_log_batch(log, "a", 3), texts=["a-0", "a-1", "a-2"], segment_ids=[1, 2, 3], source_id="a")
+    store.save(corpus_dir, extra_meta={'log_generation': log.generation, 'log_offset': log.size})
+    _log_batch(log, "b", 2)
+    meta = CorpusStore.read_meta(corpus_dir)
+    assert [r['source_id'] for r in log.replay(meta['log_offset'])] == ["b"]
+    old_generation = log.generation
+    log.reset()
+    _log_batch(log, "c", 1)
+    assert log.generation != old_generation
+    reopened = CorpusSegmentLog(corpus_dir)
+    start = meta['log_offset'] if reopened.generation == meta['log_generation'] else None
+    assert [r['source_id'] for r in reopened.replay(start)] == ["c"], "Generation berbeda harus di-replay dari awal"
+
+
+def test_corpus_log_compaction_requires_current_log(tmp_path):
+    """Compaction hanya aman jika log belum ditulis proses lain sejak posisi yang diketahui instance ini."""
+    corpus_dir = str(tmp_path / "corpus")
+    worker_a = CorpusSegmentLog(corpus_dir, fsync=False)
+    worker_b = CorpusSegmentLog(corpus_dir, fsync=False)
+    _log_batch(worker_a, "a", 2)
+    assert worker_a.is_current() and not worker_b.is_current()
+    _log_batch(worker_b, "b", 2)
+    assert not worker_a.is_current(), "Record worker lain harus membuat log tidak current"
+    assert not worker_b.is_current(), "Append sendiri tidak menutupi record worker lain yang belum di-replay"
+    list(worker_b.replay())
+    assert worker_b.is_current()
+    worker_b.reset()
+    assert worker_b.is_current() and worker_b.size == worker_b.header_size
+    assert not worker_a.is_current(), "Generation lama tidak boleh di-compact setelah reset proses lain"
+    _log_batch(worker_a, "a", 1)
+    assert [r['source_id'] for r in CorpusSegmentLog(corpus_dir).replay()] == ["a"], "Append worker lama masuk ke generation baru"
+
+
+def test_shared_log_resolves_duplicates_across_workers(tmp_path):
+    """Duplikat dicatat lewat owner (source, segmen), sehingga replay log bersama tetap benar walau record worker lain menyisip."""
+    corpus_dir = str(tmp_path / "corpus")
+    worker_a = CorpusSegmentLog(corpus_dir, fsync=False)
+    worker_b = CorpusSegmentLog(corpus_dir, fsync=False)
+    _log_batch(worker_a, "a", 3)
+    # Worker B tidak melihat record A: baris 0 di prosesnya adalah b#1, bukan a#1
+    _log_batch(worker_b, "b", 2, seed=1)
+    _log_batch(worker_a, "a2", 1, seed=2, duplicates=[(5, "a", 2)])
+    _log_batch(worker_b, "c", 1, seed=3, duplicates=[(7, "b", 1), (8, "hilang", 1)])
+    store = CorpusStore()
+    segments = sum(apply_append_record(store, r) for r in CorpusSegmentLog(corpus_dir).replay())
+    assert len(store) == 7 and segments == 10
+    assert {'source_id': 'a2', 'segment_id': 5} in store.owners(store.find_row("a", 2))
+    assert {'source_id': 'c', 'segment_id': 7} in store.owners(store.find_row("b", 1))
+    assert store.owners(0) == [{'source_id': 'a', 'segment_id': 1}], "Duplikat worker B tidak boleh menempel ke baris worker A"
+    assert store.source_counts() == {'a': 3, 'b': 2, 'a2': 2, 'c': 2}
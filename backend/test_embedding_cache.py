@@ -0,0 +1,66 @@
+import numpy as np
+from core.embedding_cache import EmbeddingLRUCache, PersistentEmbeddingCache
+
+
+def test_cache_roundtrip_across_instances(tmp_path):
+    """Embedding yang ditulis satu proses/instance harus terbaca instance lain (key per model + teks ter-normalisasi)."""
+    path = str(tmp_path / "emb.sqlite")
+    vectors = np.random.default_rng(0).random((3, 16)).astype(np.float32)
+    PersistentEmbeddingCache(path, "model-a").put_many(["satu", "dua  teks", "tiga"], vectors)
+    cache = PersistentEmbeddingCache(path, "model-a")
+    found = cache.get_many(["dua teks", "tiga", "baru"])
+    assert np.allclose(found[0], vectors[1]) and np.allclose(found[1], vectors[2])
+    assert found[2] is None
+    assert cache.stats()['process'] == {'hits': 2, 'misses': 1, 'writes': 0, 'evictions': 0, 'hit_rate': 0.6667}
+    assert PersistentEmbeddingCache(path, "model-b").get_many(["tiga"]) == [None], "Model lain tidak boleh berbagi entri"
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Melewati max_bytes harus menghapus entri yang paling lama tidak diakses."""
+    cache = PersistentEmbeddingCache(str(tmp_path / "emb.sqlite"), "m", max_bytes=64 * 10, evict_every=1)
+    cache.put_many(["lama"], np.ones((1, 16)))
+    for i in range(12):
+        cache.put_many([f"teks-{i}"], np.ones((1, 16)))
+    assert cache.stats()['bytes'] <= 64 * 10
+    assert cache.get_many(["lama"]) == [None]
+    assert cache.get_many(["teks-11"])[0] is not None
+
+
+def test_lru_cache_evicts_by_bytes_in_lru_order():
+    """LRU in-memory harus membatasi total byte dan mengeluarkan entri yang paling lama tidak dipakai."""
+    cache = EmbeddingLRUCache(max_bytes=3 * 64)
+    cache.put_many(["a", "b", "c"], np.ones((3, 16)))
+    cache.get_many(["a"])
+    cache.put_many(["d"], np.ones((1, 16)))
+    assert cache.get_many(["b"]) == [None], "Entri 'b' paling lama tidak dipakai"
+    assert all(v is not None for v in cache.get_many(["a", "c", "d"]))
+    stats = cache.stats()
+    assert stats['bytes'] <= 3 * 64 and stats['evictions'] == 1
+
+
+def test_reads_do_not_write_until_flush(tmp_path):
+    """get_many tidak membuka transaksi tulis; last_access & counter ditulis sekaligus saat flush."""
+    path = str(tmp_path / "emb.sqlite")
+    cache = PersistentEmbeddingCache(path, "m", flush_interval=3600, flush_batch=10 ** 6)
+    cache.put_many(["satu", "dua"], np.ones((2, 4)))
+    changes = cache._conn().total_changes
+    for _ in range(50):
+        cache.get_many(["satu", "baru"])
+    assert cache._conn().total_changes == changes, "Pembacaan tidak boleh menulis ke SQLite"
+    other = PersistentEmbeddingCache(path, "m")
+    assert other.stats()['global']['hits'] == 0
+    cache.flush()
+    assert cache._conn().total_changes - changes <= 3, "Satu flush: satu UPDATE per key + counter"
+    assert other.stats()['global'] == {'hits': 50, 'misses': 50, 'writes': 2, 'evictions': 0}
+
+
+def test_pending_access_protects_entry_from_eviction(tmp_path):
+    """Akses yang belum di-flush tetap dihitung saat eviction (flush sebelum menghapus entri terlama)."""
+    cache = PersistentEmbeddingCache(str(tmp_path / "emb.sqlite"), "m", max_bytes=64 * 9, evict_every=10 ** 6, flush_interval=3600)
+    cache.put_many(["lama"], np.ones((1, 16)))
+    for i in range(9):
+        cache.put_many([f"teks-{i}"], np.ones((1, 16)))
+    cache.get_many(["lama"])
+    assert cache.evict() >= 1
+    assert cache.get_many(["lama"])[0] is not None, "Entri yang baru dibaca tidak boleh dievict"
+    assert cache.get_many(["teks-0"]) == [None]
@@ -0,0 +1,72 @@
+import os
+import numpy as np
+import pytest
+
+from transformers import BertConfig, BertModel, BertTokenizerFast
+from sentence_transformers import SentenceTransformer, models
+from core.plagiarism_detector import PlagiarismDetector
+
+WORDS = "model data teks segmen skripsi corpus sumber hasil metode analisis penelitian sistem deteksi plagiarisme".split()
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """Model SBERT kecil (BERT acak 2 layer) di disk agar bisa dimuat ulang oleh proses worker."""
+    root = tmp_path_factory.mktemp("tiny")
+    hf_dir, st_dir = str(root / "hf"), str(root / "st")
+    os.makedirs(hf_dir)
+    with open(os.path.join(hf_dir, "vocab.txt"), "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    tokenizer = BertTokenizerFast(vocab_file=os.path.join(hf_dir, "vocab.txt"))
+    config = BertConfig(vocab_size=len(tokenizer), hidden_size=32, num_hidden_layers=2,
+                        num_attention_heads=4, intermediate_size=64, max_position_embeddings=64)
+    BertModel(config).save_pretrained(hf_dir)
+    tokenizer.save_pretrained(hf_dir)
+    transformer = models.Transformer(hf_dir, max_seq_length=64)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension())
+    SentenceTransformer(modules=[transformer, pooling, models.Normalize()], device="cpu").save(st_dir)
+    return st_dir
+
+
+@pytest.fixture(scope="module")
+def pool_and_detector(tiny_model):
+    detector = PlagiarismDetector(model_name=tiny_model)
+    pool = detector._create_encode_pool(2, threads_per_worker=1)
+    pool.chunk_size = 7  # beberapa chunk agar tersebar ke kedua worker
+    yield pool, detector
+    pool.close()
+
+
+def test_pool_matches_single_process_encode(pool_and_detector):
+    """Hasil pool 2 worker harus berurutan sesuai input dan sama dengan _encode_batch satu proses."""
+    pool, detector = pool_and_detector
+    texts = [" ".join(WORDS[i % 11:i % 11 + 2 + i % 5]) + f" {i}" for i in range(40)]
+    pooled = pool.submit(texts).result(timeout=120)
+    expected = detector._encode_batch(texts, remember=False)
+    assert pooled.shape == expected.shape and pooled.dtype == np.float32
+    assert np.allclose(pooled, expected, atol=1e-5), "Urutan/nilai embedding pool harus sama dengan encode satu proses"
+    assert pool.stats()['chunks'] == 6 and pool.stats()['segments'] == len(texts)
+
+
+def test_worker_exception_reaches_submit_future(pool_and_detector):
+    """Error di proses worker diteruskan ke Future dari submit(), pool tetap bisa dipakai."""
+    pool, _ = pool_and_detector
+    future = pool.submit(["teks normal", None])
+    with pytest.raises(Exception):
+        future.result(timeout=120)
+    assert pool.submit(["teks normal"]).result(timeout=120).shape[0] == 1
+
+
+def test_span_encoding_builds_without_pool(tiny_model, tmp_path):
+    """Span encoding aktif -> build tidak memakai pool per window, embedding corpus = span pooling."""
+    detector = PlagiarismDetector(model_name=tiny_model, segment_encoding="span", dedup_corpus=False)
+    text = " ".join(WORDS[i % len(WORDS)] for i in range(7, 157))
+    with open(tmp_path / "doc.txt", "w") as f:
+        f.write(text)
+    result = detector.build_corpus_from_folder(str(tmp_path), file_extension=".txt", workers=2)
+    assert result['workers'] == 1 and result['encode_pool'] is None, "Span encoding tidak boleh memakai pool"
+    segments = detector.segment_text(text)
+    expected = detector._encode_segments(text, segments)
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    stored = np.asarray(detector.local_corpus.embeddings[:len(segments)], dtype=np.float32)
+    assert len(detector.local_corpus) == len(segments) and np.allclose(stored, expected, atol=1e-4)
@@ -0,0 +1,31 @@
+import numpy as np
+from core.encode_scheduler import LengthBucketScheduler
+
+
+def word_tokenizer(texts, add_special_tokens=True, truncation=False, max_length=None):
+    """Tokenizer palsu: satu token per kata + 2 token spesial."""
+    ids = [[0] * (len(t.split()) + 2) for t in texts]
+    if truncation and max_length:
+        ids = [x[:max_length] for x in ids]
+    return {'input_ids': ids}
+
+
+def test_batches_respect_token_budget_and_restore_order():
+    """Batch tidak boleh melewati budget token, padding lebih kecil dari batching naif, dan urutan hasil tetap."""
+    rng = np.random.default_rng(0)
+    texts = [" ".join(f"w{i}" for _ in range(int(n))) for i, n in enumerate(rng.integers(3, 120, 300))]
+    scheduler = LengthBucketScheduler(word_tokenizer, max_seq_length=64, max_tokens=512, max_batch_size=32, bucket_width=8)
+    seen = []
+
+    def encode_fn(batch):
+        lengths = [min(len(t.split()) + 2, 64) for t in batch]
+        assert max(lengths) * len(batch) <= 512 and len(batch) <= 32, "Budget token / batch size dilanggar"
+        assert max(lengths) - min(lengths) < 8, "Satu batch tidak boleh melintasi bucket"
+        seen.extend(batch)
+        return np.array([[float(t.split()[0][1:])] for t in batch], dtype=np.float32)
+
+    result = scheduler.encode(texts, encode_fn)
+    assert sorted(seen) == sorted(texts), "Setiap teks harus di-encode tepat sekali"
+    assert np.array_equal(result[:, 0], np.arange(len(texts))), "Urutan hasil harus sama dengan input"
+    stats = scheduler.stats()
+    assert stats['padding_ratio'] < stats['naive_padding_ratio']
@@ -0,0 +1,66 @@
+import threading
+import time
+from core.google_search import GoogleSearchClient, TokenBucket
+
+
+class FakeService:
+    """Service CSE palsu: mencatat thread pemakai dan request paralel."""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.owner = threading.get_ident()
+
+    def cse(self):
+        return self
+
+    def list(self, q, cx, num):
+        assert threading.get_ident() == self.owner, "Service dipakai lintas thread"
+        self.query = q
+        return self
+
+    def execute(self):
+        with self.tracker['lock']:
+            self.tracker['active'] += 1
+            self.tracker['peak'] = max(self.tracker['peak'], self.tracker['active'])
+        time.sleep(0.02)
+        with self.tracker['lock']:
+            self.tracker['active'] -= 1
+        return {'items': [{'title': self.query, 'snippet': f"snippet {self.query}", 'link': f"https://x/{self.query}", 'displayLink': 'x'}]}
+
+
+def _client(**kwargs):
+    tracker = {'lock': threading.Lock(), 'active': 0, 'peak': 0, 'services': 0}
+
+    def factory():
+        tracker['services'] += 1
+        return FakeService(tracker)
+    return GoogleSearchClient("key", "cx", service_factory=factory, **kwargs), tracker
+
+
+def test_search_many_keeps_order_and_concurrency_cap():
+    """Hasil urut sesuai query, request paralel tidak melebihi batas, satu service per thread."""
+    client, tracker = _client(max_concurrency=3, rate_limit=1000)
+    queries = [f"q{i}" for i in range(12)]
+    results = client.search_many(queries)
+    assert [r[0]['title'] for r in results] == queries, "Urutan hasil harus sama dengan urutan query"
+    assert 1 < tracker['peak'] <= 3, "Konkurensi harus dibatasi max_concurrency"
+    assert tracker['services'] <= 3, "Service dibuat sekali per thread worker"
+    assert client.stats()['requests'] == 12
+
+
+def test_token_bucket_limits_rate():
+    """Setelah burst habis, request berikutnya menunggu sesuai rate."""
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = time.perf_counter()
+    for _ in range(7):
+        bucket.acquire()
+    assert time.perf_counter() - start >= 0.09, "5 token di luar burst butuh ~0.1 detik pada 50/detik"
+
+
+def test_search_error_returns_empty_list():
+    """Error non-retry dicatat dan menghasilkan list kosong."""
+    def broken():
+        raise RuntimeError("quota")
+    client = GoogleSearchClient("key", "cx", service_factory=broken, rate_limit=1000)
+    assert client.search_many(["a", "b"]) == [[], []]
+    assert client.stats()['errors'] == 2
@@ -1,6 +1,40 @@
+import os
+import re
 import pytest
+
+from transformers import BertConfig, BertModel, BertTokenizerFast
+from sentence_transformers import SentenceTransformer, models
 from core.plagiarism_detector import PlagiarismDetector
 
+SEARCH_TEXT = (
+    "Machine learning merupakan bagian dari AI yang mempelajari pola data. "
+    "Representasi vektor semantik dihasilkan melalui teknik embedding sehingga model transformer dapat menangkap konteks kalimat. "
+    "Sistem deteksi plagiarisme membandingkan setiap segmen dengan sumber dari internet dan corpus lokal."
+)
+OTHER_SNIPPET = "Deep learning untuk klasifikasi citra medis."
+# Kata dasar + sub-token angka agar kata sintetis (kata123, topik4kata56) tidak menjadi [UNK]
+WORDS = sorted(set(re.findall(r"\w+", (SEARCH_TEXT + " " + OTHER_SNIPPET).lower()))) + \
+    ["kata", "istilah", "topik", "##kata"] + [f"##{d}" for d in range(10)]
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """Model SBERT kecil (BERT acak 2 layer) di disk agar test tidak perlu download model."""
+    root = tmp_path_factory.mktemp("tiny")
+    hf_dir, st_dir = str(root / "hf"), str(root / "st")
+    os.makedirs(hf_dir)
+    with open(os.path.join(hf_dir, "vocab.txt"), "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    tokenizer = BertTokenizerFast(vocab_file=os.path.join(hf_dir, "vocab.txt"))
+    config = BertConfig(vocab_size=len(tokenizer), hidden_size=32, num_hidden_layers=2,
+                        num_attention_heads=4, intermediate_size=64, max_position_embeddings=128)
+    BertModel(config).save_pretrained(hf_dir)
+    tokenizer.save_pretrained(hf_dir)
+    transformer = models.Transformer(hf_dir, max_seq_length=128)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension())
+    SentenceTransformer(modules=[transformer, pooling, models.Normalize()], device="cpu").save(st_dir)
+    return st_dir
+
 
 def test_local_corpus_similarity():
     """Memastikan local corpus dapat mendeteksi kemiripan semantik antar dua teks mirip."""
@@ -30,3 +64,94 @@ def test_local_corpus_similarity():
 
     # Cek rata-rata similarity wajar (>= threshold * 0.5 sebagai sanity check)
     assert result['avg_similarity'] >= 0.3, f"Similarity rata-rata terlalu rendah: {result['avg_similarity']}"
+
+
+def test_search_snippets_scored_in_one_batch(tiny_model):
+    """Snippet semua segmen di-dedup dan di-skor sekaligus; hasil sama dengan skor per segmen."""
+    from core.google_search import GoogleSearchClient
+
+    class EchoService:
+        def cse(self):
+            return self
+
+        def list(self, q, cx, num):
+            self.query = q
+            return self
+
+        def execute(self):
+            words = self.query.split()
+            return {'items': [
+                {'title': 'a', 'snippet': " ".join(words[:8]), 'link': 'https://a', 'displayLink': 'a'},
+                {'title': 'b', 'snippet': OTHER_SNIPPET, 'link': 'https://b', 'displayLink': 'b'}
+            ]}
+
+    pd = PlagiarismDetector(model_name=tiny_model, similarity_threshold=0.6, segment_size=20, overlap=5, search_planning=False)
+    pd.search_service = GoogleSearchClient("key", "cx", rate_limit=1000, service_factory=EchoService)
+    batched = pd.detect_plagiarism(SEARCH_TEXT, use_local_corpus=False)
+    assert batched['search']['unique_snippets'] < batched['search']['snippets'], "Snippet identik harus di-encode sekali"
+    for detail in batched['details']:
+        single = pd.detect_segment_plagiarism(
+            {'segment_id': detail['segment_id'], 'segment_text': detail['segment_text'], 'word_count': detail['word_count']},
+            pd.search_google(detail['segment_text']),
+            use_local_corpus=False
+        )
+        assert single['similarity_score'] == pytest.approx(detail['similarity_score'], abs=1e-5)
+        assert single['source_url'] == detail['source_url']
+
+
+def test_deferred_build_lexical_index_cost_stays_linear(tiny_model, tmp_path):
+    """Build folder: dedup LSH per file tidak me-sort ulang seluruh index (total kerja ~N log N, bukan file x N)."""
+    import math
+    import random
+    rng = random.Random(0)
+    vocab = [f"istilah{i}" for i in range(5000)]
+    n_files = 80
+    for i in range(n_files):
+        (tmp_path / f"doc_{i:03d}.txt").write_text(" ".join(rng.choice(vocab) for _ in range(100)))
+    pd = PlagiarismDetector(model_name=tiny_model, segment_size=20, overlap=5)
+    pd.lexical_index.tail_size = 32
+    result = pd.build_corpus_from_folder(str(tmp_path), file_extension=".txt")
+    rows = len(pd.lexical_index)
+    assert result['files_processed'] == n_files and rows == len(pd.local_corpus)
+    bound = n_files * pd.lexical_index.tail_size + rows * (math.log2(rows / pd.lexical_index.tail_size) + 2)
+    assert pd.lexical_index.sorted_rows <= bound, "Sort LSH harus amortized, bukan full re-sort per file"
+    assert pd.lexical_index.sorted_rows < n_files * rows / 4, "Harus jauh di bawah biaya full re-sort per file (~files x N / 2)"
+
+
+def test_concurrent_detect_with_add_to_corpus_keeps_indexes_consistent(tiny_model):
+    """detect_plagiarism paralel (seperti run_in_threadpool) dengan add_to_corpus tidak merusak corpus & index."""
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    rng = random.Random(1)
+    vocab = [f"kata{i}" for i in range(800)]
+    texts = {f"mhs{i}": " ".join(rng.choice(vocab) for _ in range(rng.randint(60, 200))) for i in range(16)}
+    pd = PlagiarismDetector(model_name=tiny_model, segment_size=20, overlap=5)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(
+            lambda item: pd.detect_plagiarism(item[1], use_search=False, use_local_corpus=True, add_to_corpus=True, corpus_source_id=item[0]),
+            texts.items()
+        ))
+    assert all('error' not in r for r in results), "Deteksi paralel tidak boleh gagal"
+    assert all(r['local_match_stats']['segments'] == r['total_segments'] for r in results if 'local_match_stats' in r), \
+        "Statistik matching harus milik request itu sendiri"
+    rows = len(pd.local_corpus)
+    assert rows == sum(r['total_segments'] for r in results), "Setiap segmen masuk corpus tepat sekali"
+    assert {pd.local_corpus.get_source(r) for r in range(rows)} == set(texts)
+    pd._sync_lexical_index()
+    assert len(pd.lexical_index) == rows, "Index leksikal harus sejajar dengan corpus"
+    result = pd.detect_plagiarism(texts["mhs3"], use_search=False, use_local_corpus=True, add_to_corpus=False)
+    assert result['plagiarized_segments'] == result['total_segments'], "Teks yang sudah masuk corpus harus terdeteksi penuh"
+
+
+def test_recall_check_overrides_top_sources_without_changing_config(tiny_model):
+    """evaluate_corpus_recall(top_sources=M) memakai shortlist M hanya untuk pengecekan itu."""
+    import random
+    rng = random.Random(2)
+    pd = PlagiarismDetector(model_name=tiny_model, segment_size=20, overlap=5, hierarchical_top_sources=0)
+    for i in range(12):
+        pd.add_to_corpus(" ".join(f"topik{i}kata{rng.randrange(60)}" for _ in range(200)), source_id=f"src{i}")
+    sample = pd.local_corpus.get_text(40) + " " + pd.local_corpus.get_text(90)
+    report = pd.evaluate_corpus_recall(sample, top_sources=3)
+    assert report['strategy'] == 'hierarchical' and report['stats']['source_shortlist']['sources'] == 3
+    assert pd.hierarchical_top_sources == 0 and pd.source_index is None, "Konfigurasi detector tidak boleh berubah"
+    assert pd.evaluate_corpus_recall(sample)['strategy'] != 'hierarchical'
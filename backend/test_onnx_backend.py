@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from transformers import BertConfig, BertModel, BertTokenizerFast
+from sentence_transformers import SentenceTransformer, models
+from core.onnx_backend import OnnxSentenceEncoder, ONNX_TOLERANCE, compare_embeddings, onnx_artifact_dir
+
+WORDS = "model data teks segmen skripsi corpus sumber hasil metode analisis penelitian sistem deteksi plagiarisme".split()
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """Model SBERT kecil (BERT acak 2 layer) agar export bisa diuji tanpa download."""
+    root = tmp_path_factory.mktemp("tiny")
+    hf_dir, st_dir = str(root / "hf"), str(root / "st")
+    os.makedirs(hf_dir)
+    with open(os.path.join(hf_dir, "vocab.txt"), "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    tokenizer = BertTokenizerFast(vocab_file=os.path.join(hf_dir, "vocab.txt"))
+    config = BertConfig(vocab_size=len(tokenizer), hidden_size=32, num_hidden_layers=2,
+                        num_attention_heads=4, intermediate_size=64, max_position_embeddings=64)
+    BertModel(config).save_pretrained(hf_dir)
+    tokenizer.save_pretrained(hf_dir)
+    transformer = models.Transformer(hf_dir, max_seq_length=64)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension())
+    SentenceTransformer(modules=[transformer, pooling, models.Normalize()], device="cpu").save(st_dir)
+    return st_dir
+
+
+def test_onnx_matches_torch_and_artifact_is_reused(tiny_model, tmp_path):
+    """Embedding ONNX fp32/int8 harus dalam toleransi terhadap PyTorch; export kedua memakai artefak cache."""
+    texts = [" ".join(WORDS[i % 7:i % 7 + 3 + i % 9]) for i in range(40)]
+    reference = SentenceTransformer(tiny_model, device="cpu").encode(texts, convert_to_numpy=True)
+
+    encoder = OnnxSentenceEncoder.from_pretrained(tiny_model, cache_dir=str(tmp_path))
+    assert compare_embeddings(reference, encoder.encode(texts, batch_size=8))['min_cosine'] >= ONNX_TOLERANCE['onnx']
+    assert encoder.encode(texts[0]).shape == (encoder.get_sentence_embedding_dimension(),)
+
+    model_file = os.path.join(onnx_artifact_dir(str(tmp_path), tiny_model), "model.onnx")
+    mtime = os.path.getmtime(model_file)
+    quantized = OnnxSentenceEncoder.from_pretrained(tiny_model, cache_dir=str(tmp_path), quantize=True)
+    assert os.path.getmtime(model_file) == mtime, "Artefak ONNX tidak boleh di-export ulang"
+    assert compare_embeddings(reference, quantized.encode(texts))['min_cosine'] >= ONNX_TOLERANCE['onnx-int8']
@@ -0,0 +1,42 @@
+import numpy as np
+from core.corpus_store import CorpusStore
+from core.query_planner import SearchQueryPlanner
+
+
+def _segments(words, size=25, overlap=5):
+    segments, i = [], 0
+    while i < len(words):
+        chunk = words[i:i + size]
+        segments.append({'segment_id': len(segments) + 1, 'segment_text': " ".join(chunk),
+                         'start_word': i, 'end_word': i + len(chunk), 'word_count': len(chunk)})
+        i += size - overlap
+    return segments
+
+
+def test_plan_skips_local_matches_and_picks_rare_span():
+    """Segmen yang sudah >= threshold di local corpus tidak dicari; query memuat kata langka, bukan kata umum corpus."""
+    common = "metode penelitian data sistem hasil analisis".split()
+    store = CorpusStore()
+    texts = [" ".join(common * 3) for _ in range(50)]
+    store.append(np.random.default_rng(0).normal(size=(50, 8)), texts=texts, segment_ids=list(range(50)), source_id="src")
+    planner = SearchQueryPlanner(query_words=6)
+    assert planner.update_vocabulary(store) == 50 and planner.update_vocabulary(store) == 0
+    words = (common * 4)[:12] + "transformator resonansi kuantum fotonik hibrida".split() + (common * 4)[:20]
+    segments = _segments(words)
+    plan = planner.plan(segments, local_scores=[0.2, 0.9], threshold=0.75)
+    assert plan['skipped_local'] == 1 and plan['assignment'] == [0, None]
+    assert "kuantum fotonik" in plan['queries'][0], "Sub-span harus memuat kata langka"
+    assert len(plan['queries'][0].split()) <= 6
+
+
+def test_plan_merges_neighbours_to_fit_budget():
+    """Budget per dokumen: segmen bertetangga digabung, semua segmen tetap tercakup bila muat."""
+    words = [f"kata{i}" for i in range(400)]
+    segments = _segments(words)
+    planner = SearchQueryPlanner(max_queries=8)
+    plan = planner.plan(segments, local_scores=None)
+    assert len(plan['queries']) <= 8
+    assert plan['segments_covered'] == len(segments) and plan['over_budget'] == 0
+    assert all(len(q) <= 128 for q in plan['queries'])
+    tight = SearchQueryPlanner(max_queries=2, max_group_segments=2).plan(segments)
+    assert len(tight['queries']) == 2 and tight['over_budget'] == len(segments) - tight['segments_covered'] > 0
@@ -0,0 +1,21 @@
+import pytest
+from core.readiness import ReadinessTracker
+
+
+def test_required_step_failure_marks_service_failed_but_optional_does_not():
+    """Langkah wajib yang gagal membuat status 'failed'; langkah opsional hanya tercatat gagal."""
+    tracker = ReadinessTracker(steps=("model", "corpus"))
+    with tracker.step("model") as info:
+        info['name'] = "m"
+    with tracker.step("corpus", required=False):
+        raise OSError("corpus rusak")
+    tracker.mark_ready()
+    snapshot = tracker.snapshot()
+    assert snapshot['ready'] and snapshot['steps']['model']['status'] == 'done' and snapshot['steps']['model']['name'] == "m"
+    assert snapshot['steps']['corpus']['status'] == 'failed'
+
+    failing = ReadinessTracker(steps=("model",))
+    with pytest.raises(RuntimeError):
+        with failing.step("model"):
+            raise RuntimeError("model tidak ditemukan")
+    assert failing.snapshot()['status'] == 'failed' and not failing.wait(0.01)
@@ -0,0 +1,48 @@
+import threading
+import pytest
+from core.rw_lock import ReadWriteLock
+
+
+def test_readers_share_and_writer_excludes():
+    """Beberapa pembaca boleh berjalan bersamaan; penulis menunggu sampai semua pembaca selesai."""
+    lock = ReadWriteLock()
+    barrier = threading.Barrier(3, timeout=5)
+    events = []
+
+    def reader():
+        with lock.shared():
+            barrier.wait()  # hanya lolos jika ketiga pembaca memegang lock bersamaan
+            events.append("read")
+
+    def writer():
+        with lock:
+            events.append("write")
+
+    readers = [threading.Thread(target=reader) for _ in range(3)]
+    with lock:
+        for t in readers:
+            t.start()
+        w = threading.Thread(target=writer)
+        w.start()
+        assert events == [], "Pembaca & penulis lain harus menunggu pemilik lock eksklusif"
+    for t in readers + [w]:
+        t.join(5)
+    assert sorted(events) == ["read", "read", "read", "write"]
+
+
+def test_reentrancy_and_no_upgrade():
+    """Pemilik eksklusif boleh masuk shared dan eksklusif lagi; upgrade dari shared ditolak."""
+    lock = ReadWriteLock()
+    with lock:
+        with lock.shared():
+            with lock:
+                pass
+    with lock.shared():
+        with lock.shared():
+            with pytest.raises(RuntimeError):
+                lock.acquire()
+    acquired = threading.Event()
+    t = threading.Thread(target=lambda: (lock.acquire(), acquired.set(), lock.release()))
+    t.start()
+    t.join(5)
+    assert acquired.is_set(), "Lock harus bebas setelah semua shared dilepas"
@@ -0,0 +1,97 @@
+import time
+from core.google_search import GoogleSearchClient
+from core.search_cache import SearchResultCache
+
+
+class CountingService:
+    """Service CSE palsu: query berawalan 'kosong' tidak punya hasil, 'error' gagal."""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def cse(self):
+        return self
+
+    def list(self, q, cx, num):
+        self.query = q
+        return self
+
+    def execute(self):
+        self.calls.append(self.query)
+        if self.query.startswith("error"):
+            raise RuntimeError("backend error")
+        if self.query.startswith("kosong"):
+            return {}
+        return {'items': [{'title': 't', 'snippet': self.query, 'link': 'https://x', 'displayLink': 'x'}]}
+
+
+def test_repeated_queries_hit_cache_across_instances(tmp_path):
+    """Query identik (setelah normalisasi & potong 128 karakter) tidak dikirim ulang, juga dari instance lain."""
+    path = str(tmp_path / "search.sqlite")
+    calls = []
+    client = GoogleSearchClient("key", "cx", rate_limit=1000, cache=SearchResultCache(path, namespace="cx"),
+                                service_factory=lambda: CountingService(calls))
+    long_query = "kata " * 40
+    first = client.search_many(["teks  satu", long_query, "kosong sama sekali", "teks satu"])
+    assert len(calls) == 3, "Query duplikat dalam satu batch dikirim sekali"
+    other = GoogleSearchClient("key", "cx", rate_limit=1000, cache=SearchResultCache(path, namespace="cx"),
+                               service_factory=lambda: CountingService(calls))
+    again = other.search_many(["teks satu", long_query + " ekor berbeda", "kosong sama sekali"])
+    assert len(calls) == 3, "Semua query harus terlayani dari cache"
+    assert again == [first[0], first[1], []]
+    stats = other.cache.stats()
+    assert stats['process']['hits'] == 3 and stats['process']['negative_hits'] == 1
+    assert stats['negative_entries'] == 1
+
+
+def test_ttl_and_errors_are_not_cached(tmp_path):
+    """Entri kedaluwarsa dianggap miss; request yang gagal tidak di-cache."""
+    calls = []
+    cache = SearchResultCache(str(tmp_path / "search.sqlite"), ttl_seconds=0.05, negative_ttl_seconds=0.05)
+    client = GoogleSearchClient("key", "cx", rate_limit=1000, cache=cache, service_factory=lambda: CountingService(calls))
+    client.search("teks")
+    client.search("error query")
+    client.search("error query")
+    assert calls == ["teks", "error query", "error query"], "Error tidak boleh masuk cache"
+    time.sleep(0.1)
+    client.search("teks")
+    assert calls[-1] == "teks" and cache.stats()['process']['expired'] == 1
+
+
+def test_cache_evicts_to_size_limit(tmp_path):
+    """Melewati max_bytes menghapus entri yang paling lama tidak diakses."""
+    cache = SearchResultCache(str(tmp_path / "search.sqlite"), max_bytes=2000, evict_every=1)
+    result = [{'title': 't', 'snippet': 's' * 100, 'url': 'u', 'source': 'x'}]
+    for i in range(30):
+        cache.put_many([f"query {i}"], [result])
+    assert cache.stats()['bytes'] <= 2000
+    assert cache.get_many(["query 0"]) == [None] and cache.get_many(["query 29"]) == [result]
+
+
+def test_reads_do_not_write_until_flush(tmp_path):
+    """get_many tidak membuka transaksi tulis; last_access & counter ditulis saat client ditutup."""
+    path = str(tmp_path / "search.sqlite")
+    cache = SearchResultCache(path, flush_interval=3600, flush_batch=10 ** 6)
+    cache.put_many(["ada", "kosong"], [[{'title': 't', 'snippet': 's', 'url': 'u', 'source': 'x'}], []])
+    changes = cache._conn().total_changes
+    for _ in range(20):
+        cache.get_many(["ada", "kosong", "baru"])
+    assert cache._conn().total_changes == changes, "Pembacaan tidak boleh menulis ke SQLite"
+    other = SearchResultCache(path)
+    assert other.stats()['global']['hits'] == 0
+    GoogleSearchClient("key", "cx", cache=cache, service_factory=lambda: CountingService([])).close()
+    assert cache._conn().total_changes - changes <= 6, "Satu flush: satu UPDATE per key + counter"
+    totals = other.stats()['global']
+    assert (totals['hits'], totals['negative_hits'], totals['misses']) == (40, 20, 20)
+
+
+def test_pending_access_protects_entry_from_eviction(tmp_path):
+    """Akses yang belum di-flush tetap dihitung saat eviction (flush sebelum menghapus entri terlama)."""
+    cache = SearchResultCache(str(tmp_path / "search.sqlite"), max_bytes=2000, evict_every=10 ** 6, flush_interval=3600)
+    result = [{'title': 't', 'snippet': 's' * 100, 'url': 'u', 'source': 'x'}]
+    for i in range(30):
+        cache.put_many([f"query {i}"], [result])
+    cache.get_many(["query 0"])
+    assert cache.evict() >= 1
+    assert cache.get_many(["query 0"]) == [result], "Entri yang baru dibaca tidak boleh dievict"
+    assert cache.get_many(["query 1"]) == [None]
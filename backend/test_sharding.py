@@ -0,0 +1,91 @@
+import os
+import numpy as np
+import requests
+from fastapi.testclient import TestClient
+from core.corpus_store import CorpusStore
+from core.sharding import ShardedCorpusClient, save_shards, split_corpus_store
+from shard_server import create_app
+
+
+def _corpus(n_sources=12, per_source=30, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    store = CorpusStore()
+    for i in range(n_sources):
+        center = rng.normal(size=dim)
+        vectors = center + 0.5 * rng.normal(size=(per_source, dim))
+        store.append(vectors, texts=[f"src{i}-{j}" for j in range(per_source)], segment_ids=list(range(1, per_source + 1)), source_id=f"src{i}")
+    queries = store.embeddings[rng.integers(0, len(store), 10)] + 0.2 * rng.normal(size=(10, dim))
+    return store, queries.astype(np.float32)
+
+
+class _InProcessSession:
+    """Pengganti requests.Session: URL shard diarahkan ke TestClient in-process (None = shard mati)."""
+
+    def __init__(self, apps):
+        self.apps = apps
+
+    def _client(self, url):
+        base, path = url.rsplit('/', 1)
+        if self.apps.get(base) is None:
+            raise requests.ConnectionError(f"{base} tidak bisa dihubungi")
+        return self.apps[base], f"/{path}"
+
+    def post(self, url, json=None, timeout=None):
+        client, path = self._client(url)
+        return client.post(path, json=json)
+
+    def get(self, url, timeout=None):
+        client, path = self._client(url)
+        return client.get(path)
+
+
+def _serve_shards(tmp_path, store, n_shards=3, **save_kwargs):
+    saved = save_shards(split_corpus_store(store, n_shards), str(tmp_path / "shards"), model_name="dummy", **save_kwargs)
+    apps = {f"http://shard{i}": TestClient(create_app(info['path'])) for i, info in enumerate(saved)}
+    client = ShardedCorpusClient(list(apps), timeout=5.0)
+    session = _InProcessSession(apps)
+    client._session = lambda: session
+    return client, apps, saved
+
+
+def test_scatter_gather_matches_single_store(tmp_path):
+    """Top-k gabungan semua shard harus sama dengan pencarian di satu store utuh."""
+    store, queries = _corpus()
+    client, _, saved = _serve_shards(tmp_path, store)
+    assert sum(info['segments'] for info in saved) == len(store)
+    merged, report = client.search(queries, top_k=5)
+    rows, scores = store.search_batch(queries, top_k=5)
+    for qi, hits in enumerate(merged):
+        assert [(h['source_id'], h['segment_id']) for h in hits] == [(store.get_source(r), store.get_segment_id(r)) for r in rows[qi]]
+        assert np.allclose([h['similarity'] for h in hits], scores[qi], atol=1e-5)
+    assert report['shards_queried'] == 3 and report['shards_failed'] == []
+    client.close()
+
+
+def test_partial_result_when_shard_down(tmp_path):
+    """Shard mati dilaporkan di laporan pencarian, hasil tetap dari shard lain, lalu dilewati sampai retry_after."""
+    store, queries = _corpus()
+    client, apps, _ = _serve_shards(tmp_path, store)
+    down = "http://shard1"
+    apps[down] = None
+    merged, report = client.search(queries, top_k=5)
+    assert report['shards_failed'] == [down] and report['shards_queried'] == 3
+    assert all(h['shard'] != down for hits in merged for h in hits)
+    assert all(len(hits) == 5 for hits in merged), "Shard lain tetap mengisi top-k"
+    assert down in client.stats()['down']
+    _, report = client.search(queries, top_k=5)
+    assert report['shards_skipped'] == 1 and report['shards_queried'] == 2
+    client.close()
+
+
+def test_split_builds_ann_index_per_shard(tmp_path):
+    """Split dengan index_type ivf menyimpan ann.npz per shard yang langsung dipakai shard server."""
+    store, queries = _corpus()
+    client, apps, saved = _serve_shards(tmp_path, store, index_type="ivf", n_lists=4)
+    for url, info in zip(apps, saved):
+        assert os.path.exists(os.path.join(info['path'], "ann.npz"))
+        assert apps[url].get("/health").json()['ann_index']['n_lists'] == 4
+    merged, _ = client.search(queries, top_k=1)
+    rows, _ = store.search_batch(queries, top_k=1)
+    assert [hits[0]['source_id'] for hits in merged] == [store.get_source(r) for r in rows[:, 0]], "nprobe = n_lists setara exact"
+    client.close()
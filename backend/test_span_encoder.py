@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pytest
+import torch
+
+from transformers import BertConfig, BertModel, BertTokenizerFast
+from sentence_transformers import SentenceTransformer, models
+from core.span_encoder import SpanPoolingEncoder
+
+WORDS = "model data teks segmen skripsi corpus sumber hasil metode analisis penelitian sistem deteksi plagiarisme".split()
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """Model SBERT kecil (BERT acak 2 layer, mean pooling) tanpa download."""
+    root = tmp_path_factory.mktemp("tiny")
+    hf_dir = str(root / "hf")
+    os.makedirs(hf_dir)
+    with open(os.path.join(hf_dir, "vocab.txt"), "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    tokenizer = BertTokenizerFast(vocab_file=os.path.join(hf_dir, "vocab.txt"))
+    config = BertConfig(vocab_size=len(tokenizer), hidden_size=32, num_hidden_layers=2,
+                        num_attention_heads=4, intermediate_size=64, max_position_embeddings=128)
+    BertModel(config).save_pretrained(hf_dir)
+    tokenizer.save_pretrained(hf_dir)
+    transformer = models.Transformer(hf_dir, max_seq_length=128)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension())
+    return SentenceTransformer(modules=[transformer, pooling], device="cpu")
+
+
+def _document(n_words=200, seed=0):
+    rng = np.random.default_rng(seed)
+    words = [WORDS[i] for i in rng.integers(0, len(WORDS), n_words)]
+    windows = [(i, min(i + 25, n_words)) for i in range(0, n_words - 10, 20)]
+    return words, windows
+
+
+def test_span_pooling_is_exact_mean_of_chunk_tokens(tiny_model):
+    """Embedding window = rata-rata token embedding rentang katanya pada forward pass chunk."""
+    words, windows = _document(60)
+    encoder = SpanPoolingEncoder(tiny_model, max_tokens=128)
+    result = encoder.encode(words, windows)
+    assert encoder.stats()['chunks'] == 1, "Dokumen pendek harus muat dalam satu chunk"
+    features = tiny_model.tokenize([" ".join(words)])
+    with torch.no_grad():
+        tokens = tiny_model.forward(features)['token_embeddings'][0, 1:-1].numpy()  # tanpa [CLS]/[SEP]
+    for (start, end), vector in zip(windows, result):
+        assert np.allclose(vector, tokens[start:end].mean(axis=0), atol=1e-5)
+
+
+def test_span_encoding_saves_tokens_and_stays_close_to_window_encoding(tiny_model):
+    """Mode span memproses lebih sedikit token dan embedding tetap dekat dengan encode per window."""
+    words, windows = _document(400)
+    encoder = SpanPoolingEncoder(tiny_model, max_tokens=96)
+    span = encoder.encode(words, windows)
+    reference = tiny_model.encode([" ".join(words[s:e]) for s, e in windows], convert_to_numpy=True)
+    cosine = np.sum(span * reference, axis=1) / np.linalg.norm(span, axis=1) / np.linalg.norm(reference, axis=1)
+    stats = encoder.stats()
+    assert span.shape == reference.shape
+    assert stats['chunk_tokens'] < stats['window_tokens']
+    assert cosine.mean() >= 0.9, f"Embedding span terlalu jauh dari per window: {cosine.mean()}"